@@ -7,10 +7,15 @@ from database.managers.document_manager import DocumentManager
 from database.managers.workspace_manager import WorkspaceManager
 from database.managers.rbac_manager import RbacManager
 from database.managers.audit_manager import AuditManager
+from database.managers.ingest_manager import IngestOutboxManager
 
 from apps.services.auth_service import AuthService
+from apps.services.bulk_upload_service import BulkUploadService
+from apps.services.ingest_dispatcher import IngestDispatcher
+from apps.services.preview_service import PreviewService
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from apps.core.security import decode_token
+from apps.core.rag_client import RagClient
 
 
 def get_db(request: Request) -> AsyncDatabase:
@@ -41,6 +46,26 @@ def get_auth_service(request: Request) -> AuthService:
     return request.app.state.auth_service
 
 
+def get_rag_client(request: Request) -> RagClient:
+    return request.app.state.rag_client
+
+
+def get_ingest_outbox_manager(request: Request) -> IngestOutboxManager:
+    return request.app.state.ingest_outbox_manager
+
+
+def get_ingest_dispatcher(request: Request) -> IngestDispatcher:
+    return request.app.state.ingest_dispatcher
+
+
+def get_preview_service(request: Request) -> PreviewService:
+    return request.app.state.preview_service
+
+
+def get_bulk_upload_service(request: Request) -> BulkUploadService:
+    return request.app.state.bulk_upload_service
+
+
 # ------------------ авторизация + права ------------------
 
 bearer_scheme = HTTPBearer(auto_error=False)
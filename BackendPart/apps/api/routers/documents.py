@@ -1,64 +1,144 @@
+import asyncio
 import mimetypes
 import os
-from pathlib import Path
-from typing import Dict, List, Tuple
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
 from uuid import UUID
 
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
     UploadFile,
     File,
     Form,
     HTTPException,
+    Query,
+    Request,
+    Response,
     status,
 )
-from fastapi.responses import FileResponse
-import httpx
 
-from apps.api.schemas.document import FileTypesResponse
+from apps.api.schemas.document import (
+    FileTypesResponse,
+    DocumentListItem,
+    DocumentListResponse,
+    DocumentVersionListItem,
+    DocumentVersionListResponse,
+)
 from apps.api.deps import (
     get_current_user,
     get_document_manager,
     get_audit_manager,
-    get_rbac_manager,
-    get_user_manager,
+    get_rag_client,
+    get_ingest_dispatcher,
+    get_ingest_outbox_manager,
+    get_preview_service,
+    get_bulk_upload_service,
     get_workspace_manager,
     require_permission,
 )
 
 from database.managers.document_manager import DocumentManager
 from database.managers.audit_manager import AuditManager
-from database.managers.rbac_manager import RbacManager
-from database.managers.user_manager import UserManager
+from database.managers.ingest_manager import IngestOutboxManager
 from database.managers.workspace_manager import WorkspaceManager
-from apps.core.storage import save_document_file
+from database.models.document_version import DocumentVersion
+from apps.core.rag_client import RagClient, RagServiceError
+from apps.core.storage import delete_document_file, save_document_file
+from apps.core.file_responses import (
+    CACHE_CONTROL_IMMUTABLE,
+    CACHE_CONTROL_REVALIDATE,
+    etag_matches,
+    not_modified,
+    version_etag,
+    version_file_response,
+)
+from apps.core.pagination import Int32, decode_cursor, encode_cursor
 from apps.core.security import has_document_access
+from apps.core.server_timing import ServerTiming
+from apps.services.bulk_upload_service import BulkUploadService
+from apps.services.ingest_dispatcher import IngestDispatcher
+from apps.services.preview_service import PreviewService
 
 from apps.api.schemas.documents_edit import DocumentEditResponse, DocumentEditRequest
 from apps.api.schemas.document_view import DocumentViewResponse
 from apps.api.schemas.documents_upload import (
     DocumentUploadFromViewerResponse,
     DocumentModerateRequest,
-    DocumentModerateResponse,
+    DocumentUploadAcceptedResponse,
+    DocumentIngestStatusResponse,
+    BulkUploadAcceptedResponse,
+    BulkUploadRejectedFile,
+    BulkUploadStatusResponse,
 )
 from apps.api.schemas.documents_search import (
     DocumentSearchRequest,
     DocumentSearchResponse,
     DocumentSearchItem,
 )
-from utils.config import DOC_STORAGE_DIR, RAG_API_URL
+from utils.config import DOC_STORAGE_DIR
 
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
+@router.get(
+    "",
+    response_model=DocumentListResponse,
+)
+async def list_documents(
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+    department_ids: Optional[List[int]] = Query(None),
+    doc_status: Optional[Literal["active", "archived", "draft"]] = Query(None, alias="status"),
+    only_active: bool = Query(False),
+    tags: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+):
+    page = await document_manager.list_documents(
+        user_access_levels=list(user.access_levels or []),
+        department_ids=department_ids,
+        status=doc_status,
+        only_active=only_active,
+        tags=tags,
+        date_from=date_from,
+        date_to=date_to,
+        limit=limit,
+        after=decode_cursor(cursor, (datetime, UUID)),
+    )
+
+    return DocumentListResponse(
+        items=[
+            DocumentListItem(
+                document_id=row["document_id"],
+                title=row["title"],
+                department_id=row["department_id"],
+                access_levels=row["access_levels"] or [],
+                tags=row["tags"] or [],
+                status=row["status"],
+                is_actual=row["is_valid"],
+                upload_date=row["upload_date"],
+                version_id=row["version_id"],
+                file_name=row["file_name"],
+                file_type=row["file_type"],
+            )
+            for row in page.items
+        ],
+        next_cursor=encode_cursor(page.next_key),
+    )
+
+
 @router.post(
     "/upload",
-    response_model=DocumentModerateResponse,
-    status_code=status.HTTP_201_CREATED,
+    response_model=DocumentUploadAcceptedResponse,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def upload_and_approve_document_from_viewer(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     department_id: int = Form(...),
     tags: list[str] | None = Form(default=None),
@@ -66,266 +146,471 @@ async def upload_and_approve_document_from_viewer(
     user=Depends(require_permission("documents.approve")),
     document_manager: DocumentManager = Depends(get_document_manager),
     audit_manager: AuditManager = Depends(get_audit_manager),
+    ingest_dispatcher: IngestDispatcher = Depends(get_ingest_dispatcher),
+    preview_service: PreviewService = Depends(get_preview_service),
 ):
-    file_name, storage_key, file_size, content_type = await save_document_file(file)
-
-    ingest_payload = {"filename": storage_key}
+    stored = await save_document_file(file)
 
+    # документ, версия и задача на индексацию появляются атомарно;
+    # в RAG файл уйдёт через ingest_outbox
     try:
-        async with httpx.AsyncClient(base_url=RAG_API_URL, timeout=30.0) as client:
-            resp = await client.post("/api/ingest", json=ingest_payload)
-    except httpx.RequestError:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Failed to contact RAG service",
-        )
-
-    if resp.status_code // 100 != 2:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="RAG service failed to ingest document",
+        document, version, outbox_item = await document_manager.create_document_for_ingest(
+            title=title,
+            department_id=department_id,
+            uploaded_by_id=user.id,
+            file_name=stored.file_name,
+            file_type=stored.content_type,
+            file_size=stored.size,
+            storage_key=stored.storage_key,
+            content_sha256=stored.sha256,
+            tags=tags or [],
+            status="active",
+            version_status="approved",
+            change_notes="Approved upload from viewer",
         )
+    except Exception:
+        # блоб общий для одинаковых загрузок: удаляем, только если он
+        # появился в этом запросе, на него никто не сослался и его не
+        # переиспользовала ещё не закоммиченная загрузка (mtime не менялся)
+        if not stored.deduplicated and not await document_manager.count_storage_key_references(
+            stored.storage_key
+        ):
+            await delete_document_file(
+                stored.storage_key, expected_mtime_ns=stored.committed_mtime_ns
+            )
+        raise
 
-    document, version = await document_manager.create_document_with_version(
-        title=title,
-        department_id=department_id,
-        uploaded_by_id=user.id,
-        file_name=file_name,
-        file_type=content_type,
-        file_size=file_size,
-        storage_key=storage_key,
-        tags=tags or [],
-    )
+    ingest_dispatcher.notify()
+    preview_service.schedule(stored.storage_key)
 
-    await audit_manager.log_event(
+    background_tasks.add_task(
+        audit_manager.log_event,
         user_id=user.id,
         action="create_document",
         entity_type="document",
         entity_id=str(document.id),
         meta={
             "version_id": str(version.id),
-            "file_name": file_name,
+            "file_name": stored.file_name,
+            "content_sha256": stored.sha256,
+            "deduplicated": stored.deduplicated,
             "department_id": department_id,
             "moderation_action": "approve",
             "created_via": "viewer",
         },
     )
 
-    updated_doc, updated_ver = (
-        await document_manager.create_new_version_and_update_document(
-            document_id=document.id,
-            title=title,
-            department_id=department_id,
-            access_levels=[],
-            tags=tags or [],
-            status="active",
-            is_valid=True,
-            uploaded_by_id=user.id,
-            change_notes="Approved upload from viewer",
-            version_status="approved",
-        )
-    )
-
-    await audit_manager.log_event(
-        user_id=user.id,
-        action="update_document",
-        entity_type="document",
-        entity_id=str(updated_doc.id),
-        meta={
-            "moderation_action": "approve",
-            "version_id": str(updated_ver.id),
-        },
-    )
-
-    return DocumentModerateResponse(
+    return DocumentUploadAcceptedResponse(
         document_id=document.id,
         version_id=version.id,
         document_status=document.status,
         version_status=version.status,
+        content_sha256=stored.sha256,
+        delivery_status=outbox_item.status,
+        status_url=f"/api/documents/{document.id}/ingest-status",
     )
 
 
 @router.post(
-    "/search",
-    response_model=DocumentSearchResponse,
+    "/bulk-upload",
+    response_model=BulkUploadAcceptedResponse,
+    status_code=status.HTTP_202_ACCEPTED,
 )
-async def search_documents(
-    payload: DocumentSearchRequest,
-    user=Depends(require_permission("documents.read")),
-    document_manager: DocumentManager = Depends(get_document_manager),
+async def bulk_upload_documents(
+    background_tasks: BackgroundTasks,
+    department_id: int = Form(...),
+    tags: list[str] | None = Form(default=None),
+    files: List[UploadFile] = File(...),
+    user=Depends(require_permission("documents.approve")),
+    bulk_upload_service: BulkUploadService = Depends(get_bulk_upload_service),
     audit_manager: AuditManager = Depends(get_audit_manager),
-    workspace_manager: WorkspaceManager = Depends(get_workspace_manager),
+    ingest_dispatcher: IngestDispatcher = Depends(get_ingest_dispatcher),
+    preview_service: PreviewService = Depends(get_preview_service),
 ):
-    query_id = await workspace_manager.create_query(
-        user_id=user.id,
-        question=payload.query,
-        date_from=payload.date_from,
-        date_to=payload.date_to,
-        department_ids=payload.department_ids,
-        only_active=payload.only_active,
+    result = await bulk_upload_service.upload(
+        files,
+        department_id=department_id,
+        uploaded_by_id=user.id,
+        tags=tags or [],
     )
+    rejected = [BulkUploadRejectedFile(**item) for item in result.rejected]
 
-    rag_payload = {
-        "question": payload.query,
-        "top_k": 10,
-    }
-
-    try:
-        async with httpx.AsyncClient(timeout=25.0) as client:
-            resp = await client.post(f"{RAG_API_URL}/api/ask", json=rag_payload)
-    except httpx.RequestError as e:
+    if result.batch_id is None:
         raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Could not contact RAG service: {e}",
-        )
-
-    if resp.status_code // 100 != 2:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"RAG service returned error: {resp.status_code}",
-        )
-
-    rag_json = resp.json()
-
-    rag_sources = rag_json.get("sources", [])
-    rag_answer = rag_json.get("answer")
-
-    search_results: List[Tuple[str, str]] = []
-    for src in rag_sources:
-        source = src.get("source")
-        if not source:
-            continue
-        snippet = src.get("content", "")
-        search_results.append((str(source), snippet))
-
-    if not search_results:
-        await audit_manager.log_event(
-            user_id=user.id,
-            action="search",
-            entity_type="workspace_query",
-            entity_id=str(query_id),
-            meta={
-                "query": payload.query,
-                "filters": {
-                    "date_from": (
-                        str(payload.date_from) if payload.date_from else None
-                    ),
-                    "date_to": str(payload.date_to) if payload.date_to else None,
-                    "department_ids": payload.department_ids,
-                    "only_active": payload.only_active,
-                },
-                "results_count": 0,
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "message": "No files accepted",
+                "rejected": [item.model_dump() for item in rejected],
             },
         )
-        return DocumentSearchResponse(query_id=query_id, answer=rag_answer, items=[])
-
-    storage_keys = [os.path.basename(path) for path, _ in search_results]
-
-    storage_key_to_doc_id = await document_manager.get_document_ids_by_storage_keys(
-        storage_keys
-    )
 
-    doc_ids: List[UUID] = []
-    snippets_map: Dict[UUID, str] = {}
-
-    for full_path, snippet in search_results:
-        key = os.path.basename(full_path)
-        doc_id = storage_key_to_doc_id.get(key)
-        if not doc_id:
-            continue
-        doc_ids.append(doc_id)
-        snippets_map[doc_id] = snippet
-
-    if not doc_ids:
-        await audit_manager.log_event(
-            user_id=user.id,
-            action="search",
-            entity_type="workspace_query",
-            entity_id=str(query_id),
-            meta={
-                "query": payload.query,
-                "filters": {
-                    "date_from": (
-                        str(payload.date_from) if payload.date_from else None
-                    ),
-                    "date_to": str(payload.date_to) if payload.date_to else None,
-                    "department_ids": payload.department_ids,
-                    "only_active": payload.only_active,
+    ingest_dispatcher.notify()
+    for stored in result.stored:
+        preview_service.schedule(stored.storage_key)
+
+    # по событию create_document на каждый принятый файл, как при загрузке
+    # из просмотрщика: так растут и счётчики профиля
+    background_tasks.add_task(
+        audit_manager.log_events,
+        [
+            {
+                "user_id": user.id,
+                "action": "create_document",
+                "entity_type": "document",
+                "entity_id": str(document_id),
+                "meta": {
+                    "version_id": str(version_id),
+                    "file_name": stored.file_name,
+                    "content_sha256": stored.sha256,
+                    "deduplicated": stored.deduplicated,
+                    "department_id": department_id,
+                    "batch_id": str(result.batch_id),
+                    "created_via": "bulk_upload",
                 },
-                "results_count": 0,
-            },
-        )
-        return DocumentSearchResponse(query_id=query_id, answer=rag_answer, items=[])
-
-    documents = await document_manager.get_documents_by_ids(doc_ids)
-
-    versions_map = await document_manager.get_current_versions_for_documents(doc_ids)
-
-    items: List[DocumentSearchItem] = []
-
-    for doc in documents:
-        if not has_document_access(user.access_levels, doc.access_levels):
-            continue
-
-        if payload.only_active and not doc.is_valid:
-            continue
+            }
+            for stored, (document_id, version_id) in zip(result.stored, result.documents)
+        ],
+    )
 
-        if payload.department_ids and doc.department_id not in payload.department_ids:
-            continue
+    return BulkUploadAcceptedResponse(
+        batch_id=result.batch_id,
+        files_total=result.files_total,
+        accepted=len(result.documents),
+        rejected=rejected,
+        status_url=f"/api/documents/bulk-upload/{result.batch_id}",
+    )
 
-        if payload.date_from and doc.upload_date.date() < payload.date_from:
-            continue
-        if payload.date_to and doc.upload_date.date() > payload.date_to:
-            continue
 
-        if payload.tags and not set(payload.tags).intersection(doc.tags):
-            continue
+@router.get(
+    "/bulk-upload/{batch_id}",
+    response_model=BulkUploadStatusResponse,
+)
+async def get_bulk_upload_status(
+    batch_id: UUID,
+    user=Depends(require_permission("documents.approve")),
+    outbox_manager: IngestOutboxManager = Depends(get_ingest_outbox_manager),
+):
+    progress = await outbox_manager.get_batch_progress(batch_id)
+    if progress is None or progress["created_by_id"] != user.id:
+        raise HTTPException(status_code=404, detail="Upload batch not found")
+
+    return BulkUploadStatusResponse(
+        batch_id=progress["id"],
+        created_at=progress["created_at"],
+        files_total=progress["files_total"],
+        rejected=[BulkUploadRejectedFile(**item) for item in progress["rejected"] or []],
+        documents=progress["documents"],
+        pending=progress["pending"],
+        delivered=progress["delivered"],
+        failed=progress["failed"],
+        indexed=progress["indexed"],
+    )
 
-        if payload.extensions:
-            ver = versions_map.get(doc.id)
-            if not ver:
-                continue
 
-            file_type = (ver.file_type or "").lower()
-            allowed_types = {t.lower() for t in payload.extensions}
+@router.get(
+    "/{document_id}/ingest-status",
+    response_model=DocumentIngestStatusResponse,
+)
+async def get_document_ingest_status(
+    document_id: UUID,
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+    outbox_manager: IngestOutboxManager = Depends(get_ingest_outbox_manager),
+):
+    document = await document_manager.get_document_by_id(document_id)
+    if document is None or not has_document_access(
+        user.access_levels, document.access_levels
+    ):
+        raise HTTPException(status_code=404, detail="Document not found")
 
-            if file_type not in allowed_types:
-                continue
+    item = await outbox_manager.get_latest_for_document(document_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="No ingestion task for document")
+
+    return DocumentIngestStatusResponse(
+        document_id=item.document_id,
+        version_id=item.version_id,
+        status=item.status,
+        attempts=item.attempts,
+        last_error=item.last_error,
+        created_at=item.created_at,
+        delivered_at=item.delivered_at,
+    )
 
-        items.append(
-            DocumentSearchItem(
-                document_id=doc.id,
-                title=doc.title,
-                snippet=snippets_map.get(doc.id, ""),
-                is_actual=doc.is_valid,
-                date=doc.upload_date,
-                tags=doc.tags,
-            )
-        )
 
-    await audit_manager.log_event(
+def _log_search(
+    background_tasks: BackgroundTasks,
+    audit_manager: AuditManager,
+    *,
+    user,
+    query_id: UUID,
+    payload: DocumentSearchRequest,
+    results_count: int,
+    **extra_meta,
+) -> None:
+    # аудит пишем уже после отправки ответа
+    background_tasks.add_task(
+        audit_manager.log_event,
         user_id=user.id,
         action="search",
         entity_type="workspace_query",
         entity_id=str(query_id),
         meta={
             "query": payload.query,
+            **extra_meta,
             "filters": {
                 "date_from": str(payload.date_from) if payload.date_from else None,
                 "date_to": str(payload.date_to) if payload.date_to else None,
                 "department_ids": payload.department_ids,
                 "only_active": payload.only_active,
             },
-            "results_count": len(items),
+            "results_count": results_count,
         },
     )
 
+
+def _compile_search_filter(
+    payload: DocumentSearchRequest, user
+) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Фильтры запроса разбираются один раз; на каждый документ-кандидат
+    остаются только проверки по уже готовым множествам.
+    """
+    user_levels = set(user.access_levels or [])
+    department_ids = set(payload.department_ids) if payload.department_ids else None
+    tags = set(payload.tags) if payload.tags else None
+    allowed_types = {t.lower() for t in payload.extensions} if payload.extensions else None
+    only_active = payload.only_active
+    date_from = payload.date_from
+    date_to = payload.date_to
+
+    def matches(row: Dict[str, Any]) -> bool:
+        if not user_levels.issuperset(row["access_levels"] or ()):
+            return False
+        if only_active and not row["is_valid"]:
+            return False
+        if department_ids is not None and row["department_id"] not in department_ids:
+            return False
+        if date_from or date_to:
+            upload_date = row["upload_date"].date()
+            if date_from and upload_date < date_from:
+                return False
+            if date_to and upload_date > date_to:
+                return False
+        if tags is not None and tags.isdisjoint(row["tags"] or ()):
+            return False
+        if allowed_types is not None:
+            if row["version_id"] is None:
+                return False
+            if (row["file_type"] or "").lower() not in allowed_types:
+                return False
+        return True
+
+    return matches
+
+
+def _source_ref(src: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+    """
+    Источник RAG: по version_id (первичный ключ), а для файлов,
+    проиндексированных без id, — по storage_key из пути файла.
+    """
+    version_id = src.get("version_id")
+    if version_id:
+        try:
+            return ("version", UUID(str(version_id)))
+        except ValueError:
+            pass
+
+    source = src.get("source")
+    if source:
+        return ("key", os.path.basename(str(source)))
+    return None
+
+
+def _candidate_ref(row: Dict[str, Any]) -> Tuple[str, Any]:
+    if row["matched_version_id"] is not None:
+        return ("version", row["matched_version_id"])
+    return ("key", row["matched_key"])
+
+
+def _search_item(row: Dict[str, Any], snippet: str) -> DocumentSearchItem:
+    return DocumentSearchItem(
+        document_id=row["document_id"],
+        title=row["title"],
+        snippet=snippet,
+        is_actual=row["is_valid"],
+        date=row["upload_date"],
+        tags=row["tags"],
+        version_id=row["version_id"],
+        thumbnail_url=(
+            f"/api/documents/{row['document_id']}/versions/{row['version_id']}/thumbnail"
+            if row["version_id"] and PreviewService.is_renderable(row["storage_key"])
+            else None
+        ),
+    )
+
+
+async def _lexical_search(
+    payload: DocumentSearchRequest,
+    *,
+    query_task: "asyncio.Task[UUID]",
+    user,
+    document_manager: DocumentManager,
+    audit_manager: AuditManager,
+    background_tasks: BackgroundTasks,
+    timing: ServerTiming,
+    degraded: bool,
+) -> DocumentSearchResponse:
+    rows = await timing.measure(
+        "lexical",
+        document_manager.search_lexical(
+            payload.query,
+            user_access_levels=list(user.access_levels or []),
+            department_ids=payload.department_ids,
+            date_from=payload.date_from,
+            date_to=payload.date_to,
+            tags=payload.tags,
+            file_types=payload.extensions,
+            only_active=payload.only_active,
+            limit=payload.limit,
+        ),
+    )
+    query_id = await query_task
+
+    items = [_search_item(r, r["snippet"] or "") for r in rows]
+
+    _log_search(
+        background_tasks,
+        audit_manager,
+        user=user,
+        query_id=query_id,
+        payload=payload,
+        results_count=len(items),
+        mode="lexical",
+        degraded=degraded,
+    )
+
     return DocumentSearchResponse(
         query_id=query_id,
-        answer=rag_answer,
+        answer="",
         items=items,
+        mode="lexical",
+        degraded=degraded,
+    )
+
+
+@router.post(
+    "/search",
+    response_model=DocumentSearchResponse,
+)
+async def search_documents(
+    payload: DocumentSearchRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+    audit_manager: AuditManager = Depends(get_audit_manager),
+    workspace_manager: WorkspaceManager = Depends(get_workspace_manager),
+    rag_client: RagClient = Depends(get_rag_client),
+):
+    timing = ServerTiming()
+
+    # запись запроса в историю не нужна ни RAG, ни БД-выборке —
+    # идёт параллельно, id понадобится только для ответа
+    query_task = asyncio.create_task(
+        timing.measure(
+            "query_log",
+            workspace_manager.create_query(
+                user_id=user.id,
+                question=payload.query,
+                date_from=payload.date_from,
+                date_to=payload.date_to,
+                department_ids=payload.department_ids,
+                only_active=payload.only_active,
+            ),
+        )
     )
 
+    try:
+        lexical_kwargs = dict(
+            query_task=query_task,
+            user=user,
+            document_manager=document_manager,
+            audit_manager=audit_manager,
+            background_tasks=background_tasks,
+            timing=timing,
+        )
+
+        if payload.mode == "documents":
+            result = await _lexical_search(payload, degraded=False, **lexical_kwargs)
+            response.headers["Server-Timing"] = timing.header()
+            return result
+
+        rag_payload = {
+            "question": payload.query,
+            "top_k": 10,
+        }
+
+        try:
+            rag_json = await timing.measure("rag", rag_client.ask(rag_payload))
+        except RagServiceError:
+            # без RAG нет ответа, но документы можно найти полнотекстовым поиском
+            result = await _lexical_search(payload, degraded=True, **lexical_kwargs)
+            response.headers["Server-Timing"] = timing.header()
+            return result
+
+        rag_answer = rag_json.get("answer")
+
+        # источники в порядке релевантности RAG; первый фрагмент по источнику — лучший
+        snippets: Dict[Any, str] = {}
+        for src in rag_json.get("sources", []):
+            ref = _source_ref(src)
+            if ref is not None:
+                snippets.setdefault(ref, src.get("content", ""))
+
+        candidates = await timing.measure(
+            "db",
+            document_manager.get_search_candidates(
+                version_ids=[value for kind, value in snippets if kind == "version"],
+                storage_keys=[value for kind, value in snippets if kind == "key"],
+            ),
+        )
+
+        items: List[DocumentSearchItem] = []
+        with timing.stage("filter"):
+            matches = _compile_search_filter(payload, user)
+            rank = {ref: i for i, ref in enumerate(snippets)}
+            seen: set = set()
+            for row in sorted(candidates, key=lambda r: rank[_candidate_ref(r)]):
+                if row["document_id"] in seen or not matches(row):
+                    continue
+                seen.add(row["document_id"])
+                items.append(_search_item(row, snippets[_candidate_ref(row)]))
+
+        query_id = await query_task
+
+        _log_search(
+            background_tasks,
+            audit_manager,
+            user=user,
+            query_id=query_id,
+            payload=payload,
+            results_count=len(items),
+        )
+
+        response.headers["Server-Timing"] = timing.header()
+        return DocumentSearchResponse(
+            query_id=query_id,
+            answer=rag_answer,
+            items=items,
+        )
+    except BaseException:
+        # запись в историю не должна остаться висеть без ожидания: иначе её
+        # ошибка всплывёт только как "Task exception was never retrieved"
+        query_task.cancel()
+        await asyncio.gather(query_task, return_exceptions=True)
+        raise
+
 
 @router.get(
     "/{document_id}",
@@ -333,115 +618,297 @@ async def search_documents(
 )
 async def get_document_view(
     document_id: str,
+    background_tasks: BackgroundTasks,
     user=Depends(require_permission("documents.read")),
     document_manager: DocumentManager = Depends(get_document_manager),
     audit_manager: AuditManager = Depends(get_audit_manager),
-    rbac_manager: RbacManager = Depends(get_rbac_manager),
-    user_manager: UserManager = Depends(get_user_manager),
 ):
     try:
         doc_uuid = UUID(document_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid document id")
 
-    document, version = await document_manager.get_document_with_current_version(
-        doc_uuid
-    )
-    if version is None:
+    view = await document_manager.get_document_view(doc_uuid)
+    if view is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if view["version_id"] is None:
         raise HTTPException(status_code=404, detail="Document version not found")
 
-    if not has_document_access(user.access_levels, document.access_levels):
+    if not has_document_access(user.access_levels, view["access_levels"]):
         raise HTTPException(status_code=404, detail="Document not found")
 
-    department_name = None
-    if document.department_id is not None:
-        dept = await rbac_manager.get_department_by_id(document.department_id)
-        if dept is not None:
-            department_name = dept.name
-
-    uploaded_by = None
-    if version.uploaded_by_id is not None:
-        uploader = await user_manager.get_user_by_id(version.uploaded_by_id)
-        if uploader is not None:
-            parts = [
-                uploader.last_name or "",
-                uploader.first_name or "",
-                uploader.middle_name or "",
-            ]
-            uploaded_by = " ".join(p for p in parts if p).strip() or None
-
-    await audit_manager.log_event(
+    # аудит пишем уже после отправки ответа
+    background_tasks.add_task(
+        audit_manager.log_event,
         user_id=user.id,
         action="view",
         entity_type="document",
-        entity_id=str(document.id),
+        entity_id=str(view["document_id"]),
         meta={
-            "version_id": str(version.id),
+            "version_id": str(view["version_id"]),
         },
     )
 
     return DocumentViewResponse(
-        document_id=document.id,
-        title=document.title,
-        is_actual=document.is_valid,
-        access_levels=document.access_levels,
-        department_name=department_name,
-        version_id=version.id,
-        uploaded_by=uploaded_by,
-        upload_date=version.upload_date,
-        file_name=version.file_name,
-        storage_key=version.storage_key,
+        document_id=view["document_id"],
+        title=view["title"],
+        is_actual=view["is_valid"],
+        access_levels=view["access_levels"] or [],
+        department_name=view["department_name"],
+        version_id=view["version_id"],
+        uploaded_by=view["uploaded_by"],
+        upload_date=view["upload_date"],
+        file_name=view["file_name"],
+        storage_key=view["storage_key"],
+        content_sha256=view["content_sha256"],
     )
 
 
 @router.get(
-    "/{document_id}/preview",
+    "/{document_id}/versions",
+    response_model=DocumentVersionListResponse,
 )
-async def preview_document_file(
+async def list_document_versions(
     document_id: str,
     user=Depends(require_permission("documents.read")),
     document_manager: DocumentManager = Depends(get_document_manager),
-    audit_manager: AuditManager = Depends(get_audit_manager),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
 ):
     try:
         doc_uuid = UUID(document_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid document id")
 
-    document, version = await document_manager.get_document_with_current_version(
-        doc_uuid
+    document = await document_manager.get_document_by_id(doc_uuid)
+    if document is None or not has_document_access(
+        user.access_levels, document.access_levels
+    ):
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    page = await document_manager.get_versions_for_document(
+        doc_uuid,
+        limit=limit,
+        after=decode_cursor(cursor, (Int32,)),
     )
-    if version is None:
+
+    return DocumentVersionListResponse(
+        items=[
+            DocumentVersionListItem(
+                version_id=item.version.id,
+                version=item.version.version,
+                file_name=item.version.file_name,
+                file_type=item.version.file_type,
+                file_size=item.version.file_size,
+                status=item.version.status,
+                is_current=item.version.is_current,
+                upload_date=item.version.upload_date,
+                valid_from=item.version.valid_from,
+                valid_to=item.version.valid_to,
+                change_notes=item.version.change_notes,
+            )
+            for item in page.items
+        ],
+        next_cursor=encode_cursor(page.next_key),
+    )
+
+
+async def _load_version_for_user(
+    document_id: str,
+    version_id: Optional[str],
+    *,
+    user,
+    document_manager: DocumentManager,
+) -> DocumentVersion:
+    try:
+        doc_uuid = UUID(document_id)
+        ver_uuid = UUID(version_id) if version_id is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid document id")
+
+    found = await document_manager.get_version_for_file(doc_uuid, ver_uuid)
+    if found is None:
         raise HTTPException(status_code=404, detail="Document version not found")
+    access_levels, version = found
 
-    if not has_document_access(user.access_levels, document.access_levels):
+    if not has_document_access(user.access_levels, access_levels):
         raise HTTPException(status_code=404, detail="Document not found")
 
-    file_path = (DOC_STORAGE_DIR / version.storage_key).resolve()
+    return version
+
 
+async def _serve_version_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    *,
+    document_id: str,
+    version_id: Optional[str],
+    user,
+    document_manager: DocumentManager,
+    audit_manager: Optional[AuditManager],
+    disposition: str,
+) -> Response:
+    version = await _load_version_for_user(
+        document_id, version_id, user=user, document_manager=document_manager
+    )
+
+    # по id версии содержимое неизменно, «текущая» же может смениться
+    cache_control = (
+        CACHE_CONTROL_IMMUTABLE if version_id is not None else CACHE_CONTROL_REVALIDATE
+    )
+    etag = version_etag(version)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    file_path = (DOC_STORAGE_DIR / version.storage_key).resolve()
     if not file_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
 
-    mime_type, _ = mimetypes.guess_type(version.file_name)
-    if mime_type is None:
-        mime_type = version.file_type or "application/octet-stream"
+    if disposition == "inline":
+        media_type, _ = mimetypes.guess_type(version.file_name)
+        media_type = media_type or version.file_type or "application/octet-stream"
+        extra_headers = {"Cross-Origin-Resource-Policy": "cross-origin"}
+    else:
+        media_type = version.file_type or "application/octet-stream"
+        extra_headers = None
+
+    # просмотр фиксируем один раз, а не на каждый докачиваемый диапазон
+    range_header = request.headers.get("range", "")
+    if audit_manager is not None and (
+        not range_header or range_header.replace(" ", "").startswith("bytes=0-")
+    ):
+        background_tasks.add_task(
+            audit_manager.log_event,
+            user_id=user.id,
+            action="view",
+            entity_type="document",
+            entity_id=str(version.document_id),
+            meta={
+                "version_id": str(version.id),
+                "preview": True,
+            },
+        )
 
-    await audit_manager.log_event(
-        user_id=user.id,
-        action="view",
-        entity_type="document",
-        entity_id=str(document.id),
-        meta={
-            "version_id": str(version.id),
-            "preview": True,
+    return version_file_response(
+        file_path,
+        version=version,
+        media_type=media_type,
+        disposition=disposition,
+        etag=etag,
+        cache_control=cache_control,
+        extra_headers=extra_headers,
+    )
+
+
+@router.get(
+    "/{document_id}/preview",
+)
+async def preview_document_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    document_id: str,
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+    audit_manager: AuditManager = Depends(get_audit_manager),
+):
+    return await _serve_version_file(
+        request,
+        background_tasks,
+        document_id=document_id,
+        version_id=None,
+        user=user,
+        document_manager=document_manager,
+        audit_manager=audit_manager,
+        disposition="inline",
+    )
+
+
+@router.get(
+    "/{document_id}/versions/{version_id}/preview",
+)
+async def preview_document_version_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    document_id: str,
+    version_id: str,
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+    audit_manager: AuditManager = Depends(get_audit_manager),
+):
+    return await _serve_version_file(
+        request,
+        background_tasks,
+        document_id=document_id,
+        version_id=version_id,
+        user=user,
+        document_manager=document_manager,
+        audit_manager=audit_manager,
+        disposition="inline",
+    )
+
+
+def _preview_etag(version: DocumentVersion, suffix: str) -> str:
+    return f'{version_etag(version)[:-1]}-{suffix}"'
+
+
+def _preview_image_response(image: Optional[bytes], etag: str) -> Response:
+    if image is None:
+        raise HTTPException(status_code=404, detail="Preview not available")
+
+    return Response(
+        content=image,
+        media_type="image/jpeg",
+        headers={
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL_IMMUTABLE,
+            "Cross-Origin-Resource-Policy": "cross-origin",
         },
     )
 
-    response = FileResponse(path=file_path, media_type=mime_type)
-    response.headers["Content-Disposition"] = f'inline; filename="{version.file_name}"'
-    response.headers["Cross-Origin-Resource-Policy"] = "cross-origin"
 
-    return response
+@router.get(
+    "/{document_id}/versions/{version_id}/thumbnail",
+)
+async def get_document_version_thumbnail(
+    request: Request,
+    document_id: str,
+    version_id: str,
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+    preview_service: PreviewService = Depends(get_preview_service),
+):
+    version = await _load_version_for_user(
+        document_id, version_id, user=user, document_manager=document_manager
+    )
+    etag = _preview_etag(version, "thumb")
+    if etag_matches(request, etag):
+        return not_modified(etag, CACHE_CONTROL_IMMUTABLE)
+
+    image = await preview_service.get_thumbnail(version.storage_key)
+    return _preview_image_response(image, etag)
+
+
+@router.get(
+    "/{document_id}/versions/{version_id}/pages/{page}",
+)
+async def get_document_version_page_image(
+    request: Request,
+    document_id: str,
+    version_id: str,
+    page: int,
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+    preview_service: PreviewService = Depends(get_preview_service),
+):
+    version = await _load_version_for_user(
+        document_id, version_id, user=user, document_manager=document_manager
+    )
+    etag = _preview_etag(version, f"p{page}")
+    if etag_matches(request, etag):
+        return not_modified(etag, CACHE_CONTROL_IMMUTABLE)
+
+    image = await preview_service.get_page(version.storage_key, page)
+    return _preview_image_response(image, etag)
 
 
 @router.post(
@@ -540,32 +1007,40 @@ async def get_all_file_types(
 
 @router.get("/{document_id}/download")
 async def download_document(
+    request: Request,
+    background_tasks: BackgroundTasks,
     document_id: str,
     user=Depends(require_permission("documents.read")),
     document_manager: DocumentManager = Depends(get_document_manager),
 ):
-    try:
-        doc_uuid = UUID(document_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid document id")
-
-    document, version = await document_manager.get_document_with_current_version(
-        doc_uuid
+    return await _serve_version_file(
+        request,
+        background_tasks,
+        document_id=document_id,
+        version_id=None,
+        user=user,
+        document_manager=document_manager,
+        audit_manager=None,
+        disposition="attachment",
     )
-    if version is None:
-        raise HTTPException(status_code=404, detail="Document version not found")
-
-    if not has_document_access(user.access_levels, document.access_levels):
-        raise HTTPException(status_code=404, detail="Document not found")
 
-    storage_key = version.storage_key
-    file_path = os.path.join(DOC_STORAGE_DIR, storage_key)
 
-    if not os.path.isfile(file_path):
-        raise HTTPException(status_code=404, detail="File not found on server")
-
-    return FileResponse(
-        file_path,
-        media_type=version.file_type or "application/octet-stream",
-        filename=version.file_name,
+@router.get("/{document_id}/versions/{version_id}/download")
+async def download_document_version(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    document_id: str,
+    version_id: str,
+    user=Depends(require_permission("documents.read")),
+    document_manager: DocumentManager = Depends(get_document_manager),
+):
+    return await _serve_version_file(
+        request,
+        background_tasks,
+        document_id=document_id,
+        version_id=version_id,
+        user=user,
+        document_manager=document_manager,
+        audit_manager=None,
+        disposition="attachment",
     )
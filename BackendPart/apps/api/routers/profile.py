@@ -1,18 +1,27 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from apps.api.deps import (
     get_current_user,
     get_user_manager,
     get_audit_manager,
+    get_workspace_manager,
 )
+from apps.core.pagination import decode_cursor, encode_cursor
 from database.managers.user_manager import UserManager
 from database.managers.audit_manager import AuditManager
+from database.managers.workspace_manager import WorkspaceManager
 from apps.api.schemas.profile import (
     ProfileResponse,
     ProfileUpdateRequest,
     ProfileActivityResponse,
     ProfileRecentActionsResponse,
     ProfileRecentAction,
+    ProfileQueryHistoryItem,
+    ProfileQueryHistoryResponse,
 )
 from apps.services.profile_service import ProfileService
 
@@ -114,8 +123,13 @@ async def get_profile_recent_actions(
     user=Depends(get_current_user),
     service: ProfileService = Depends(get_profile_service),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
 ):
-    rows = await service.get_recent_actions(user.id, limit=limit)
+    page = await service.get_recent_actions(
+        user.id,
+        limit=limit,
+        after=decode_cursor(cursor, (datetime, int)),
+    )
 
     items = [
         ProfileRecentAction(
@@ -125,7 +139,37 @@ async def get_profile_recent_actions(
             meta=row["meta"],
             created_at=row["created_at"],
         )
-        for row in rows
+        for row in page.items
     ]
 
-    return ProfileRecentActionsResponse(items=items)
+    return ProfileRecentActionsResponse(
+        items=items,
+        next_cursor=encode_cursor(page.next_key),
+    )
+
+
+@router.get("/me/queries", response_model=ProfileQueryHistoryResponse)
+async def get_profile_queries(
+    user=Depends(get_current_user),
+    workspace_manager: WorkspaceManager = Depends(get_workspace_manager),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+):
+    page = await workspace_manager.list_queries_for_user(
+        user.id,
+        limit=limit,
+        after=decode_cursor(cursor, (datetime, UUID)),
+    )
+
+    return ProfileQueryHistoryResponse(
+        items=[
+            ProfileQueryHistoryItem(
+                id=row["id"],
+                question=row["question"],
+                filters=row["filters"],
+                created_at=row["created_at"],
+            )
+            for row in page.items
+        ],
+        next_cursor=encode_cursor(page.next_key),
+    )
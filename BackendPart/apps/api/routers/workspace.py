@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
 from uuid import UUID
 
 from apps.api.deps import get_audit_manager, get_current_user, get_document_manager, get_workspace_manager
@@ -9,9 +10,11 @@ from apps.api.schemas.collection import (
     CollectionCreateRequest,
     CollectionCreateResponse,
     CollectionDocument,
+    CollectionItemsResponse,
+    CollectionListResponse,
     CollectionWithDocuments,
-    
 )
+from apps.core.pagination import decode_cursor, encode_cursor
 from apps.core.security import has_document_access
 from database.managers.audit_manager import AuditManager
 from database.managers.document_manager import DocumentManager
@@ -57,74 +60,92 @@ async def create_collection(
 
 @router.get(
     "",
-    response_model=List[CollectionWithDocuments],
+    response_model=CollectionListResponse,
 )
 async def list_collections_with_documents(
     user=Depends(get_current_user),
     workspace_manager: WorkspaceManager = Depends(get_workspace_manager),
-    document_manager: DocumentManager = Depends(get_document_manager),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    items_limit: int = Query(100, ge=1, le=500),
 ):
-    collections = await workspace_manager.list_collections_for_user(user.id)
-    if not collections:
-        return []
-
-    collection_docs_map: Dict[UUID, List[UUID]] = {}
-    all_doc_ids: set[UUID] = set()
-
-    for col in collections:
-        items = await workspace_manager.list_items_for_collection(col.id)
-        doc_ids = [item.document_id for item in items]
-        collection_docs_map[col.id] = doc_ids
-        all_doc_ids.update(doc_ids)
+    page = await workspace_manager.list_collections_with_documents(
+        user.id,
+        user_access_levels=list(user.access_levels or []),
+        limit=limit,
+        after=decode_cursor(cursor, (datetime, UUID)),
+        items_limit=items_limit,
+    )
 
-    if not all_doc_ids:
-        return [
+    return CollectionListResponse(
+        items=[
             CollectionWithDocuments(
-                id=col.id,
-                name=col.name,
-                created_at=col.created_at,
-                documents_count=0,
-                documents=[],
-            )
-            for col in collections
-        ]
-
-    documents = await document_manager.get_documents_by_ids(all_doc_ids)
-    docs_by_id = {doc.id: doc for doc in documents}
-
-    result: List[CollectionWithDocuments] = []
-
-    for col in collections:
-        docs_for_collection: List[CollectionDocument] = []
-
-        for doc_id in collection_docs_map.get(col.id, []):
-            doc = docs_by_id.get(doc_id)
-            if doc is None:
-                continue
-
-            docs_for_collection.append(
-                CollectionDocument(
-                    document_id=doc.id,
-                    title=doc.title,
-                    department_id=doc.department_id,
-                    access_levels=doc.access_levels,
-                    tags=doc.tags,
-                    is_actual=doc.is_valid,
-                    upload_date=doc.upload_date,
-                )
+                id=row["id"],
+                name=row["name"],
+                created_at=row["created_at"],
+                documents_count=row["documents_count"],
+                documents=[
+                    CollectionDocument(
+                        document_id=doc["document_id"],
+                        title=doc["title"],
+                        department_id=doc["department_id"],
+                        access_levels=doc["access_levels"] or [],
+                        tags=doc["tags"] or [],
+                        is_actual=doc["is_valid"],
+                        upload_date=doc["upload_date"],
+                    )
+                    for doc in row["documents"]
+                ],
+                documents_next_cursor=encode_cursor(row["documents_next_key"]),
             )
+            for row in page.items
+        ],
+        next_cursor=encode_cursor(page.next_key),
+    )
 
-        result.append(
-            CollectionWithDocuments(
-                id=col.id,
-                name=col.name,
-                created_at=col.created_at,
-                documents_count=len(docs_for_collection),
-                documents=docs_for_collection,
-            )
-        )
 
-    return result
+@router.get(
+    "/{collection_id}/items",
+    response_model=CollectionItemsResponse,
+)
+async def list_collection_items(
+    collection_id: str,
+    user=Depends(get_current_user),
+    workspace_manager: WorkspaceManager = Depends(get_workspace_manager),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
+):
+    try:
+        col_uuid = UUID(collection_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid collection id")
+
+    collection = await workspace_manager.get_collection_by_id(col_uuid)
+    if collection is None or collection.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Collection not found")
+
+    page = await workspace_manager.list_collection_documents(
+        col_uuid,
+        user_access_levels=list(user.access_levels or []),
+        limit=limit,
+        after=decode_cursor(cursor, (datetime, UUID)),
+    )
+
+    return CollectionItemsResponse(
+        items=[
+            CollectionDocument(
+                document_id=doc["document_id"],
+                title=doc["title"],
+                department_id=doc["department_id"],
+                access_levels=doc["access_levels"] or [],
+                tags=doc["tags"] or [],
+                is_actual=doc["is_valid"],
+                upload_date=doc["upload_date"],
+            )
+            for doc in page.items
+        ],
+        next_cursor=encode_cursor(page.next_key),
+    )
 
 
 @router.post(
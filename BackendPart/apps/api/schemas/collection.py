@@ -14,12 +14,24 @@ class CollectionDocument(BaseModel):
     upload_date: datetime
 
 
+class CollectionItemsResponse(BaseModel):
+    items: List[CollectionDocument]
+    next_cursor: Optional[str] = None
+
+
 class CollectionWithDocuments(BaseModel):
     id: UUID
     name: str
     created_at: datetime
     documents_count: int
     documents: List[CollectionDocument]
+    # продолжение списка документов: GET /collections/{id}/items?cursor=...
+    documents_next_cursor: Optional[str] = None
+
+
+class CollectionListResponse(BaseModel):
+    items: List[CollectionWithDocuments]
+    next_cursor: Optional[str] = None
 
 
 class CollectionCreateRequest(BaseModel):
@@ -1,5 +1,48 @@
+from datetime import date, datetime
+from typing import List, Optional
+from uuid import UUID
+
 from pydantic import BaseModel
 
 
 class FileTypesResponse(BaseModel):
     types: list[str]
+
+
+class DocumentListItem(BaseModel):
+    document_id: UUID
+    title: str
+    department_id: Optional[int]
+    access_levels: List[str]
+    tags: List[str]
+    status: str
+    is_actual: bool
+    upload_date: datetime
+
+    version_id: Optional[UUID]
+    file_name: Optional[str]
+    file_type: Optional[str]
+
+
+class DocumentListResponse(BaseModel):
+    items: List[DocumentListItem]
+    next_cursor: Optional[str] = None
+
+
+class DocumentVersionListItem(BaseModel):
+    version_id: UUID
+    version: int
+    file_name: str
+    file_type: str
+    file_size: int
+    status: str
+    is_current: bool
+    upload_date: datetime
+    valid_from: Optional[date]
+    valid_to: Optional[date]
+    change_notes: Optional[str]
+
+
+class DocumentVersionListResponse(BaseModel):
+    items: List[DocumentVersionListItem]
+    next_cursor: Optional[str] = None
@@ -18,3 +18,4 @@ class DocumentViewResponse(BaseModel):
 
     file_name: str
     storage_key: str
+    content_sha256: Optional[str] = None
@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -20,6 +20,12 @@ class DocumentSearchRequest(BaseModel):
     tags: Optional[List[str]] = None
     extensions: Optional[List[str]] = None
 
+    mode: Literal["answer", "documents"] = Field(
+        "answer",
+        description="answer — ответ RAG с источниками, documents — только документы (полнотекстовый поиск)",
+    )
+    limit: int = Field(20, ge=1, le=100, description="Сколько документов вернуть в режиме documents")
+
 
 class DocumentSearchItem(BaseModel):
     document_id: UUID
@@ -28,9 +34,15 @@ class DocumentSearchItem(BaseModel):
     is_actual: bool
     date: datetime
     tags: List[str] | None
+    version_id: Optional[UUID] = None
+    # миниатюра первой страницы вместо загрузки всего файла
+    thumbnail_url: Optional[str] = None
 
 
 class DocumentSearchResponse(BaseModel):
     query_id: UUID
     answer: str
     items: List[DocumentSearchItem]
+    mode: Literal["rag", "lexical"] = "rag"
+    # RAG недоступен — выдача из полнотекстового поиска, без ответа
+    degraded: bool = False
@@ -1,4 +1,5 @@
-from typing import List, Literal
+from datetime import datetime
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -22,3 +23,55 @@ class DocumentModerateResponse(BaseModel):
     version_id: UUID
     document_status: str
     version_status: str
+
+
+class DocumentUploadAcceptedResponse(DocumentModerateResponse):
+    content_sha256: str
+    delivery_status: str = Field(
+        ...,
+        description="Передача файла в RAG (ingest_outbox): pending/delivered/failed. "
+                    "delivered — MLPart принял файл в фоновую индексацию, а не проиндексировал его",
+    )
+    status_url: str
+
+
+class BulkUploadRejectedFile(BaseModel):
+    file_name: str
+    reason: str
+
+
+class BulkUploadAcceptedResponse(BaseModel):
+    batch_id: UUID
+    files_total: int
+    accepted: int
+    rejected: List[BulkUploadRejectedFile]
+    status_url: str
+
+
+class BulkUploadStatusResponse(BaseModel):
+    batch_id: UUID
+    created_at: datetime
+    files_total: int
+    rejected: List[BulkUploadRejectedFile]
+
+    documents: int
+    # доставка в RAG (ingest_outbox)
+    pending: int
+    delivered: int
+    failed: int
+    # распознанный текст уже в document_texts
+    indexed: int
+
+
+class DocumentIngestStatusResponse(BaseModel):
+    document_id: UUID
+    version_id: UUID
+    status: str = Field(
+        ...,
+        description="Статус доставки в RAG: pending/delivered/failed. delivered означает, что MLPart "
+                    "принял файл в фоновую индексацию; готовность к поиску этот статус не подтверждает",
+    )
+    attempts: int
+    last_error: Optional[str]
+    created_at: datetime
+    delivered_at: Optional[datetime]
@@ -56,3 +56,16 @@ class ProfileRecentAction(BaseModel):
 
 class ProfileRecentActionsResponse(BaseModel):
     items: List[ProfileRecentAction]
+    next_cursor: Optional[str] = None
+
+
+class ProfileQueryHistoryItem(BaseModel):
+    id: UUID
+    question: str
+    filters: Optional[dict]
+    created_at: datetime
+
+
+class ProfileQueryHistoryResponse(BaseModel):
+    items: List[ProfileQueryHistoryItem]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,76 @@
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from database.models.document_version import DocumentVersion
+
+# версия документа после записи не меняется: по её id ответ можно
+# кэшировать в браузере без перепроверки
+CACHE_CONTROL_IMMUTABLE = "private, max-age=31536000, immutable"
+# «текущая версия» может смениться — браузер обязан перепроверить ETag
+CACHE_CONTROL_REVALIDATE = "private, no-cache"
+
+
+def version_etag(version: DocumentVersion) -> str:
+    """
+    Сильный ETag по содержимому файла: хэш, а для старых версий без
+    хэша — storage_key, который тоже никогда не переиспользуется.
+    """
+    return f'"{version.content_sha256 or version.storage_key}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match: слабое сравнение, как требует RFC 9110"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    def _opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    target = _opaque(etag)
+    return any(_opaque(tag) == target for tag in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+def content_disposition(kind: str, file_name: str) -> str:
+    # filename* — для кириллицы в именах файлов
+    fallback = file_name.encode("ascii", "replace").decode("ascii").replace('"', "")
+    return f"{kind}; filename=\"{fallback}\"; filename*=UTF-8''{quote(file_name)}"
+
+
+def version_file_response(
+    path: Path,
+    *,
+    version: DocumentVersion,
+    media_type: str,
+    disposition: str,
+    etag: str,
+    cache_control: str,
+    extra_headers: Optional[dict] = None,
+) -> FileResponse:
+    """
+    FileResponse со стабильным ETag. Range/If-Range (частичная загрузка
+    и перемотка PDF) обрабатывает сам FileResponse по этому ETag.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Content-Disposition": content_disposition(disposition, version.file_name),
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+
+    return FileResponse(path=path, media_type=media_type, headers=headers)
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+
+class Int32(int):
+    """Целое поле курсора, которое уходит в параметр int4 (номер версии)"""
+
+
+# границы целых полей: за ними asyncpg не закодирует параметр
+_INT_BOUNDS = {int: 2 ** 63, Int32: 2 ** 31}
+
+
+def encode_cursor(key: Optional[Tuple[Any, ...]]) -> Optional[str]:
+    """Непрозрачный курсор из ключа keyset-пагинации (created_at, id и т.п.)"""
+    if key is None:
+        return None
+
+    def _plain(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, UUID):
+            return str(value)
+        return value
+
+    raw = json.dumps([_plain(v) for v in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence[type]) -> Optional[Tuple[Any, ...]]:
+    """
+    Разбирает курсор в ключ с типами types (datetime, UUID, int, Int32, str).
+    Некорректный курсор — 400.
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor arity mismatch")
+
+        key = []
+        for value, tp in zip(values, types):
+            # datetime и UUID кодируются строками; иное значение — подделанный курсор
+            if tp in (datetime, UUID) and not isinstance(value, str):
+                raise ValueError("cursor value type mismatch")
+            if tp in _INT_BOUNDS:
+                # 1.9 не усекается до 1, а число вне диапазона столбца — не 500
+                bound = _INT_BOUNDS[tp]
+                if isinstance(value, bool) or not isinstance(value, int) or not -bound <= value < bound:
+                    raise ValueError("cursor integer out of range")
+                key.append(int(value))
+            elif tp is datetime:
+                key.append(datetime.fromisoformat(value))
+            else:
+                key.append(tp(value))
+        return tuple(key)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
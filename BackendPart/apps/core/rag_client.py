@@ -0,0 +1,213 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from utils.logger import get_logger
+
+log = get_logger("[RagClient]")
+
+
+class RagServiceError(Exception):
+    """RAG-сервис не ответил или ответил ошибкой"""
+
+    def __init__(self, detail: str, status_code: Optional[int] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class RagUnavailableError(RagServiceError):
+    """Circuit breaker разомкнут — запрос в RAG даже не отправлялся"""
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold ошибок подряд размыкается на reset_timeout секунд,
+    затем пропускает один пробный запрос (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Пробный запрос завершился без исхода (отменён, упал не на сети)"""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            log.info("RAG снова отвечает, circuit breaker замкнут")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                log.warning(
+                    f"RAG: {self._failures} ошибок подряд, circuit breaker разомкнут "
+                    f"на {self.reset_timeout:.0f}с"
+                )
+            self._opened_at = time.monotonic()
+
+
+class RagClient:
+    """
+    Общий на приложение HTTP-клиент к MLPart (rag-api): пул соединений
+    с keep-alive, таймауты на операцию, повторы для идемпотентных вызовов
+    и circuit breaker. У индексации свой breaker: сбои фоновой доставки
+    в ingest не должны размыкать цепь для поиска.
+    """
+
+    RETRY_STATUSES = {502, 503, 504}
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        connect_timeout: float = 3.0,
+        ask_timeout: float = 25.0,
+        ingest_timeout: float = 30.0,
+        retries: int = 2,
+        retry_backoff: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None,
+        ingest_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.connect_timeout = connect_timeout
+        self.ask_timeout = ask_timeout
+        self.ingest_timeout = ingest_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.ingest_breaker = ingest_breaker or CircuitBreaker()
+
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(ask_timeout, connect=connect_timeout),
+        )
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    # ------------------- операции -------------------
+    async def ask(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # /api/ask ничего не меняет на стороне RAG — можно повторять
+        resp = await self._request(
+            "POST",
+            "/api/ask",
+            json=payload,
+            timeout=self.ask_timeout,
+            idempotent=True,
+            breaker=self.breaker,
+        )
+        return resp.json()
+
+    async def ingest(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        resp = await self._request(
+            "POST",
+            "/api/ingest",
+            json=payload,
+            timeout=self.ingest_timeout,
+            idempotent=False,
+            breaker=self.ingest_breaker,
+        )
+        return resp.json()
+
+    # ------------------- internal -------------------
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        timeout: float,
+        idempotent: bool,
+        breaker: CircuitBreaker,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        attempts = 1 + (self.retries if idempotent else 0)
+        last_error: Optional[RagServiceError] = None
+        # сбой сервиса считается в breaker один раз на логический вызов, а не на каждую попытку
+        service_failed = False
+
+        probing = breaker.state == "half_open"
+        if not breaker.allow_request():
+            raise RagUnavailableError("RAG service is temporarily unavailable")
+
+        try:
+            for attempt in range(attempts):
+                try:
+                    resp = await self.client.request(
+                        method,
+                        url,
+                        timeout=httpx.Timeout(timeout, connect=self.connect_timeout),
+                        **kwargs,
+                    )
+                except httpx.RequestError as e:
+                    service_failed = True
+                    last_error = RagServiceError(f"Could not contact RAG service: {e}")
+                    # повторяем только то, что не успело дойти до сервиса
+                    retryable = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                else:
+                    if resp.status_code // 100 == 2:
+                        breaker.record_success()
+                        return resp
+
+                    service_failed = resp.status_code >= 500
+                    last_error = RagServiceError(
+                        f"RAG service returned error: {resp.status_code}",
+                        status_code=resp.status_code,
+                    )
+                    retryable = resp.status_code in self.RETRY_STATUSES
+
+                if not retryable or attempt == attempts - 1:
+                    break
+
+                delay = self.retry_backoff * (2 ** attempt)
+                log.warning(f"{method} {url}: {last_error.detail}, повтор через {delay:.1f}с")
+                await asyncio.sleep(delay)
+
+            if service_failed:
+                breaker.record_failure()
+            else:
+                # 4xx — сервис жив, ошибка в запросе
+                breaker.record_success()
+            raise last_error
+        finally:
+            # отмена (клиент отключился, остановка диспетчера) или неожиданное
+            # исключение не должны оставить breaker с вечно занятой пробой
+            if probing:
+                breaker.release_probe()
@@ -0,0 +1,33 @@
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class ServerTiming:
+    """
+    Длительности этапов обработки запроса для заголовка Server-Timing
+    (видно во вкладке Network браузера). Параллельные этапы
+    пересекаются по времени — total показывает итог.
+    """
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self._stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages.append((name, time.perf_counter() - started))
+
+    async def measure(self, name: str, awaitable: Awaitable[T]) -> T:
+        with self.stage(name):
+            return await awaitable
+
+    def header(self) -> str:
+        stages = self._stages + [("total", time.perf_counter() - self._started)]
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages)
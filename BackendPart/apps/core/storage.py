@@ -1,28 +1,254 @@
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional, Tuple
 from uuid import uuid4
 
 from fastapi import UploadFile
 
 from utils.config import DOC_STORAGE_DIR
 
+# недописанные загрузки лежат в скрытом каталоге внутри хранилища,
+# чтобы финальный os.replace был атомарным (та же файловая система),
+# а RAG-сервис, читающий DOC_STORAGE_DIR/*, их не видел
+INCOMING_DIR = ".incoming"
 
-async def save_document_file(upload: UploadFile) -> tuple[str, str, int, str]:
+
+class FileTooLargeError(Exception):
+    """Источник оказался больше разрешённого размера (например, элемент ZIP-архива)"""
+
+    def __init__(self, file_name: str, max_size: int):
+        super().__init__(f"{file_name}: file exceeds {max_size} bytes")
+        self.file_name = file_name
+        self.max_size = max_size
+
+
+@dataclass
+class StoredFile:
+    file_name: str
+    storage_key: str
+    size: int
+    content_type: str
+    sha256: str
+    # такой же файл уже лежал в хранилище — новый блоб не создавался
+    deduplicated: bool
+    # mtime блоба сразу после записи: если он потом изменился, блоб
+    # переиспользовала другая загрузка и удалять его нельзя
+    committed_mtime_ns: int
+
+
+def storage_key_for(sha256: str, file_name: str) -> str:
+    """Ключ хранения адресуется содержимым: <sha256><расширение>"""
+    return f"{sha256}{Path(file_name).suffix.lower()}"
+
+
+async def save_document_file(upload: UploadFile) -> StoredFile:
+    """
+    Пишет загрузку во временный файл вне event loop, попутно считая SHA-256,
+    и переносит её под ключ по содержимому. Если такой блоб уже есть,
+    временный файл удаляется и переиспользуется существующий.
+    """
     base = Path(DOC_STORAGE_DIR)
-    base.mkdir(parents=True, exist_ok=True)
+    incoming = base / INCOMING_DIR
+    await asyncio.to_thread(incoming.mkdir, parents=True, exist_ok=True)
 
     orig_name = upload.filename or "document"
-    ext = Path(orig_name).suffix
-    key = f"{uuid4()}{ext}"
-    dst = base / key
+    tmp = incoming / f"{uuid4()}.part"
 
+    digest = hashlib.sha256()
     size = 0
-    with dst.open("wb") as f:
+    f = await asyncio.to_thread(tmp.open, "wb")
+    try:
         async for chunk in _iter_file(upload):
-            f.write(chunk)
+            await asyncio.to_thread(_write_chunk, f, digest, chunk)
             size += len(chunk)
+    except BaseException:
+        await asyncio.to_thread(_close_and_unlink, f, tmp)
+        raise
+    await asyncio.to_thread(f.close)
+
+    sha256 = digest.hexdigest()
+    key = storage_key_for(sha256, orig_name)
+    deduplicated, mtime_ns = await asyncio.to_thread(_commit_blob, tmp, base / key)
 
     content_type = upload.content_type or "application/octet-stream"
-    return orig_name, key, size, content_type
+    return StoredFile(
+        file_name=orig_name,
+        storage_key=key,
+        size=size,
+        content_type=content_type,
+        sha256=sha256,
+        deduplicated=deduplicated,
+        committed_mtime_ns=mtime_ns,
+    )
+
+
+async def save_document_stream(
+    source: BinaryIO,
+    file_name: str,
+    content_type: str,
+    *,
+    max_size: Optional[int] = None,
+) -> StoredFile:
+    """
+    То же, что save_document_file, но для синхронного источника — элемента
+    ZIP-архива: чтение, хэш и запись целиком идут в пуле потоков, в памяти
+    одновременно только один фрагмент. Заголовкам архива о размере
+    не верим — max_size проверяется по фактически прочитанным байтам.
+    """
+    base = Path(DOC_STORAGE_DIR)
+    sha256, size, deduplicated, mtime_ns = await asyncio.to_thread(
+        _store_stream_sync, source, base, file_name, max_size
+    )
+    return StoredFile(
+        file_name=file_name,
+        storage_key=storage_key_for(sha256, file_name),
+        size=size,
+        content_type=content_type,
+        sha256=sha256,
+        deduplicated=deduplicated,
+        committed_mtime_ns=mtime_ns,
+    )
+
+
+async def delete_document_file(
+    storage_key: str,
+    *,
+    expected_mtime_ns: Optional[int] = None,
+) -> bool:
+    """
+    Удаляет блоб. Вызывающий обязан убедиться, что на storage_key
+    не ссылается ни одна закоммиченная запись document_versions.
+
+    Незакоммиченную ссылку проверка не видит, но загрузка того же
+    содержимого сначала обновляет mtime блоба (_commit_blob). Поэтому
+    с expected_mtime_ns блоб удаляется, только если его mtime с тех пор
+    не менялся. Возвращает True, если блоб удалён.
+    """
+    path = Path(DOC_STORAGE_DIR) / storage_key
+    return await asyncio.to_thread(_delete_blob, path, expected_mtime_ns)
+
+
+def iter_stored_keys(min_age_seconds: float = 0) -> Iterator[Tuple[str, int]]:
+    """
+    Ключи блобов в хранилище (без временных файлов) с их mtime в нс.
+    min_age_seconds отсекает свежие файлы, запись о которых ещё может
+    быть не закоммичена.
+    """
+    base = Path(DOC_STORAGE_DIR)
+    if not base.is_dir():
+        return
+    deadline = time.time() - min_age_seconds
+    for entry in os.scandir(base):
+        if not entry.is_file() or entry.name.startswith("."):
+            continue
+        stat = entry.stat()
+        if stat.st_mtime <= deadline:
+            yield entry.name, stat.st_mtime_ns
+
+
+def remove_stale_incoming(max_age_seconds: float) -> int:
+    """Удаляет брошенные временные файлы (упавшие посреди загрузки запросы)"""
+    incoming = Path(DOC_STORAGE_DIR) / INCOMING_DIR
+    if not incoming.is_dir():
+        return 0
+
+    removed = 0
+    deadline = time.time() - max_age_seconds
+    for entry in os.scandir(incoming):
+        if entry.is_file() and entry.stat().st_mtime < deadline:
+            Path(entry.path).unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def _write_chunk(f: BinaryIO, digest: Any, chunk: bytes) -> None:
+    digest.update(chunk)
+    f.write(chunk)
+
+
+def _close_and_unlink(f: BinaryIO, path: Path) -> None:
+    f.close()
+    path.unlink(missing_ok=True)
+
+
+def _store_stream_sync(
+    source: BinaryIO,
+    base: Path,
+    file_name: str,
+    max_size: Optional[int],
+    chunk_size: int = 1024 * 1024,
+) -> Tuple[str, int, bool, int]:
+    incoming = base / INCOMING_DIR
+    incoming.mkdir(parents=True, exist_ok=True)
+    tmp = incoming / f"{uuid4()}.part"
+
+    digest = hashlib.sha256()
+    size = 0
+    f = tmp.open("wb")
+    try:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise FileTooLargeError(file_name, max_size)
+            _write_chunk(f, digest, chunk)
+    except BaseException:
+        _close_and_unlink(f, tmp)
+        raise
+    f.close()
+
+    sha256 = digest.hexdigest()
+    deduplicated, mtime_ns = _commit_blob(tmp, base / storage_key_for(sha256, file_name))
+    return sha256, size, deduplicated, mtime_ns
+
+
+def _commit_blob(tmp: Path, dst: Path) -> Tuple[bool, int]:
+    # сначала трогаем существующий блоб: свежий mtime защищает его от
+    # удаления (gc_storage, откат другой загрузки), пока версия не записана
+    try:
+        os.utime(dst)
+    except FileNotFoundError:
+        pass
+    else:
+        tmp.unlink(missing_ok=True)
+        # своим такой блоб не удаляется — отметка не нужна
+        return True, 0
+
+    # mtime берётся у своего временного файла (replace его сохраняет):
+    # у блоба он изменится, только если блоб тронет или заменит другая загрузка
+    mtime_ns = tmp.stat().st_mtime_ns
+    # при гонке двух одинаковых загрузок оба replace кладут одно и то же содержимое
+    os.replace(tmp, dst)
+    return False, mtime_ns
+
+
+def _delete_blob(path: Path, expected_mtime_ns: Optional[int]) -> bool:
+    if expected_mtime_ns is None:
+        path.unlink(missing_ok=True)
+        return True
+
+    # блоб сначала атомарно убирается из-под ключа: загрузка, которая
+    # придёт после этого, не найдёт его и положит свою копию, а та, что
+    # успела его тронуть или заменить, видна по mtime — тогда блоб
+    # возвращается на место
+    trash = path.parent / INCOMING_DIR / f"{uuid4()}.deleting"
+    trash.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.rename(path, trash)
+    except FileNotFoundError:
+        return False
+
+    if trash.stat().st_mtime_ns != expected_mtime_ns:
+        os.replace(trash, path)
+        return False
+    trash.unlink(missing_ok=True)
+    return True
 
 
 async def _iter_file(upload: UploadFile, chunk_size: int = 1024 * 1024):
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from database.managers.audit_manager import AuditManager
+
+from utils.logger import get_logger
+
+log = get_logger("[AuditRetention]")
+
+
+class AuditRetentionService:
+    """
+    Обслуживание секций audit_events: заранее создаёт секции на ближайшие
+    месяцы и удаляет (с выгрузкой в CSV, если задан archive_dir) секции
+    старше retention_months.
+    """
+
+    def __init__(
+        self,
+        audit_manager: AuditManager,
+        *,
+        months_ahead: int = 3,
+        retention_months: int = 0,
+        archive_dir: Optional[Path] = None,
+    ):
+        self.audit_manager = audit_manager
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+
+    async def run_once(self) -> None:
+        created = await self.audit_manager.ensure_partitions(self.months_ahead)
+        log.debug(f"Секции audit_events на месте: {', '.join(created)}")
+
+        if self.retention_months <= 0:
+            return
+
+        cutoff = self._retention_cutoff()
+        partitions = await self.audit_manager.list_partitions_before(cutoff)
+
+        for p in partitions:
+            name = p["partition_name"]
+
+            if self.archive_dir is not None:
+                self.archive_dir.mkdir(parents=True, exist_ok=True)
+                output = self.archive_dir / f"{name}.csv"
+                await self.audit_manager.export_partition(name, output)
+                log.info(f"Секция {name} выгружена в {output}")
+
+            await self.audit_manager.drop_partition(name)
+            log.info(f"Секция {name} удалена (старше {cutoff.isoformat()})")
+
+    async def run_forever(self, interval_seconds: int) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Ошибка обслуживания audit_events: {e}")
+
+            await asyncio.sleep(interval_seconds)
+
+    def _retention_cutoff(self) -> date:
+        today = datetime.now(timezone.utc).date()
+        months = today.year * 12 + (today.month - 1) - self.retention_months
+        return date(months // 12, months % 12 + 1, 1)
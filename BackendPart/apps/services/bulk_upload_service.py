@@ -0,0 +1,264 @@
+import asyncio
+import mimetypes
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from fastapi import UploadFile
+
+from apps.core.storage import (
+    FileTooLargeError,
+    StoredFile,
+    delete_document_file,
+    save_document_file,
+    save_document_stream,
+)
+from database.managers.document_manager import DocumentManager
+from database.models.ingest import BulkDocumentFile
+
+from utils.logger import get_logger
+
+log = get_logger("[BulkUploadService]")
+
+# форматы, которые RAG-сервис умеет распознать
+BULK_UPLOAD_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff", ".html"}
+
+# флаг «имя в UTF-8» в заголовке элемента ZIP
+_ZIP_UTF8_FLAG = 0x800
+
+
+@dataclass
+class BulkUploadResult:
+    batch_id: Optional[UUID]
+    files_total: int
+    stored: List[StoredFile]
+    # (document_id, version_id) в порядке stored
+    documents: List[Tuple[UUID, UUID]]
+    rejected: List[Dict[str, str]]
+
+
+@dataclass
+class _Collector:
+    stored: List[StoredFile] = field(default_factory=list)
+    rejected: List[Dict[str, str]] = field(default_factory=list)
+    seen_sha256: Set[str] = field(default_factory=set)
+    files_total: int = 0
+    total_bytes: int = 0
+
+    def reject(self, file_name: str, reason: str) -> None:
+        self.rejected.append({"file_name": file_name, "reason": reason})
+
+
+class BulkUploadService:
+    """
+    Пакетная загрузка: много файлов и/или ZIP-архивов в одном запросе.
+
+    Каждый файл (и каждый элемент архива) потоково пишется в хранилище
+    по ключу содержимого; архив целиком в память не читается. Файлы,
+    которые нельзя принять, попадают в rejected с причиной и не валят
+    весь пакет. Документы создаются пакетными вставками, а в RAG пакет
+    уходит одним заданием через ingest_outbox.
+    """
+
+    def __init__(
+        self,
+        document_manager: DocumentManager,
+        *,
+        max_files: int,
+        max_file_bytes: int,
+        max_total_bytes: int,
+    ):
+        self.document_manager = document_manager
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+
+    async def upload(
+        self,
+        files: List[UploadFile],
+        *,
+        department_id: int,
+        uploaded_by_id: UUID,
+        tags: List[str],
+    ) -> BulkUploadResult:
+        collector = _Collector()
+        try:
+            for upload in files:
+                name = upload.filename or "document"
+                if PurePosixPath(name).suffix.lower() == ".zip":
+                    await self._store_zip(upload, name, collector)
+                else:
+                    await self._store_upload(upload, name, collector)
+        except BaseException:
+            # уже записанные блобы пакета без документов никому не нужны
+            await self._cleanup(collector.stored)
+            raise
+
+        if not collector.stored:
+            return BulkUploadResult(
+                batch_id=None,
+                files_total=collector.files_total,
+                stored=[],
+                documents=[],
+                rejected=collector.rejected,
+            )
+
+        try:
+            batch_id, documents = await self.document_manager.create_upload_batch(
+                files=[
+                    BulkDocumentFile(
+                        title=PurePosixPath(s.file_name).stem or s.file_name,
+                        file_name=s.file_name,
+                        file_type=s.content_type,
+                        file_size=s.size,
+                        storage_key=s.storage_key,
+                        content_sha256=s.sha256,
+                    )
+                    for s in collector.stored
+                ],
+                department_id=department_id,
+                uploaded_by_id=uploaded_by_id,
+                tags=tags,
+                files_total=collector.files_total,
+                rejected=collector.rejected,
+                change_notes="Bulk upload",
+            )
+        except Exception:
+            await self._cleanup(collector.stored)
+            raise
+
+        log.info(
+            f"Пакет {batch_id}: принято {len(documents)} из {collector.files_total}, "
+            f"отклонено {len(collector.rejected)}"
+        )
+        return BulkUploadResult(
+            batch_id=batch_id,
+            files_total=collector.files_total,
+            stored=collector.stored,
+            documents=documents,
+            rejected=collector.rejected,
+        )
+
+    # ------------------- internal -------------------
+    def _admit(self, name: str, size: Optional[int], collector: _Collector) -> bool:
+        """Проверки до записи в хранилище; size — заявленный размер, если известен"""
+        collector.files_total += 1
+
+        if collector.files_total > self.max_files:
+            collector.reject(name, "too many files in batch")
+            return False
+        if PurePosixPath(name).suffix.lower() not in BULK_UPLOAD_EXTENSIONS:
+            collector.reject(name, "unsupported file type")
+            return False
+        if size is not None:
+            if size == 0:
+                collector.reject(name, "empty file")
+                return False
+            if size > self.max_file_bytes:
+                collector.reject(name, "file too large")
+                return False
+            if collector.total_bytes + size > self.max_total_bytes:
+                collector.reject(name, "batch size limit exceeded")
+                return False
+        return True
+
+    async def _accept(self, stored: StoredFile, collector: _Collector) -> None:
+        if stored.size == 0:
+            collector.reject(stored.file_name, "empty file")
+            return
+        # одинаковое содержимое внутри пакета — один документ
+        if stored.sha256 in collector.seen_sha256:
+            collector.reject(stored.file_name, "duplicate in batch")
+            return
+        # заявленному размеру (заголовок ZIP) не верим — лимит пакета по факту
+        if collector.total_bytes + stored.size > self.max_total_bytes:
+            collector.reject(stored.file_name, "batch size limit exceeded")
+            await self._cleanup([stored])
+            return
+
+        collector.seen_sha256.add(stored.sha256)
+        collector.total_bytes += stored.size
+        collector.stored.append(stored)
+
+    async def _store_upload(self, upload: UploadFile, name: str, collector: _Collector) -> None:
+        if not self._admit(name, upload.size, collector):
+            return
+        stored = await save_document_file(upload)
+        await self._accept(stored, collector)
+
+    async def _store_zip(self, upload: UploadFile, name: str, collector: _Collector) -> None:
+        # UploadFile уже лежит во временном файле — ZipFile читает его с диска
+        try:
+            archive = await asyncio.to_thread(zipfile.ZipFile, upload.file)
+        except zipfile.BadZipFile:
+            collector.files_total += 1
+            collector.reject(name, "invalid zip archive")
+            return
+
+        try:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                entry_name = _zip_entry_name(info)
+                base_name = PurePosixPath(entry_name).name
+                # служебные файлы архиваторов и ОС
+                if not base_name or base_name.startswith(".") or entry_name.startswith("__MACOSX/"):
+                    continue
+
+                if not self._admit(base_name, info.file_size, collector):
+                    continue
+                if info.flag_bits & 0x1:
+                    collector.reject(base_name, "encrypted zip entry")
+                    continue
+
+                content_type = mimetypes.guess_type(base_name)[0] or "application/octet-stream"
+                try:
+                    source = await asyncio.to_thread(archive.open, info)
+                    try:
+                        stored = await save_document_stream(
+                            source,
+                            base_name,
+                            content_type,
+                            max_size=self.max_file_bytes,
+                        )
+                    finally:
+                        source.close()
+                except FileTooLargeError:
+                    collector.reject(base_name, "file too large")
+                    continue
+                except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError) as e:
+                    log.warning(f"Повреждённый элемент {entry_name} в {name}: {e}")
+                    collector.reject(base_name, "corrupted zip entry")
+                    continue
+
+                await self._accept(stored, collector)
+        finally:
+            archive.close()
+
+    async def _cleanup(self, stored: List[StoredFile]) -> None:
+        """Как и при одиночной загрузке: удаляем только свои блобы без ссылок"""
+        for item in stored:
+            if item.deduplicated:
+                continue
+            if await self.document_manager.count_storage_key_references(item.storage_key):
+                continue
+            # mtime изменился — блоб переиспользовала параллельная загрузка
+            await delete_document_file(
+                item.storage_key, expected_mtime_ns=item.committed_mtime_ns
+            )
+
+
+def _zip_entry_name(info: zipfile.ZipInfo) -> str:
+    """
+    Архивы из Windows пишут имена в OEM-кодировке без флага UTF-8;
+    zipfile декодирует их как cp437, а кириллица там — cp866.
+    """
+    if info.flag_bits & _ZIP_UTF8_FLAG:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("cp866")
+    except UnicodeError:
+        return info.filename
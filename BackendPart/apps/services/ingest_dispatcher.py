@@ -0,0 +1,148 @@
+import asyncio
+
+from apps.core.rag_client import RagClient, RagServiceError, RagUnavailableError
+from database.managers.ingest_manager import IngestOutboxManager
+
+from utils.logger import get_logger
+
+log = get_logger("[IngestDispatcher]")
+
+
+class IngestDispatcher:
+    """
+    Фоновая доставка записей ingest_outbox в RAG-сервис пачками.
+    Недоступность RAG (нет соединения, 502-504, разомкнутый breaker) —
+    повтор через transient_retry_seconds без учёта попытки, сколько бы
+    ни длился простой; ошибка RAG на сам запрос — попытка с экспоненциальной
+    задержкой до max_backoff_seconds, после max_attempts — failed
+    (вернуть в очередь: scripts.requeue_ingest). Файл, которого RAG
+    не нашёл, — сразу failed. Уже проиндексированное содержимое
+    (тот же storage_key) отправляется как есть: MLPart пропускает его
+    по своему журналу, а неудачную индексацию повторяет.
+    Файлы пакетной загрузки добираются до bulk_max_files и уходят
+    в RAG одним запросом — одним заданием индексации.
+    """
+
+    def __init__(
+        self,
+        outbox_manager: IngestOutboxManager,
+        rag_client: RagClient,
+        *,
+        batch_size: int = 20,
+        poll_interval: float = 2.0,
+        lease_seconds: int = 120,
+        max_attempts: int = 8,
+        backoff_seconds: float = 5.0,
+        max_backoff_seconds: float = 600.0,
+        transient_retry_seconds: float = 30.0,
+        bulk_max_files: int = 1000,
+    ):
+        self.outbox_manager = outbox_manager
+        self.rag_client = rag_client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.transient_retry_seconds = transient_retry_seconds
+        self.bulk_max_files = bulk_max_files
+        self._wakeup = asyncio.Event()
+
+    def notify(self) -> None:
+        """Разбудить диспетчер, не дожидаясь poll_interval"""
+        self._wakeup.set()
+
+    async def dispatch_once(self) -> int:
+        items = await self.outbox_manager.claim_batch(
+            limit=self.batch_size,
+            lease_seconds=self.lease_seconds,
+        )
+        if not items:
+            return 0
+
+        batch_ids = {item.batch_id for item in items if item.batch_id}
+        if batch_ids:
+            items += await self.outbox_manager.claim_batch_members(
+                batch_ids,
+                limit=self.bulk_max_files - len(items),
+                lease_seconds=self.lease_seconds,
+            )
+
+        by_key = {}
+        refs = {}
+        for item in items:
+            by_key.setdefault(item.storage_key, []).append(item.id)
+            # общий блоб нескольких документов индексируется один раз;
+            # остальные находятся при поиске по тому же storage_key
+            refs.setdefault(item.storage_key, {
+                "filename": item.storage_key,
+                "document_id": str(item.document_id),
+                "version_id": str(item.version_id),
+            })
+
+        try:
+            result = await self.rag_client.ingest({"files": [refs[key] for key in by_key]})
+        except RagServiceError as e:
+            ids = [i for key_ids in by_key.values() for i in key_ids]
+            if self._is_transient(e):
+                log.warning(
+                    f"RAG недоступен, {len(by_key)} файлов отложено "
+                    f"на {self.transient_retry_seconds:.0f}с: {e.detail}"
+                )
+                await self.outbox_manager.defer(
+                    ids, error=e.detail, delay_seconds=self.transient_retry_seconds
+                )
+            else:
+                log.warning(f"Не удалось передать {len(by_key)} файлов в RAG: {e.detail}")
+                await self.outbox_manager.mark_retry(
+                    ids,
+                    error=e.detail,
+                    max_attempts=self.max_attempts,
+                    backoff_seconds=self.backoff_seconds,
+                    max_backoff_seconds=self.max_backoff_seconds,
+                )
+            return len(items)
+
+        missing = set(result.get("missing") or [])
+        delivered_ids = [i for key, ids in by_key.items() if key not in missing for i in ids]
+        missing_ids = [i for key, ids in by_key.items() if key in missing for i in ids]
+
+        await self.outbox_manager.mark_delivered(delivered_ids)
+        await self.outbox_manager.mark_failed(
+            missing_ids, error="File not found by RAG service"
+        )
+
+        log.info(
+            f"В RAG передано файлов: {len(delivered_ids)}, не найдено: {len(missing_ids)}"
+        )
+        return len(items)
+
+    @staticmethod
+    def _is_transient(error: RagServiceError) -> bool:
+        """Сервис не ответил или недоступен — файлы тут ни при чём"""
+        return (
+            isinstance(error, RagUnavailableError)
+            or error.status_code is None
+            or error.status_code in RagClient.RETRY_STATUSES
+        )
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                processed = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Ошибка доставки ingest_outbox: {e}")
+                processed = 0
+
+            # полная пачка — скорее всего, в очереди есть ещё
+            if processed >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
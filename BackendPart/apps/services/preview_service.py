@@ -0,0 +1,220 @@
+import asyncio
+import contextlib
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+import pymupdf
+
+from utils.logger import get_logger
+
+log = get_logger("[PreviewService]")
+
+# то, что PyMuPDF умеет открыть как документ; HTML превью не получает
+RENDERABLE_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff"}
+
+THUMBNAIL_NAME = "thumb.jpg"
+READY_MARKER = ".ready"
+
+
+class PreviewService:
+    """
+    Миниатюры первой страницы и страницы в низком разрешении.
+
+    Рендер идёт в пуле потоков после загрузки (schedule) или по первому
+    запросу. Кэш лежит на диске по storage_key — одинаковые файлы делят
+    превью — и ограничен max_bytes: при переполнении удаляются каталоги,
+    к которым дольше всего не обращались. Изображение отдаётся байтами:
+    каталог может быть вытеснен сразу после проверки, и путь к файлу
+    к моменту отправки ответа мог бы уже не существовать.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        storage_dir: Path,
+        *,
+        max_bytes: int,
+        thumb_width: int = 240,
+        page_width: int = 900,
+        max_pages: int = 20,
+        jpeg_quality: int = 70,
+        concurrency: int = 2,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.storage_dir = Path(storage_dir)
+        self.max_bytes = max_bytes
+        self.thumb_width = thumb_width
+        self.page_width = page_width
+        self.max_pages = max_pages
+        self.jpeg_quality = jpeg_quality
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._size: Optional[int] = None
+        self._evict_lock = asyncio.Lock()
+
+    @staticmethod
+    def is_renderable(file_name: str) -> bool:
+        return Path(file_name).suffix.lower() in RENDERABLE_EXTENSIONS
+
+    # ------------------- API -------------------
+    def schedule(self, storage_key: str) -> None:
+        """Поставить рендер в фон сразу после загрузки"""
+        if not self.is_renderable(storage_key):
+            return
+        task = asyncio.create_task(self._ensure_rendered(storage_key))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def get_thumbnail(self, storage_key: str) -> Optional[bytes]:
+        return await self._get(storage_key, THUMBNAIL_NAME)
+
+    async def get_page(self, storage_key: str, page: int) -> Optional[bytes]:
+        if page < 1 or page > self.max_pages:
+            return None
+        return await self._get(storage_key, self._page_name(page))
+
+    async def aclose(self) -> None:
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+    # ------------------- internal -------------------
+    async def _get(self, storage_key: str, name: str) -> Optional[bytes]:
+        if not self.is_renderable(storage_key):
+            return None
+
+        target_dir = self._dir_for(storage_key)
+        # между проверкой готовности и чтением каталог может вытеснить
+        # _account другого запроса — тогда превью рендерится заново
+        for _ in range(2):
+            if not (target_dir / READY_MARKER).exists():
+                if not await self._ensure_rendered(storage_key):
+                    return None
+
+            try:
+                data = await asyncio.to_thread((target_dir / name).read_bytes)
+            except FileNotFoundError:
+                if (target_dir / READY_MARKER).exists():
+                    # превью готово, но такой страницы в документе нет
+                    return None
+                continue
+
+            # время доступа для вытеснения; atime часто отключён (noatime)
+            with contextlib.suppress(FileNotFoundError):
+                await asyncio.to_thread(os.utime, target_dir)
+            return data
+        return None
+
+    async def _ensure_rendered(self, storage_key: str) -> bool:
+        # параллельные запросы одного файла ждут один и тот же рендер
+        task = self._in_flight.get(storage_key)
+        if task is None:
+            task = asyncio.create_task(self._render(storage_key))
+            self._in_flight[storage_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(storage_key, None))
+        return await asyncio.shield(task)
+
+    async def _render(self, storage_key: str) -> bool:
+        target_dir = self._dir_for(storage_key)
+        if (target_dir / READY_MARKER).exists():
+            return True
+
+        source = self.storage_dir / storage_key
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(self._render_sync, source, target_dir)
+            except Exception as e:
+                log.warning(f"Не удалось построить превью {storage_key}: {e}")
+                await asyncio.to_thread(shutil.rmtree, target_dir, True)
+                return False
+
+        log.info(
+            f"Превью {storage_key}: {written // 1024} КБ "
+            f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+        )
+        await self._account(written)
+        return True
+
+    def _render_sync(self, source: Path, target_dir: Path) -> int:
+        tmp_dir = target_dir.with_name(target_dir.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        written = 0
+        with pymupdf.open(source) as doc:
+            for index in range(min(doc.page_count, self.max_pages)):
+                page = doc.load_page(index)
+                widths = [(self._page_name(index + 1), self.page_width)]
+                if index == 0:
+                    widths.append((THUMBNAIL_NAME, self.thumb_width))
+
+                for name, width in widths:
+                    zoom = width / max(page.rect.width, 1)
+                    pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+                    data = pix.tobytes("jpeg", jpg_quality=self.jpeg_quality)
+                    (tmp_dir / name).write_bytes(data)
+                    written += len(data)
+
+        (tmp_dir / READY_MARKER).touch()
+        shutil.rmtree(target_dir, ignore_errors=True)
+        os.replace(tmp_dir, target_dir)
+        return written
+
+    async def _account(self, added: int) -> None:
+        async with self._evict_lock:
+            if self._size is None:
+                self._size = await asyncio.to_thread(self._scan_size)
+            else:
+                self._size += added
+
+            if self._size > self.max_bytes:
+                self._size = await asyncio.to_thread(self._evict, self._size)
+
+    def _scan_size(self) -> int:
+        total = 0
+        for entry in self._iter_dirs():
+            total += _dir_size(entry.path)
+        return total
+
+    def _evict(self, size: int) -> int:
+        # вытесняем до 90% лимита, чтобы не чистить на каждом рендере
+        goal = int(self.max_bytes * 0.9)
+        entries = sorted(self._iter_dirs(), key=lambda e: e.stat().st_mtime)
+        removed = 0
+        for entry in entries:
+            if size <= goal:
+                break
+            if entry.name in self._in_flight:
+                continue
+            dir_size = _dir_size(entry.path)
+            shutil.rmtree(entry.path, ignore_errors=True)
+            size -= dir_size
+            removed += 1
+
+        log.info(f"Кэш превью: вытеснено {removed}, занято {size // (1024 * 1024)} МБ")
+        return size
+
+    def _iter_dirs(self):
+        if not self.cache_dir.is_dir():
+            return []
+        return [
+            e for e in os.scandir(self.cache_dir)
+            if e.is_dir() and not e.name.endswith(".tmp")
+        ]
+
+    def _dir_for(self, storage_key: str) -> Path:
+        return self.cache_dir / storage_key
+
+    @staticmethod
+    def _page_name(page: int) -> str:
+        return f"page-{page:04d}.jpg"
+
+
+def _dir_size(path: str) -> int:
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Optional, Tuple
 from uuid import UUID
 
 from database.managers.user_manager import UserManager
@@ -32,7 +34,12 @@ class ProfileService:
         )
 
     async def get_activity(self, user_id: UUID):
-        return await self.audit_manager.get_user_activity_summary(user_id)
+        return await self.audit_manager.get_user_activity_counters(user_id)
 
-    async def get_recent_actions(self, user_id: UUID, limit: int = 10):
-        return await self.audit_manager.get_user_recent_actions(user_id, limit)
+    async def get_recent_actions(
+        self,
+        user_id: UUID,
+        limit: int = 10,
+        after: Optional[Tuple[datetime, int]] = None,
+    ):
+        return await self.audit_manager.get_user_recent_actions(user_id, limit, after)
@@ -0,0 +1,112 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from database.managers.document_manager import DocumentManager
+
+from utils.logger import get_logger
+
+log = get_logger("[TextIndexService]")
+
+
+class TextIndexService:
+    """
+    Переносит распознанный RAG-сервисом текст (<stem>.txt в общем
+    каталоге) в document_texts для полнотекстового поиска.
+
+    Каталог просматривается только по stat(): файлы старше уже
+    обработанного mtime пропускаются, а содержимое читается лишь для
+    ключей, которых ещё нет в БД.
+    """
+
+    def __init__(
+        self,
+        document_manager: DocumentManager,
+        text_dir: Path,
+        storage_dir: Path,
+        *,
+        poll_interval: float = 30.0,
+        batch_size: int = 50,
+    ):
+        self.document_manager = document_manager
+        self.text_dir = Path(text_dir)
+        self.storage_dir = Path(storage_dir)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._watermark = 0.0
+
+    async def index_once(self) -> int:
+        found, newest = await asyncio.to_thread(self._scan, self._watermark)
+        if not found:
+            self._watermark = newest
+            return 0
+
+        saved = 0
+        for i in range(0, len(found), self.batch_size):
+            batch = found[i:i + self.batch_size]
+            known = await self.document_manager.get_indexed_text_keys(
+                [key for key, _ in batch]
+            )
+            pending = [(key, path) for key, path in batch if key not in known]
+            if not pending:
+                continue
+
+            texts = await asyncio.to_thread(self._read_texts, pending)
+            saved += await self.document_manager.save_document_texts(texts)
+
+        self._watermark = newest
+        if saved:
+            log.info(f"В document_texts добавлено текстов: {saved}")
+        return saved
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.index_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Ошибка индексации текстов: {e}")
+
+            await asyncio.sleep(self.poll_interval)
+
+    # ------------------- internal -------------------
+    def _scan(self, watermark: float) -> Tuple[List[Tuple[str, Path]], float]:
+        """
+        Текст <stem>.txt соответствует storage_key <stem><ext>; все
+        расширения одного хэша — это одно и то же содержимое.
+        """
+        if not self.text_dir.is_dir():
+            return [], watermark
+
+        newest = watermark
+        stems: Dict[str, Path] = {}
+        for entry in os.scandir(self.text_dir):
+            if not entry.is_file() or not entry.name.endswith(".txt"):
+                continue
+            mtime = entry.stat().st_mtime
+            if mtime <= watermark:
+                continue
+            newest = max(newest, mtime)
+            stems[entry.name[:-len(".txt")]] = Path(entry.path)
+
+        if not stems:
+            return [], newest
+
+        found = []
+        for storage_entry in os.scandir(self.storage_dir):
+            stem, _ = os.path.splitext(storage_entry.name)
+            if stem in stems:
+                found.append((storage_entry.name, stems[stem]))
+        return found, newest
+
+    @staticmethod
+    def _read_texts(items: List[Tuple[str, Path]]) -> Dict[str, str]:
+        texts = {}
+        for key, path in items:
+            try:
+                texts[key] = path.read_text(encoding="utf-8", errors="replace")
+            except OSError as e:
+                log.warning(f"Не удалось прочитать {path}: {e}")
+        return texts
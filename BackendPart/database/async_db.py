@@ -1,4 +1,5 @@
-from typing import Any, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional
 
 import asyncpg
 from asyncpg.pool import Pool
@@ -78,4 +79,24 @@ class AsyncDatabase:
         
         async with self.pool.acquire() as connection:
             async with connection.transaction():
-                return await connection.fetchval(query, *args, column=column)
\ No newline at end of file
+                return await connection.fetchval(query, *args, column=column)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Соединение с открытой транзакцией — для нескольких запросов,
+        которые должны примениться вместе.
+        """
+        if not self.pool:
+            raise RuntimeError("Database pool is not initialized. Did you forget to call connect()?")
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                yield connection
+
+    async def copy_from_table(self, table_name: str, *, output: Any, **kwargs: Any) -> str:
+        if not self.pool:
+            raise RuntimeError("Database pool is not initialized. Did you forget to call connect()?")
+
+        async with self.pool.acquire() as connection:
+            return await connection.copy_from_table(table_name, output=output, **kwargs)
@@ -1,10 +1,13 @@
 import json
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
 from database.async_db import AsyncDatabase
 from database.managers.base import BaseManager
 from database.models.audit import AuditEvent
+from database.models.pagination import KeysetPage
 
 
 class AuditManager(BaseManager):
@@ -21,27 +24,81 @@ class AuditManager(BaseManager):
         entity_id: Optional[str],
         meta: Optional[Dict[str, Any]] = None,
     ) -> None:
-        meta_json: Optional[str]
-        if meta is None:
-            meta_json = None
-        else:
-            meta_json = json.dumps(meta, ensure_ascii=False)
+        await self.log_events([
+            {
+                "user_id": user_id,
+                "action": action,
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "meta": meta,
+            }
+        ])
 
+    async def log_events(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Несколько событий одним запросом (например, по документу на каждый
+        файл пакетной загрузки). Ключи события — как у аргументов log_event.
+        """
+        if not events:
+            return
+
+        # события и счётчики профиля пишутся одним запросом; счётчики
+        # суммируются по пользователю, чтобы ON CONFLICT задел строку один раз
         query = """
-        INSERT INTO audit_events (user_id, action, entity_type, entity_id, meta)
-        VALUES ($1, $2::audit_action, $3, $4, $5)
+        WITH ev AS (
+            INSERT INTO audit_events (user_id, action, entity_type, entity_id, meta)
+            SELECT *
+            FROM unnest($1::uuid[], $2::audit_action[], $3::text[], $4::text[], $5::jsonb[])
+            RETURNING user_id, action, created_at
+        )
+        INSERT INTO user_activity_counters AS c (
+            user_id,
+            documents_created,
+            documents_updated,
+            drafts_created,
+            collections_created,
+            last_action_at
+        )
+        SELECT
+            ev.user_id,
+            COUNT(*) FILTER (WHERE ev.action = 'create_document'),
+            COUNT(*) FILTER (WHERE ev.action = 'update_document'),
+            COUNT(*) FILTER (WHERE ev.action = 'create_draft'),
+            COUNT(*) FILTER (WHERE ev.action = 'create_collection'),
+            MAX(ev.created_at)
+        FROM ev
+        WHERE ev.user_id IS NOT NULL
+        GROUP BY ev.user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET
+            documents_created   = c.documents_created + excluded.documents_created,
+            documents_updated   = c.documents_updated + excluded.documents_updated,
+            drafts_created      = c.drafts_created + excluded.drafts_created,
+            collections_created = c.collections_created + excluded.collections_created,
+            last_action_at      = GREATEST(c.last_action_at, excluded.last_action_at),
+            updated_at          = now()
         """
-        await self.db.execute(query, user_id, action, entity_type, entity_id, meta_json)
+        await self.db.execute(
+            query,
+            [e["user_id"] for e in events],
+            [e["action"] for e in events],
+            [e["entity_type"] for e in events],
+            [e["entity_id"] for e in events],
+            [
+                json.dumps(e["meta"], ensure_ascii=False) if e.get("meta") is not None else None
+                for e in events
+            ],
+        )
 
-    async def get_user_activity_summary(self, user_id: UUID) -> Dict[str, Any]:
+    async def get_user_activity_counters(self, user_id: UUID) -> Dict[str, Any]:
         query = """
         SELECT
-            COUNT(*) FILTER (WHERE action = 'create_document')   AS documents_created,
-            COUNT(*) FILTER (WHERE action = 'update_document')   AS documents_updated,
-            COUNT(*) FILTER (WHERE action = 'create_draft')      AS drafts_created,
-            COUNT(*) FILTER (WHERE action = 'create_collection') AS collections_created,
-            MAX(created_at)                                      AS last_action_at
-        FROM audit_events
+            documents_created,
+            documents_updated,
+            drafts_created,
+            collections_created,
+            last_action_at
+        FROM user_activity_counters
         WHERE user_id = $1
         """
         row = await self.db.fetchrow(query, user_id)
@@ -55,19 +112,57 @@ class AuditManager(BaseManager):
             }
         return dict(row)
 
+    async def rebuild_activity_counters(self, user_id: Optional[UUID] = None) -> str:
+        """
+        Пересчитывает user_activity_counters по audit_events
+        (для всех пользователей или для одного).
+        """
+        query = """
+        INSERT INTO user_activity_counters AS c (
+            user_id,
+            documents_created,
+            documents_updated,
+            drafts_created,
+            collections_created,
+            last_action_at
+        )
+        SELECT
+            user_id,
+            COUNT(*) FILTER (WHERE action = 'create_document'),
+            COUNT(*) FILTER (WHERE action = 'update_document'),
+            COUNT(*) FILTER (WHERE action = 'create_draft'),
+            COUNT(*) FILTER (WHERE action = 'create_collection'),
+            MAX(created_at)
+        FROM audit_events
+        WHERE user_id IS NOT NULL
+          AND ($1::uuid IS NULL OR user_id = $1)
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET
+            documents_created   = excluded.documents_created,
+            documents_updated   = excluded.documents_updated,
+            drafts_created      = excluded.drafts_created,
+            collections_created = excluded.collections_created,
+            last_action_at      = excluded.last_action_at,
+            updated_at          = now()
+        """
+        return await self.db.execute(query, user_id)
+
     async def get_user_recent_actions(
         self,
         user_id: UUID,
         limit: int = 10,
-    ) -> List[Dict[str, Any]]:
-        query = """
-        SELECT action, entity_type, entity_id, meta, created_at
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> KeysetPage[Dict[str, Any]]:
+        keyset = "AND (created_at, id) < ($3, $4)" if after else ""
+        query = f"""
+        SELECT id, action, entity_type, entity_id, meta, created_at
         FROM audit_events
-        WHERE user_id = $1
-        ORDER BY created_at DESC
+        WHERE user_id = $1 {keyset}
+        ORDER BY created_at DESC, id DESC
         LIMIT $2
         """
-        rows = await self.db.fetch(query, user_id, limit)
+        rows = await self.db.fetch(query, user_id, limit + 1, *(after or ()))
         result: List[Dict[str, Any]] = []
         for r in rows:
             row_dict = dict(r)
@@ -81,4 +176,38 @@ class AuditManager(BaseManager):
 
             result.append(row_dict)
 
-        return result
+        return KeysetPage.from_rows(
+            result, limit, key=lambda r: (r["created_at"], r["id"])
+        )
+
+    # ------------------- секции audit_events -------------------
+    async def ensure_partitions(self, months_ahead: int = 3) -> List[str]:
+        rows = await self.db.fetch(
+            "SELECT audit_events_ensure_partitions($1) AS partition_name",
+            months_ahead,
+        )
+        return [r["partition_name"] for r in rows]
+
+    async def list_partitions_before(self, cutoff: date) -> List[Dict[str, Any]]:
+        rows = await self.db.fetch(
+            """
+            SELECT partition_name, month_start
+            FROM audit_events_partitions_before($1)
+            """,
+            cutoff,
+        )
+        return [dict(r) for r in rows]
+
+    async def export_partition(self, partition_name: str, output: Path) -> None:
+        await self.db.copy_from_table(
+            partition_name,
+            output=str(output),
+            format="csv",
+            header=True,
+        )
+
+    async def drop_partition(self, partition_name: str) -> None:
+        await self.db.execute(
+            "SELECT audit_events_drop_partition($1)",
+            partition_name,
+        )
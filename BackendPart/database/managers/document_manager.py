@@ -1,6 +1,8 @@
+import json
 import os
-from typing import Dict, Iterable, List, Optional, Tuple
-from uuid import UUID
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID, uuid4
 
 from apps.api.schemas.document_version import DocumentVersionWithMetadata
 from database.async_db import AsyncDatabase
@@ -8,6 +10,8 @@ from database.managers.base import BaseManager
 from database.models.document import Document
 from database.models.document_version import DocumentVersion
 from database.models.document_metadata import DocumentMetadataVersion
+from database.models.ingest import BulkDocumentFile, IngestOutboxItem
+from database.models.pagination import KeysetPage
 
 
 class DocumentManager(BaseManager):
@@ -21,9 +25,18 @@ class DocumentManager(BaseManager):
         return Document.from_record(row) if row else None
 
     async def get_versions_for_document(
-        self, document_id: UUID
-    ) -> List[DocumentVersionWithMetadata]:
-        query = """
+        self,
+        document_id: UUID,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[int]] = None,
+    ) -> KeysetPage[DocumentVersionWithMetadata]:
+        """
+        Версии документа от новой к старой. Ключ страницы — номер версии
+        (уникален в пределах документа); limit=None — все версии.
+        """
+        keyset = "AND dv.version < $2" if after else ""
+        limit_sql = f"LIMIT {int(limit) + 1}" if limit is not None else ""
+        query = f"""
             SELECT
                 dv.id              AS dv_id,
                 dv.document_id     AS dv_document_id,
@@ -40,6 +53,7 @@ class DocumentManager(BaseManager):
                 dv.change_notes    AS dv_change_notes,
                 dv.metadata        AS dv_metadata,
                 dv.is_current      AS dv_is_current,
+                dv.content_sha256  AS dv_content_sha256,
 
                 dmv.document_version_id AS dmv_document_version_id,
                 dmv.changed_at          AS dmv_changed_at,
@@ -55,11 +69,12 @@ class DocumentManager(BaseManager):
             FROM document_versions dv
             LEFT JOIN document_metadata_versions dmv
                 ON dmv.document_version_id = dv.id
-            WHERE dv.document_id = $1
+            WHERE dv.document_id = $1 {keyset}
             ORDER BY dv.version DESC
+            {limit_sql}
         """
 
-        rows = await self.db.fetch(query, document_id)
+        rows = await self.db.fetch(query, document_id, *(after or ()))
 
         result: List[DocumentVersionWithMetadata] = []
 
@@ -80,6 +95,7 @@ class DocumentManager(BaseManager):
                 change_notes=row["dv_change_notes"],
                 metadata=row["dv_metadata"],
                 is_current=row["dv_is_current"],
+                content_sha256=row["dv_content_sha256"],
             )
 
             # metadata может быть NULL
@@ -102,7 +118,9 @@ class DocumentManager(BaseManager):
 
             result.append(DocumentVersionWithMetadata(version=dv, metadata=dmv))
 
-        return result
+        if limit is None:
+            return KeysetPage(items=result, next_key=None)
+        return KeysetPage.from_rows(result, limit, key=lambda v: (v.version.version,))
 
     async def get_current_version(self, document_id: UUID) -> Optional[DocumentVersion]:
         query = """
@@ -114,26 +132,7 @@ class DocumentManager(BaseManager):
         row = await self.db.fetchrow(query, document_id)
         return DocumentVersion.from_record(row) if row else None
 
-    async def get_current_versions_for_documents(
-        self,
-        document_ids: Iterable[UUID],
-    ) -> Dict[UUID, DocumentVersion]:
-        ids_list = list(document_ids)
-        if not ids_list:
-            return {}
-
-        rows = await self.db.fetch(
-            """
-            SELECT *
-            FROM document_versions
-            WHERE document_id = ANY($1::uuid[])
-              AND is_current = true
-            """,
-            ids_list,
-        )
-        return {r["document_id"]: DocumentVersion.from_record(r) for r in rows}
-
-    async def create_document_with_version(
+    async def create_document_for_ingest(
         self,
         *,
         title: str,
@@ -144,63 +143,75 @@ class DocumentManager(BaseManager):
         file_size: int,
         storage_key: str,
         tags: List[str],
-    ) -> Tuple[Document, DocumentVersion]:
+        status: str = "active",
+        version_status: str = "approved",
+        change_notes: Optional[str] = None,
+        content_sha256: Optional[str] = None,
+    ) -> Tuple[Document, DocumentVersion, IngestOutboxItem]:
         """
-        Создаёт документ + первую версию
+        Создаёт документ, первую версию, её метаданные и запись ingest_outbox
+        в одной транзакции: либо всё вместе, либо ничего.
         """
-        doc_row = await self.db.fetchrow(
-            """
-            INSERT INTO documents (
+        async with self.db.transaction() as conn:
+            doc_row = await conn.fetchrow(
+                """
+                INSERT INTO documents (
+                    title,
+                    department_id,
+                    access_levels,
+                    tags,
+                    uploaded_by_id,
+                    status,
+                    is_valid,
+                    current_version
+                )
+                VALUES ($1, $2, '{}', $3, $4, $5::document_status, true, 1)
+                RETURNING *
+                """,
                 title,
                 department_id,
-                access_levels,
                 tags,
                 uploaded_by_id,
                 status,
-                is_valid,
-                current_version
             )
-            VALUES ($1, $2, '{}', $3, $4, 'draft', true, 1)
-            RETURNING *
-            """,
-            title,
-            department_id,
-            tags,
-            uploaded_by_id,
-        )
-        if doc_row is None:
-            raise RuntimeError("Failed to create document")
-        document = Document.from_record(doc_row)
-
-        ver_row = await self.db.fetchrow(
-            """
-            INSERT INTO document_versions (
-                document_id,
-                version,
+            if doc_row is None:
+                raise RuntimeError("Failed to create document")
+            document = Document.from_record(doc_row)
+
+            ver_row = await conn.fetchrow(
+                """
+                INSERT INTO document_versions (
+                    document_id,
+                    version,
+                    file_name,
+                    file_type,
+                    file_size,
+                    storage_key,
+                    uploaded_by_id,
+                    status,
+                    change_notes,
+                    is_current,
+                    content_sha256
+                )
+                VALUES ($1, 1, $2, $3, $4, $5, $6, $7::doc_version_status, $8, true, $9)
+                RETURNING *
+                """,
+                document.id,
                 file_name,
                 file_type,
                 file_size,
                 storage_key,
                 uploaded_by_id,
-                status,
-                is_current
+                version_status,
+                change_notes,
+                content_sha256,
             )
-            VALUES ($1, 1, $2, $3, $4, $5, $6, 'draft', true)
-            RETURNING *
-            """,
-            document.id,
-            file_name,
-            file_type,
-            file_size,
-            storage_key,
-            uploaded_by_id,
-        )
-        if ver_row is None:
-            raise RuntimeError("Failed to create document version")
-        version = DocumentVersion.from_record(ver_row)
+            if ver_row is None:
+                raise RuntimeError("Failed to create document version")
+            version = DocumentVersion.from_record(ver_row)
 
-        await self.db.execute(
-            """
+            await conn.execute(
+                """
                 INSERT INTO document_metadata_versions (
                     document_version_id,
                     changed_by_id,
@@ -215,14 +226,172 @@ class DocumentManager(BaseManager):
                 )
                 VALUES ($1, $2, $3, NULL, NULL, $4, '{}', $5, true, NULL)
                 """,
-            version.id,
-            uploaded_by_id,
-            title,
-            department_id,
-            tags,
-        )
+                version.id,
+                uploaded_by_id,
+                title,
+                department_id,
+                tags,
+            )
 
-        return document, version
+            outbox_row = await conn.fetchrow(
+                """
+                INSERT INTO ingest_outbox (document_id, version_id, storage_key)
+                VALUES ($1, $2, $3)
+                RETURNING *
+                """,
+                document.id,
+                version.id,
+                storage_key,
+            )
+            if outbox_row is None:
+                raise RuntimeError("Failed to enqueue document for ingestion")
+            outbox_item = IngestOutboxItem.from_record(outbox_row)
+
+        return document, version, outbox_item
+
+    async def create_upload_batch(
+        self,
+        *,
+        files: Sequence[BulkDocumentFile],
+        department_id: int,
+        uploaded_by_id: UUID,
+        tags: List[str],
+        files_total: int,
+        rejected: List[Dict[str, str]],
+        status: str = "active",
+        version_status: str = "approved",
+        change_notes: Optional[str] = None,
+        chunk_size: int = 1000,
+    ) -> Tuple[UUID, List[Tuple[UUID, UUID]]]:
+        """
+        Пакетный вариант create_document_for_ingest: запись upload_batches,
+        документы, версии, метаданные и ingest_outbox вставляются через
+        unnest по chunk_size строк в одной транзакции. id генерируются
+        здесь, чтобы связать строки без построчных RETURNING.
+        Возвращает id пакета и пары (document_id, version_id).
+        """
+        created: List[Tuple[UUID, UUID]] = []
+
+        async with self.db.transaction() as conn:
+            batch_id = await conn.fetchval(
+                """
+                INSERT INTO upload_batches (created_by_id, department_id, files_total, rejected)
+                VALUES ($1, $2, $3, $4::jsonb)
+                RETURNING id
+                """,
+                uploaded_by_id,
+                department_id,
+                files_total,
+                json.dumps(rejected, ensure_ascii=False),
+            )
+
+            for start in range(0, len(files), chunk_size):
+                chunk = files[start:start + chunk_size]
+                doc_ids = [uuid4() for _ in chunk]
+                ver_ids = [uuid4() for _ in chunk]
+                titles = [f.title for f in chunk]
+                keys = [f.storage_key for f in chunk]
+
+                await conn.execute(
+                    """
+                    INSERT INTO documents (
+                        id,
+                        title,
+                        department_id,
+                        access_levels,
+                        tags,
+                        uploaded_by_id,
+                        status,
+                        is_valid,
+                        current_version
+                    )
+                    SELECT d.id, d.title, $3, '{}', $4, $5, $6::document_status, true, 1
+                    FROM unnest($1::uuid[], $2::text[]) AS d(id, title)
+                    """,
+                    doc_ids,
+                    titles,
+                    department_id,
+                    tags,
+                    uploaded_by_id,
+                    status,
+                )
+
+                await conn.execute(
+                    """
+                    INSERT INTO document_versions (
+                        id,
+                        document_id,
+                        version,
+                        file_name,
+                        file_type,
+                        file_size,
+                        storage_key,
+                        uploaded_by_id,
+                        status,
+                        change_notes,
+                        is_current,
+                        content_sha256
+                    )
+                    SELECT
+                        v.id, v.document_id, 1, v.file_name, v.file_type, v.file_size,
+                        v.storage_key, $8, $9::doc_version_status, $10, true, v.content_sha256
+                    FROM unnest(
+                        $1::uuid[], $2::uuid[], $3::text[], $4::text[],
+                        $5::bigint[], $6::text[], $7::text[]
+                    ) AS v(id, document_id, file_name, file_type, file_size, storage_key, content_sha256)
+                    """,
+                    ver_ids,
+                    doc_ids,
+                    [f.file_name for f in chunk],
+                    [f.file_type for f in chunk],
+                    [f.file_size for f in chunk],
+                    keys,
+                    [f.content_sha256 for f in chunk],
+                    uploaded_by_id,
+                    version_status,
+                    change_notes,
+                )
+
+                await conn.execute(
+                    """
+                    INSERT INTO document_metadata_versions (
+                        document_version_id,
+                        changed_by_id,
+                        title,
+                        description,
+                        category,
+                        department_id,
+                        access_levels,
+                        tags,
+                        is_valid,
+                        metadata
+                    )
+                    SELECT m.version_id, $3, m.title, NULL, NULL, $4, '{}', $5, true, NULL
+                    FROM unnest($1::uuid[], $2::text[]) AS m(version_id, title)
+                    """,
+                    ver_ids,
+                    titles,
+                    uploaded_by_id,
+                    department_id,
+                    tags,
+                )
+
+                await conn.execute(
+                    """
+                    INSERT INTO ingest_outbox (document_id, version_id, storage_key, batch_id)
+                    SELECT o.document_id, o.version_id, o.storage_key, $4
+                    FROM unnest($1::uuid[], $2::uuid[], $3::text[])
+                        AS o(document_id, version_id, storage_key)
+                    """,
+                    doc_ids,
+                    ver_ids,
+                    keys,
+                    batch_id,
+                )
+
+                created.extend(zip(doc_ids, ver_ids))
+
+        return batch_id, created
 
     async def get_document_with_current_version(
         self, document_id: UUID
@@ -246,6 +415,70 @@ class DocumentManager(BaseManager):
         version = DocumentVersion.from_record(ver_row) if ver_row else None
         return document, version
 
+    async def get_version_for_file(
+        self,
+        document_id: UUID,
+        version_id: Optional[UUID] = None,
+    ) -> Optional[Tuple[List[str], DocumentVersion]]:
+        """
+        Версия (по умолчанию текущая) и access_levels её документа
+        одним запросом — всё, что нужно для отдачи файла.
+        """
+        row = await self.db.fetchrow(
+            """
+            SELECT dv.*, d.access_levels AS document_access_levels
+            FROM document_versions dv
+            JOIN documents d ON d.id = dv.document_id
+            WHERE dv.document_id = $1
+              AND CASE WHEN $2::uuid IS NULL THEN dv.is_current ELSE dv.id = $2 END
+            """,
+            document_id,
+            version_id,
+        )
+        if row is None:
+            return None
+        return row["document_access_levels"] or [], DocumentVersion.from_record(row)
+
+    async def get_document_view(self, document_id: UUID) -> Optional[Dict[str, Any]]:
+        """
+        Всё, что нужно карточке документа, одним запросом:
+        документ, текущая версия, название департамента и ФИО загрузившего.
+        """
+        query = """
+            SELECT
+                d.id             AS document_id,
+                d.title          AS title,
+                d.is_valid       AS is_valid,
+                d.access_levels  AS access_levels,
+                dep.name         AS department_name,
+
+                dv.id            AS version_id,
+                dv.upload_date   AS upload_date,
+                dv.file_name     AS file_name,
+                dv.storage_key   AS storage_key,
+                dv.content_sha256 AS content_sha256,
+
+                NULLIF(
+                    concat_ws(
+                        ' ',
+                        NULLIF(u.last_name, ''),
+                        NULLIF(u.first_name, ''),
+                        NULLIF(u.middle_name, '')
+                    ),
+                    ''
+                ) AS uploaded_by
+            FROM documents d
+            LEFT JOIN document_versions dv
+                ON dv.document_id = d.id AND dv.is_current = true
+            LEFT JOIN departments dep
+                ON dep.id = d.department_id
+            LEFT JOIN users u
+                ON u.id = dv.uploaded_by_id
+            WHERE d.id = $1
+        """
+        row = await self.db.fetchrow(query, document_id)
+        return dict(row) if row else None
+
     async def update_document_main_fields(
         self,
         document_id: UUID,
@@ -304,22 +537,6 @@ class DocumentManager(BaseManager):
             raise RuntimeError("Failed to update document version status")
         return DocumentVersion.from_record(row)
 
-    async def get_documents_by_ids(
-        self,
-        ids: Iterable[UUID],
-    ) -> List[Document]:
-        ids_list = list(ids)
-        if not ids_list:
-            return []
-
-        query = """
-        SELECT *
-        FROM documents
-        WHERE id = ANY($1::uuid[])
-        """
-        rows = await self.db.fetch(query, ids_list)
-        return [Document(**dict(r)) for r in rows]
-
     async def create_new_version_and_update_document(
         self,
         document_id: UUID,
@@ -335,6 +552,7 @@ class DocumentManager(BaseManager):
         file_type: Optional[str] = None,
         file_size: Optional[int] = None,
         storage_key: Optional[str] = None,
+        content_sha256: Optional[str] = None,
         change_notes: Optional[str] = None,
         version_status: Optional[str] = None,
     ) -> Tuple[Document, DocumentVersion]:
@@ -355,6 +573,9 @@ class DocumentManager(BaseManager):
         new_file_type = file_type or current_ver.file_type
         new_file_size = file_size or current_ver.file_size
         new_storage_key = storage_key or current_ver.storage_key
+        new_content_sha256 = (
+            content_sha256 if storage_key is not None else current_ver.content_sha256
+        )
 
         if file_type is not None and file_type != current_ver.file_type:
             raise RuntimeError("Changing file type is not allowed")
@@ -394,9 +615,10 @@ class DocumentManager(BaseManager):
                 uploaded_by_id,
                 status,
                 change_notes,
-                is_current
+                is_current,
+                content_sha256
             )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8::doc_version_status, $9, true)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8::doc_version_status, $9, true, $10)
             RETURNING *
             """,
             document_id,
@@ -408,6 +630,7 @@ class DocumentManager(BaseManager):
             uploaded_by_id,
             new_version_status,
             change_notes,
+            new_content_sha256,
         )
         if ver_row is None:
             raise RuntimeError("Failed to create new document version")
@@ -470,24 +693,284 @@ class DocumentManager(BaseManager):
 
         return updated_doc, new_version
 
-    async def get_document_ids_by_storage_keys(
+    async def get_search_candidates(
+        self,
+        *,
+        version_ids: Iterable[UUID] = (),
+        storage_keys: Iterable[str] = (),
+    ) -> List[Dict[str, Any]]:
+        """
+        Документы, на которые сослался RAG, вместе с текущей версией —
+        одним запросом. Источник с version_id ищется по первичному ключу,
+        storage_keys — для файлов, проиндексированных до появления id
+        в контракте. Блоб может быть общим для нескольких документов,
+        поэтому на один источник бывает несколько строк; matched_version_id /
+        matched_key указывают, к какому источнику относится строка.
+        """
+        ids_list = list(version_ids)
+        keys_list = list(storage_keys)
+        if not ids_list and not keys_list:
+            return []
+
+        columns = """
+                d.id             AS document_id,
+                d.title,
+                d.department_id,
+                d.access_levels,
+                d.tags,
+                d.is_valid,
+                d.upload_date,
+                cv.id            AS version_id,
+                cv.file_type,
+                cv.storage_key
+        """
+        rows = await self.db.fetch(
+            f"""
+            (
+                SELECT DISTINCT ON (h.id, d.id)
+                    h.id             AS matched_version_id,
+                    NULL::text       AS matched_key,
+                    {columns}
+                FROM document_versions h
+                JOIN document_versions mv ON mv.storage_key = h.storage_key
+                JOIN documents d ON d.id = mv.document_id
+                LEFT JOIN document_versions cv
+                    ON cv.document_id = d.id AND cv.is_current
+                WHERE h.id = ANY($1::uuid[])
+            )
+            UNION ALL
+            (
+                SELECT DISTINCT ON (mv.storage_key, d.id)
+                    NULL::uuid       AS matched_version_id,
+                    mv.storage_key   AS matched_key,
+                    {columns}
+                FROM document_versions mv
+                JOIN documents d ON d.id = mv.document_id
+                LEFT JOIN document_versions cv
+                    ON cv.document_id = d.id AND cv.is_current
+                WHERE mv.storage_key = ANY($2::text[])
+            )
+            """,
+            ids_list,
+            keys_list,
+        )
+        return [dict(r) for r in rows]
+
+    async def count_storage_key_references(self, storage_key: str) -> int:
+        """Сколько версий ссылается на блоб; 0 — файл можно удалять"""
+        return await self.db.fetchval(
+            """
+            SELECT count(*)
+            FROM document_versions
+            WHERE storage_key = $1
+            """,
+            storage_key,
+        )
+
+    async def get_referenced_storage_keys(
         self,
         storage_keys: Iterable[str],
-    ) -> Dict[str, UUID]:
+    ) -> Set[str]:
         keys_list = list(storage_keys)
         if not keys_list:
-            return {}
+            return set()
 
         rows = await self.db.fetch(
             """
-            SELECT storage_key, document_id
+            SELECT DISTINCT storage_key
             FROM document_versions
             WHERE storage_key = ANY($1::text[])
             """,
             keys_list,
         )
-        return {r["storage_key"]: r["document_id"] for r in rows}
-    
+        return {r["storage_key"] for r in rows}
+
+    async def list_documents(
+        self,
+        *,
+        user_access_levels: List[str],
+        department_ids: Optional[List[int]] = None,
+        status: Optional[str] = None,
+        only_active: bool = False,
+        tags: Optional[List[str]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        limit: int = 50,
+        after: Optional[Tuple[datetime, UUID]] = None,
+    ) -> KeysetPage[Dict[str, Any]]:
+        """
+        Каталог документов с текущей версией, новые первыми. Keyset по
+        (upload_date, id): глубокая страница стоит столько же, сколько первая.
+        """
+        conditions = ["d.access_levels <@ $1::text[]"]
+        args: List[Any] = [user_access_levels]
+
+        def _arg(value: Any) -> str:
+            args.append(value)
+            return f"${len(args)}"
+
+        if department_ids:
+            conditions.append(f"d.department_id = ANY({_arg(department_ids)}::bigint[])")
+        if status:
+            conditions.append(f"d.status = {_arg(status)}::document_status")
+        if only_active:
+            conditions.append("d.is_valid")
+        if tags:
+            conditions.append(f"d.tags && {_arg(tags)}::text[]")
+        if date_from:
+            conditions.append(f"d.upload_date >= {_arg(date_from)}::date")
+        if date_to:
+            conditions.append(f"d.upload_date < {_arg(date_to)}::date + 1")
+        if after:
+            conditions.append(
+                f"(d.upload_date, d.id) < ({_arg(after[0])}, {_arg(after[1])})"
+            )
+
+        query = f"""
+            SELECT
+                d.id             AS document_id,
+                d.title,
+                d.department_id,
+                d.access_levels,
+                d.tags,
+                d.status,
+                d.is_valid,
+                d.upload_date,
+                dv.id            AS version_id,
+                dv.file_name,
+                dv.file_type,
+                dv.storage_key
+            FROM documents d
+            LEFT JOIN document_versions dv
+                ON dv.document_id = d.id AND dv.is_current
+            WHERE {" AND ".join(conditions)}
+            ORDER BY d.upload_date DESC, d.id DESC
+            LIMIT {_arg(limit + 1)}
+        """
+        rows = await self.db.fetch(query, *args)
+        return KeysetPage.from_rows(
+            [dict(r) for r in rows], limit, key=lambda r: (r["upload_date"], r["document_id"])
+        )
+
+    # ------------------- полнотекстовый поиск -------------------
+    async def get_indexed_text_keys(self, storage_keys: Iterable[str]) -> Set[str]:
+        keys_list = list(storage_keys)
+        if not keys_list:
+            return set()
+
+        rows = await self.db.fetch(
+            """
+            SELECT storage_key
+            FROM document_texts
+            WHERE storage_key = ANY($1::text[])
+            """,
+            keys_list,
+        )
+        return {r["storage_key"] for r in rows}
+
+    async def save_document_texts(self, texts: Dict[str, str]) -> int:
+        """
+        Сохраняет текст по storage_key. Тексты файлов, на которые не
+        ссылается ни одна версия, пропускаются.
+        """
+        if not texts:
+            return 0
+
+        keys = list(texts)
+        # в text Postgres не допускает NUL
+        contents = [texts[k].replace("\x00", "") for k in keys]
+        status = await self.db.execute(
+            """
+            INSERT INTO document_texts (storage_key, content)
+            SELECT t.storage_key, t.content
+            FROM unnest($1::text[], $2::text[]) AS t(storage_key, content)
+            WHERE EXISTS (
+                SELECT 1 FROM document_versions dv WHERE dv.storage_key = t.storage_key
+            )
+            ON CONFLICT (storage_key) DO NOTHING
+            """,
+            keys,
+            contents,
+        )
+        return int(status.split()[-1])
+
+    async def search_lexical(
+        self,
+        query: str,
+        *,
+        user_access_levels: List[str],
+        department_ids: Optional[List[int]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        tags: Optional[List[str]] = None,
+        file_types: Optional[List[str]] = None,
+        only_active: bool = False,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        Полнотекстовый поиск по текстам текущих версий (GIN по tsv).
+        Все фильтры, включая доступ, применяются в SQL; ts_headline
+        считается только для отобранных limit строк.
+        """
+        rows = await self.db.fetch(
+            """
+            WITH q AS (
+                SELECT websearch_to_tsquery('russian', $1) AS query
+            ),
+            hits AS (
+                SELECT
+                    d.id            AS document_id,
+                    d.title         AS title,
+                    d.is_valid      AS is_valid,
+                    d.upload_date   AS upload_date,
+                    d.tags          AS tags,
+                    dv.id           AS version_id,
+                    dv.storage_key  AS storage_key,
+                    ts_rank_cd(t.tsv, q.query) AS rank,
+                    t.content       AS content
+                FROM q
+                JOIN document_texts t ON t.tsv @@ q.query
+                JOIN document_versions dv
+                    ON dv.storage_key = t.storage_key AND dv.is_current
+                JOIN documents d ON d.id = dv.document_id
+                WHERE d.access_levels <@ $2::text[]
+                  AND ($3::bigint[] IS NULL OR d.department_id = ANY($3))
+                  AND ($4::date IS NULL OR d.upload_date::date >= $4)
+                  AND ($5::date IS NULL OR d.upload_date::date <= $5)
+                  AND ($6::text[] IS NULL OR d.tags && $6)
+                  AND ($7::text[] IS NULL OR lower(dv.file_type) = ANY($7))
+                  AND (NOT $8 OR d.is_valid)
+                ORDER BY rank DESC, d.upload_date DESC
+                LIMIT $9
+            )
+            SELECT
+                hits.document_id,
+                hits.title,
+                hits.is_valid,
+                hits.upload_date,
+                hits.tags,
+                hits.version_id,
+                hits.storage_key,
+                hits.rank,
+                ts_headline(
+                    'russian', hits.content, q.query,
+                    'MaxFragments=2, MaxWords=35, MinWords=15, FragmentDelimiter=" … "'
+                ) AS snippet
+            FROM hits, q
+            ORDER BY hits.rank DESC, hits.upload_date DESC
+            """,
+            query,
+            user_access_levels,
+            department_ids or None,
+            date_from,
+            date_to,
+            tags or None,
+            [t.lower() for t in file_types] if file_types else None,
+            only_active,
+            limit,
+        )
+        return [dict(r) for r in rows]
+
     async def get_all_file_types(self) -> list[str]:
         rows = await self.db.fetch(
             """
@@ -0,0 +1,238 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from database.async_db import AsyncDatabase
+from database.managers.base import BaseManager
+from database.models.ingest import IngestOutboxItem
+
+
+class IngestOutboxManager(BaseManager):
+    def __init__(self, db: AsyncDatabase) -> None:
+        super().__init__(db)
+
+    # ------------------- ingest_outbox -------------------
+    async def claim_batch(
+        self,
+        *,
+        limit: int,
+        lease_seconds: int,
+    ) -> List[IngestOutboxItem]:
+        """
+        Забирает готовые к отправке записи. next_attempt_at сдвигается на
+        lease_seconds, чтобы другой воркер не взял те же строки, пока эти
+        в работе; если процесс упадёт, записи вернутся в очередь сами.
+        Попытка засчитывается не здесь, а в mark_retry — по исходу отправки.
+        """
+        query = """
+        UPDATE ingest_outbox
+        SET next_attempt_at = now() + make_interval(secs => $2)
+        WHERE id IN (
+            SELECT id
+            FROM ingest_outbox
+            WHERE status = 'pending' AND next_attempt_at <= now()
+            ORDER BY next_attempt_at, id
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *
+        """
+        rows = await self.db.fetch(query, limit, lease_seconds)
+        return [IngestOutboxItem.from_record(r) for r in rows]
+
+    async def claim_batch_members(
+        self,
+        batch_ids: Iterable[UUID],
+        *,
+        limit: int,
+        lease_seconds: int,
+    ) -> List[IngestOutboxItem]:
+        """
+        Добирает готовые записи тех же пакетных загрузок, чтобы пакет
+        ушёл в RAG одним заданием, а не десятками мелких.
+        """
+        ids_list = list(batch_ids)
+        if not ids_list or limit <= 0:
+            return []
+
+        query = """
+        UPDATE ingest_outbox
+        SET next_attempt_at = now() + make_interval(secs => $3)
+        WHERE id IN (
+            SELECT id
+            FROM ingest_outbox
+            WHERE batch_id = ANY($1::uuid[])
+              AND status = 'pending'
+              AND next_attempt_at <= now()
+            ORDER BY id
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *
+        """
+        rows = await self.db.fetch(query, ids_list, limit, lease_seconds)
+        return [IngestOutboxItem.from_record(r) for r in rows]
+
+    async def mark_delivered(self, ids: Iterable[int]) -> None:
+        ids_list = list(ids)
+        if not ids_list:
+            return
+
+        await self.db.execute(
+            """
+            UPDATE ingest_outbox
+            SET status = 'delivered', delivered_at = now(), last_error = NULL
+            WHERE id = ANY($1::bigint[])
+            """,
+            ids_list,
+        )
+
+    async def mark_retry(
+        self,
+        ids: Iterable[int],
+        *,
+        error: str,
+        max_attempts: int,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+    ) -> None:
+        """
+        Засчитывает неудачную попытку и откладывает записи с экспоненциальной
+        задержкой (не больше max_backoff_seconds); после max_attempts попыток
+        запись помечается failed.
+        """
+        ids_list = list(ids)
+        if not ids_list:
+            return
+
+        await self.db.execute(
+            """
+            UPDATE ingest_outbox
+            SET
+                attempts = attempts + 1,
+                last_error = $2,
+                status = CASE
+                    WHEN attempts + 1 >= $3 THEN 'failed'::ingest_status
+                    ELSE status
+                END,
+                next_attempt_at = now() + make_interval(
+                    secs => least($5, $4 * power(2, attempts))
+                )
+            WHERE id = ANY($1::bigint[])
+            """,
+            ids_list,
+            error,
+            max_attempts,
+            backoff_seconds,
+            max_backoff_seconds,
+        )
+
+    async def defer(self, ids: Iterable[int], *, error: str, delay_seconds: float) -> None:
+        """
+        Откладывает записи, не засчитывая попытку: RAG недоступен
+        (нет соединения, breaker разомкнут), и дело не в самих файлах.
+        """
+        ids_list = list(ids)
+        if not ids_list:
+            return
+
+        await self.db.execute(
+            """
+            UPDATE ingest_outbox
+            SET
+                last_error = $2,
+                next_attempt_at = now() + make_interval(secs => $3)
+            WHERE id = ANY($1::bigint[])
+            """,
+            ids_list,
+            error,
+            delay_seconds,
+        )
+
+    async def mark_failed(self, ids: Iterable[int], *, error: str) -> None:
+        ids_list = list(ids)
+        if not ids_list:
+            return
+
+        await self.db.execute(
+            """
+            UPDATE ingest_outbox
+            SET status = 'failed', last_error = $2
+            WHERE id = ANY($1::bigint[])
+            """,
+            ids_list,
+            error,
+        )
+
+    async def requeue_failed(
+        self,
+        *,
+        document_id: Optional[UUID] = None,
+        batch_id: Optional[UUID] = None,
+    ) -> int:
+        """
+        Возвращает failed-записи в очередь со сброшенным счётчиком попыток.
+        Без фильтров — все failed-записи.
+        """
+        result = await self.db.execute(
+            """
+            UPDATE ingest_outbox
+            SET status = 'pending', attempts = 0, next_attempt_at = now()
+            WHERE status = 'failed'
+              AND ($1::uuid IS NULL OR document_id = $1)
+              AND ($2::uuid IS NULL OR batch_id = $2)
+            """,
+            document_id,
+            batch_id,
+        )
+        return int(result.split()[-1])
+
+    async def get_latest_for_document(
+        self, document_id: UUID
+    ) -> Optional[IngestOutboxItem]:
+        row = await self.db.fetchrow(
+            """
+            SELECT *
+            FROM ingest_outbox
+            WHERE document_id = $1
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            document_id,
+        )
+        return IngestOutboxItem.from_record(row) if row else None
+
+    async def get_batch_progress(self, batch_id: UUID) -> Optional[Dict[str, Any]]:
+        """
+        Состояние пакетной загрузки: сколько файлов передано в RAG
+        и сколько уже распознано (текст появился в document_texts).
+        """
+        row = await self.db.fetchrow(
+            """
+            SELECT
+                b.id,
+                b.created_by_id,
+                b.department_id,
+                b.files_total,
+                b.rejected,
+                b.created_at,
+                COUNT(o.id)                                       AS documents,
+                COUNT(o.id) FILTER (WHERE o.status = 'pending')   AS pending,
+                COUNT(o.id) FILTER (WHERE o.status = 'delivered') AS delivered,
+                COUNT(o.id) FILTER (WHERE o.status = 'failed')    AS failed,
+                COUNT(t.storage_key)                              AS indexed
+            FROM upload_batches b
+            LEFT JOIN ingest_outbox o ON o.batch_id = b.id
+            LEFT JOIN document_texts t ON t.storage_key = o.storage_key
+            WHERE b.id = $1
+            GROUP BY b.id
+            """,
+            batch_id,
+        )
+        if row is None:
+            return None
+
+        result = dict(row)
+        if isinstance(result["rejected"], str):
+            result["rejected"] = json.loads(result["rejected"])
+        return result
@@ -1,10 +1,11 @@
-from datetime import date
+from datetime import date, datetime
 import json
-from typing import Any, Dict, List, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from uuid import UUID
 
 from database.async_db import AsyncDatabase
 from database.managers.base import BaseManager
+from database.models.pagination import KeysetPage
 from database.models.workspace import (
     WorkspaceCollection,
     WorkspaceCollectionItem,
@@ -60,16 +61,29 @@ class WorkspaceManager(BaseManager):
         self,
         user_id: UUID,
         limit: int = 20,
-    ) -> List[Dict[str, Any]]:
-        query = """
+        after: Optional[Tuple[datetime, UUID]] = None,
+    ) -> KeysetPage[Dict[str, Any]]:
+        """История запросов, новые первыми; after — ключ (created_at, id) с прошлой страницы"""
+        keyset = "AND (created_at, id) < ($3, $4)" if after else ""
+        query = f"""
         SELECT id, question, filters, created_at, updated_at
         FROM workspace_queries
-        WHERE user_id = $1
-        ORDER BY created_at DESC
+        WHERE user_id = $1 {keyset}
+        ORDER BY created_at DESC, id DESC
         LIMIT $2
         """
-        rows = await self.db.fetch(query, user_id, limit)
-        return [dict(r) for r in rows]
+        rows = await self.db.fetch(query, user_id, limit + 1, *(after or ()))
+
+        result = []
+        for r in rows:
+            row_dict = dict(r)
+            if isinstance(row_dict["filters"], str):
+                row_dict["filters"] = json.loads(row_dict["filters"])
+            result.append(row_dict)
+
+        return KeysetPage.from_rows(
+            result, limit, key=lambda r: (r["created_at"], r["id"])
+        )
 
     # ------------------- workspace_collections -------------------
 
@@ -106,31 +120,148 @@ class WorkspaceManager(BaseManager):
             raise RuntimeError("Failed to create workspace_collection")
         return WorkspaceCollection.from_record(row)
 
-    async def list_collections_for_user(
-        self, user_id: UUID
-    ) -> List[WorkspaceCollection]:
-        query = """
-            SELECT *
-            FROM workspace_collections
-            WHERE user_id = $1
-            ORDER BY created_at DESC
+    async def list_collections_with_documents(
+        self,
+        user_id: UUID,
+        *,
+        user_access_levels: List[str],
+        limit: int = 50,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        items_limit: int = 100,
+    ) -> KeysetPage[Dict[str, Any]]:
+        """
+        Подборки пользователя вместе с документами одним запросом,
+        keyset по (created_at, id). documents_count — число доступных
+        пользователю элементов подборки, documents — первые items_limit
+        из них, а documents_next_key — ключ, с которого список продолжает
+        list_collection_documents с тем же фильтром доступа (None, если
+        элементов больше нет).
         """
-        rows = await self.db.fetch(query, user_id)
-        return [WorkspaceCollection.from_record(r) for r in rows]
+        keyset = "AND (c.created_at, c.id) < ($5, $6)" if after else ""
+        query = f"""
+            SELECT
+                c.id,
+                c.name,
+                c.created_at,
+                cnt.total AS documents_count,
+                COALESCE(docs.items, '[]'::json) AS documents
+            FROM workspace_collections c
+            CROSS JOIN LATERAL (
+                SELECT COUNT(*) AS total
+                FROM workspace_collection_items i
+                JOIN documents d ON d.id = i.document_id
+                WHERE i.collection_id = c.id
+                  AND d.access_levels <@ $4::text[]
+            ) cnt
+            LEFT JOIN LATERAL (
+                SELECT json_agg(
+                    json_build_object(
+                        'item_id',       i.item_id,
+                        'added_at',      i.added_at,
+                        'document_id',   i.document_id,
+                        'title',         i.title,
+                        'department_id', i.department_id,
+                        'access_levels', i.access_levels,
+                        'tags',          i.tags,
+                        'is_valid',      i.is_valid,
+                        'upload_date',   i.upload_date
+                    )
+                    ORDER BY i.added_at DESC, i.item_id DESC
+                ) AS items
+                FROM (
+                    SELECT
+                        wi.id         AS item_id,
+                        wi.created_at AS added_at,
+                        d.id          AS document_id,
+                        d.title,
+                        d.department_id,
+                        d.access_levels,
+                        d.tags,
+                        d.is_valid,
+                        d.upload_date
+                    FROM workspace_collection_items wi
+                    JOIN documents d ON d.id = wi.document_id
+                    WHERE wi.collection_id = c.id
+                      AND d.access_levels <@ $4::text[]
+                    ORDER BY wi.created_at DESC, wi.id DESC
+                    LIMIT $3
+                ) i
+            ) docs ON true
+            WHERE c.user_id = $1 {keyset}
+            ORDER BY c.created_at DESC, c.id DESC
+            LIMIT $2
+        """
+        rows = await self.db.fetch(
+            query,
+            user_id,
+            limit + 1,
+            items_limit + 1,
+            user_access_levels,
+            *(after or ()),
+        )
+
+        result: List[Dict[str, Any]] = []
+        for r in rows:
+            row_dict = dict(r)
+            documents = row_dict.get("documents")
+            if isinstance(documents, str):
+                documents = json.loads(documents)
+            # лишний элемент выбран только как признак продолжения
+            row_dict["documents_next_key"] = None
+            if len(documents) > items_limit:
+                documents = documents[:items_limit]
+                last = documents[-1]
+                row_dict["documents_next_key"] = (
+                    datetime.fromisoformat(last["added_at"]),
+                    UUID(last["item_id"]),
+                )
+            row_dict["documents"] = documents
+            result.append(row_dict)
+
+        return KeysetPage.from_rows(
+            result, limit, key=lambda r: (r["created_at"], r["id"])
+        )
 
     # ------------------- workspace_collection_items -------------------
 
-    async def list_items_for_collection(
-        self, collection_id: UUID
-    ) -> List[WorkspaceCollectionItem]:
-        query = """
-            SELECT *
-            FROM workspace_collection_items
-            WHERE collection_id = $1
-            ORDER BY created_at DESC
+    async def list_collection_documents(
+        self,
+        collection_id: UUID,
+        *,
+        user_access_levels: List[str],
+        limit: int = 100,
+        after: Optional[Tuple[datetime, UUID]] = None,
+    ) -> KeysetPage[Dict[str, Any]]:
+        """
+        Документы подборки вместе с полями документа, по дате добавления;
+        недоступные пользователю документы отсекаются в SQL.
         """
-        rows = await self.db.fetch(query, collection_id)
-        return [WorkspaceCollectionItem.from_record(r) for r in rows]
+        keyset = "AND (i.created_at, i.id) < ($4, $5)" if after else ""
+        query = f"""
+            SELECT
+                i.id            AS item_id,
+                i.created_at    AS added_at,
+                d.id            AS document_id,
+                d.title,
+                d.department_id,
+                d.access_levels,
+                d.tags,
+                d.is_valid,
+                d.upload_date
+            FROM workspace_collection_items i
+            JOIN documents d ON d.id = i.document_id
+            WHERE i.collection_id = $1
+              AND d.access_levels <@ $3::text[]
+              {keyset}
+            ORDER BY i.created_at DESC, i.id DESC
+            LIMIT $2
+        """
+        rows = await self.db.fetch(
+            query, collection_id, limit + 1, user_access_levels, *(after or ())
+        )
+        return KeysetPage.from_rows(
+            [dict(r) for r in rows], limit, key=lambda r: (r["added_at"], r["item_id"])
+        )
 
     async def add_document_to_collection(
         self,
@@ -28,6 +28,9 @@ class DocumentVersion:
 
     is_current: bool
 
+    # NULL у версий, загруженных до перехода на адресацию по содержимому
+    content_sha256: Optional[str] = None
+
     @classmethod
     def from_record(cls, record: asyncpg.Record) -> "DocumentVersion":
         return cls(
@@ -46,4 +49,5 @@ class DocumentVersion:
             change_notes=record["change_notes"],
             metadata=record["metadata"],
             is_current=record["is_current"],
+            content_sha256=record["content_sha256"],
         )
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+import asyncpg
+
+
+@dataclass
+class IngestOutboxItem:
+    id: int
+    document_id: UUID
+    version_id: UUID
+    storage_key: str
+
+    status: str
+    attempts: int
+    last_error: Optional[str]
+    next_attempt_at: datetime
+
+    created_at: datetime
+    delivered_at: Optional[datetime]
+
+    # пакетная загрузка, из которой пришёл файл
+    batch_id: Optional[UUID] = None
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "IngestOutboxItem":
+        return cls(
+            id=record["id"],
+            document_id=record["document_id"],
+            version_id=record["version_id"],
+            storage_key=record["storage_key"],
+            status=record["status"],
+            attempts=record["attempts"],
+            last_error=record["last_error"],
+            next_attempt_at=record["next_attempt_at"],
+            created_at=record["created_at"],
+            delivered_at=record["delivered_at"],
+            batch_id=record["batch_id"],
+        )
+
+
+@dataclass
+class BulkDocumentFile:
+    """Файл пакетной загрузки, уже лежащий в хранилище"""
+    title: str
+    file_name: str
+    file_type: str
+    file_size: int
+    storage_key: str
+    content_sha256: Optional[str]
@@ -0,0 +1,24 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class KeysetPage(Generic[T]):
+    items: List[T]
+    # ключ сортировки последнего элемента, если дальше есть ещё строки
+    next_key: Optional[Tuple[Any, ...]]
+
+    @classmethod
+    def from_rows(
+        cls,
+        items: Sequence[T],
+        limit: int,
+        key: Callable[[T], Tuple[Any, ...]],
+    ) -> "KeysetPage[T]":
+        """items выбраны с LIMIT limit + 1: лишняя строка — признак следующей страницы"""
+        if len(items) > limit:
+            page = list(items[:limit])
+            return cls(items=page, next_key=key(page[-1]))
+        return cls(items=list(items), next_key=None)
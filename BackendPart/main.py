@@ -1,5 +1,7 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
@@ -8,6 +10,18 @@ from utils.logger import setup_logging, get_logger
 from utils.config import (
     DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD,
     DB_MIN_POOL_SIZE, DB_MAX_POOL_SIZE,
+    RAG_API_URL, RAG_HTTP2, RAG_MAX_CONNECTIONS, RAG_MAX_KEEPALIVE_CONNECTIONS,
+    RAG_KEEPALIVE_EXPIRY, RAG_CONNECT_TIMEOUT, RAG_ASK_TIMEOUT, RAG_INGEST_TIMEOUT,
+    RAG_RETRIES, RAG_BREAKER_FAILURES, RAG_BREAKER_RESET_SECONDS,
+    INGEST_BATCH_SIZE, INGEST_POLL_INTERVAL_SECONDS, INGEST_MAX_ATTEMPTS,
+    INGEST_RETRY_BACKOFF_SECONDS, INGEST_RETRY_MAX_BACKOFF_SECONDS,
+    INGEST_TRANSIENT_RETRY_SECONDS, INGEST_BULK_MAX_FILES,
+    BULK_UPLOAD_MAX_FILES, BULK_UPLOAD_MAX_FILE_MB, BULK_UPLOAD_MAX_TOTAL_MB,
+    DOC_STORAGE_DIR, PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_MB, PREVIEW_THUMB_WIDTH,
+    PREVIEW_PAGE_WIDTH, PREVIEW_MAX_PAGES, PREVIEW_RENDER_CONCURRENCY,
+    DOC_TEXT_DIR, TEXT_INDEX_POLL_INTERVAL_SECONDS,
+    AUDIT_PARTITIONS_AHEAD, AUDIT_RETENTION_MONTHS, AUDIT_ARCHIVE_DIR,
+    AUDIT_MAINTENANCE_INTERVAL_SECONDS,
 )
 
 from database.async_db import AsyncDatabase
@@ -16,8 +30,15 @@ from database.managers.user_manager import UserManager
 from database.managers.document_manager import DocumentManager
 from database.managers.workspace_manager import WorkspaceManager
 from database.managers.audit_manager import AuditManager
+from database.managers.ingest_manager import IngestOutboxManager
 
+from apps.core.rag_client import CircuitBreaker, RagClient
 from apps.services.auth_service import AuthService
+from apps.services.bulk_upload_service import BulkUploadService
+from apps.services.audit_retention_service import AuditRetentionService
+from apps.services.ingest_dispatcher import IngestDispatcher
+from apps.services.preview_service import PreviewService
+from apps.services.text_index_service import TextIndexService
 
 from apps.api.routers import router as api_router
 
@@ -46,12 +67,92 @@ async def lifespan(app: FastAPI):
     app.state.document_manager = DocumentManager(db)
     app.state.workspace_manager = WorkspaceManager(db)
     app.state.audit_manager = AuditManager(db)
+    app.state.ingest_outbox_manager = IngestOutboxManager(db)
 
     app.state.auth_service = AuthService(app.state.user_manager, app.state.rbac_manager)
+    app.state.bulk_upload_service = BulkUploadService(
+        app.state.document_manager,
+        max_files=BULK_UPLOAD_MAX_FILES,
+        max_file_bytes=BULK_UPLOAD_MAX_FILE_MB * 1024 * 1024,
+        max_total_bytes=BULK_UPLOAD_MAX_TOTAL_MB * 1024 * 1024,
+    )
+
+    app.state.rag_client = RagClient(
+        RAG_API_URL,
+        max_connections=RAG_MAX_CONNECTIONS,
+        max_keepalive_connections=RAG_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=RAG_KEEPALIVE_EXPIRY,
+        http2=RAG_HTTP2,
+        connect_timeout=RAG_CONNECT_TIMEOUT,
+        ask_timeout=RAG_ASK_TIMEOUT,
+        ingest_timeout=RAG_INGEST_TIMEOUT,
+        retries=RAG_RETRIES,
+        breaker=CircuitBreaker(
+            failure_threshold=RAG_BREAKER_FAILURES,
+            reset_timeout=RAG_BREAKER_RESET_SECONDS,
+        ),
+        # сбои фоновой индексации не должны размыкать цепь для поиска
+        ingest_breaker=CircuitBreaker(
+            failure_threshold=RAG_BREAKER_FAILURES,
+            reset_timeout=RAG_BREAKER_RESET_SECONDS,
+        ),
+    )
+
+    app.state.preview_service = PreviewService(
+        PREVIEW_CACHE_DIR,
+        DOC_STORAGE_DIR,
+        max_bytes=PREVIEW_CACHE_MAX_MB * 1024 * 1024,
+        thumb_width=PREVIEW_THUMB_WIDTH,
+        page_width=PREVIEW_PAGE_WIDTH,
+        max_pages=PREVIEW_MAX_PAGES,
+        concurrency=PREVIEW_RENDER_CONCURRENCY,
+    )
+
+    app.state.ingest_dispatcher = IngestDispatcher(
+        app.state.ingest_outbox_manager,
+        app.state.rag_client,
+        batch_size=INGEST_BATCH_SIZE,
+        poll_interval=INGEST_POLL_INTERVAL_SECONDS,
+        max_attempts=INGEST_MAX_ATTEMPTS,
+        backoff_seconds=INGEST_RETRY_BACKOFF_SECONDS,
+        max_backoff_seconds=INGEST_RETRY_MAX_BACKOFF_SECONDS,
+        transient_retry_seconds=INGEST_TRANSIENT_RETRY_SECONDS,
+        bulk_max_files=INGEST_BULK_MAX_FILES,
+    )
+    ingest_dispatcher_task = asyncio.create_task(
+        app.state.ingest_dispatcher.run_forever()
+    )
+
+    text_indexer = TextIndexService(
+        app.state.document_manager,
+        DOC_TEXT_DIR,
+        DOC_STORAGE_DIR,
+        poll_interval=TEXT_INDEX_POLL_INTERVAL_SECONDS,
+    )
+    text_indexer_task = asyncio.create_task(text_indexer.run_forever())
+
+    audit_retention = AuditRetentionService(
+        app.state.audit_manager,
+        months_ahead=AUDIT_PARTITIONS_AHEAD,
+        retention_months=AUDIT_RETENTION_MONTHS,
+        archive_dir=Path(AUDIT_ARCHIVE_DIR) if AUDIT_ARCHIVE_DIR else None,
+    )
+    audit_retention_task = asyncio.create_task(
+        audit_retention.run_forever(AUDIT_MAINTENANCE_INTERVAL_SECONDS)
+    )
 
     try:
         yield
     finally:
+        for task in (ingest_dispatcher_task, text_indexer_task, audit_retention_task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        await app.state.preview_service.aclose()
+        await app.state.rag_client.aclose()
         await db.close()
         log.info("Соединение с БД закрыто [✓]")
 
@@ -0,0 +1,50 @@
+"""
+Пересчёт user_activity_counters по audit_events.
+
+    python -m scripts.backfill_activity_counters [--user-id UUID]
+
+Счётчики считаются по тем событиям, что остались в audit_events: если старые
+секции уже удалены по retention, пересчёт «забудет» их вклад.
+"""
+import argparse
+import asyncio
+import logging
+from uuid import UUID
+
+from utils.logger import setup_logging, get_logger
+from utils.config import (
+    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD,
+)
+
+from database.async_db import AsyncDatabase
+from database.managers.audit_manager import AuditManager
+
+log = get_logger("[BackfillActivity]")
+
+
+async def main(user_id: UUID | None) -> None:
+    db = AsyncDatabase(
+        db_name=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        min_size=1,
+        max_size=1,
+    )
+    await db.connect()
+    try:
+        status = await AuditManager(db).rebuild_activity_counters(user_id)
+        log.info(f"user_activity_counters пересчитаны: {status}")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    setup_logging(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", type=UUID, default=None)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.user_id))
@@ -0,0 +1,316 @@
+"""
+Проверка планов горячих запросов менеджеров.
+
+    python -m scripts.check_query_plans [--scale N]
+
+В одной транзакции (с откатом в конце) заполняет таблицы синтетическими
+данными, выполняет ANALYZE и вызывает настоящие методы менеджеров, подменив
+им базу: вместо выполнения каждый запрос проходит через EXPLAIN. Если в
+плане есть Seq Scan по проверяемой таблице — скрипт завершается с кодом 1,
+так что регрессию плана (потерянный индекс, изменённый запрос) видно
+до выкладки. Запускать на пустой/тестовой БД с применёнными миграциями.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, List, Set, Tuple
+
+from utils.logger import setup_logging, get_logger
+from utils.config import (
+    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD,
+)
+
+from database.async_db import AsyncDatabase
+from database.managers.document_manager import DocumentManager
+from database.managers.user_manager import UserManager
+from database.managers.workspace_manager import WorkspaceManager
+
+log = get_logger("[QueryPlans]")
+
+SEED_PREFIX = "plan_check_"
+
+
+class PlanRecorder:
+    """
+    Заменяет AsyncDatabase для менеджеров: запрос не выполняется,
+    а снимается его план на соединении с засеянными данными.
+    """
+
+    def __init__(self, conn) -> None:
+        self.conn = conn
+        self.plans: List[dict] = []
+
+    async def _explain(self, query: str, *args: Any) -> None:
+        raw = await self.conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+        self.plans.append(json.loads(raw)[0]["Plan"])
+
+    async def execute(self, query: str, *args: Any) -> str:
+        await self._explain(query, *args)
+        return "EXPLAIN 0"
+
+    async def fetch(self, query: str, *args: Any) -> list:
+        await self._explain(query, *args)
+        return []
+
+    async def fetchrow(self, query: str, *args: Any) -> None:
+        await self._explain(query, *args)
+        return None
+
+    async def fetchval(self, query: str, *args: Any) -> None:
+        await self._explain(query, *args)
+        return None
+
+
+SEED_SQL = """
+INSERT INTO users (username, password_hash, email)
+SELECT '{p}' || g, 'x', '{p}' || g || '@example.com'
+FROM generate_series(1, {users}) g;
+
+INSERT INTO documents (title, access_levels, tags, status, current_version)
+SELECT
+    '{p}' || g,
+    CASE WHEN g % 10 = 0 THEN ARRAY['secret'] ELSE '{{}}'::text[] END,
+    ARRAY['tag' || (g % 200), 'topic' || (g % 37)],
+    'active',
+    1
+FROM generate_series(1, {documents}) g;
+
+INSERT INTO document_versions (
+    document_id, version, file_name, file_type, file_size, storage_key, is_current
+)
+SELECT d.id, 1, d.title || '.pdf', 'application/pdf', 1024, md5(d.title) || '.pdf', true
+FROM documents d
+WHERE d.title LIKE '{p}%';
+
+WITH u AS (
+    SELECT array_agg(id) AS ids FROM users WHERE username LIKE '{p}%'
+)
+INSERT INTO workspace_queries (user_id, question, created_at)
+SELECT u.ids[1 + g % {users}], 'вопрос ' || g, now() - g * interval '1 minute'
+FROM u, generate_series(1, {queries}) g;
+
+WITH u AS (
+    SELECT array_agg(id) AS ids FROM users WHERE username LIKE '{p}%'
+)
+INSERT INTO workspace_collections (user_id, name, created_at)
+SELECT u.ids[1 + g % {users}], '{p}' || g, now() - g * interval '1 minute'
+FROM u, generate_series(1, {collections}) g;
+
+WITH c AS (
+    SELECT array_agg(id) AS ids FROM workspace_collections WHERE name LIKE '{p}%'
+), d AS (
+    SELECT array_agg(id) AS ids FROM documents WHERE title LIKE '{p}%'
+)
+INSERT INTO workspace_collection_items (collection_id, document_id)
+SELECT DISTINCT c.ids[1 + g % {collections}], d.ids[1 + g % {documents}]
+FROM c, d, generate_series(1, {items}) g;
+
+WITH u AS (
+    SELECT array_agg(id) AS ids FROM users WHERE username LIKE '{p}%'
+)
+INSERT INTO refresh_tokens (user_id, token_jti, expires_at)
+SELECT u.ids[1 + g % {users}], '{p}' || g, now() + interval '1 day'
+FROM u, generate_series(1, {tokens}) g;
+
+ANALYZE users;
+ANALYZE refresh_tokens;
+ANALYZE documents;
+ANALYZE document_versions;
+ANALYZE workspace_queries;
+ANALYZE workspace_collections;
+ANALYZE workspace_collection_items;
+"""
+
+
+def seq_scanned_tables(plan: dict) -> Set[str]:
+    found = set()
+    if plan.get("Node Type") == "Seq Scan":
+        found.add(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found |= seq_scanned_tables(child)
+    return found
+
+
+async def run_checks(conn) -> List[Tuple[str, Set[str]]]:
+    sample = await conn.fetchrow(
+        f"""
+        SELECT
+            u.id AS user_id,
+            u.email AS email,
+            (SELECT id FROM documents WHERE title LIKE '{SEED_PREFIX}%' LIMIT 1) AS document_id,
+            (SELECT id FROM workspace_collections WHERE user_id = u.id LIMIT 1) AS collection_id,
+            (SELECT array_agg(storage_key) FROM (
+                SELECT storage_key FROM document_versions
+                WHERE file_name LIKE '{SEED_PREFIX}%' LIMIT 10
+            ) s) AS storage_keys,
+            (SELECT array_agg(id) FROM (
+                SELECT id FROM document_versions
+                WHERE file_name LIKE '{SEED_PREFIX}%' LIMIT 10
+            ) s) AS version_ids
+        FROM users u
+        WHERE u.username = '{SEED_PREFIX}7'
+        """
+    )
+
+    # ключ «прошлой страницы»: глубокая страница должна идти по тому же индексу
+    page_key = (datetime.now(timezone.utc), sample["user_id"])
+
+    recorder = PlanRecorder(conn)
+    users = UserManager(recorder)
+    documents = DocumentManager(recorder)
+    workspace = WorkspaceManager(recorder)
+
+    checks: List[Tuple[str, Callable[[], Awaitable[Any]], Set[str]]] = [
+        (
+            "UserManager.get_user_by_email",
+            lambda: users.get_user_by_email(sample["email"]),
+            {"users"},
+        ),
+        (
+            "UserManager.revoke_all_for_user",
+            lambda: users.revoke_all_for_user(sample["user_id"]),
+            {"refresh_tokens"},
+        ),
+        (
+            "DocumentManager.get_search_candidates",
+            lambda: documents.get_search_candidates(
+                version_ids=sample["version_ids"],
+                storage_keys=sample["storage_keys"],
+            ),
+            {"document_versions", "documents"},
+        ),
+        (
+            "DocumentManager.count_storage_key_references",
+            lambda: documents.count_storage_key_references(sample["storage_keys"][0]),
+            {"document_versions"},
+        ),
+        (
+            "WorkspaceManager.list_queries_for_user",
+            lambda: workspace.list_queries_for_user(sample["user_id"]),
+            {"workspace_queries"},
+        ),
+        (
+            "WorkspaceManager.list_queries_for_user (следующая страница)",
+            lambda: workspace.list_queries_for_user(sample["user_id"], after=page_key),
+            {"workspace_queries"},
+        ),
+        (
+            "WorkspaceManager.list_collections_with_documents",
+            lambda: workspace.list_collections_with_documents(
+                sample["user_id"], user_access_levels=[]
+            ),
+            {"workspace_collections", "workspace_collection_items", "documents"},
+        ),
+        (
+            "WorkspaceManager.list_collections_with_documents (следующая страница)",
+            lambda: workspace.list_collections_with_documents(
+                sample["user_id"], user_access_levels=[], after=page_key
+            ),
+            {"workspace_collections", "workspace_collection_items", "documents"},
+        ),
+        (
+            "WorkspaceManager.list_collection_documents",
+            lambda: workspace.list_collection_documents(
+                sample["collection_id"], user_access_levels=[]
+            ),
+            {"workspace_collection_items", "documents"},
+        ),
+        (
+            "DocumentManager.get_document_view",
+            lambda: documents.get_document_view(sample["document_id"]),
+            {"documents", "document_versions"},
+        ),
+        (
+            "DocumentManager.get_versions_for_document",
+            lambda: documents.get_versions_for_document(sample["document_id"], limit=20),
+            {"document_versions"},
+        ),
+        (
+            "DocumentManager.list_documents",
+            lambda: documents.list_documents(user_access_levels=[]),
+            {"documents", "document_versions"},
+        ),
+        (
+            "DocumentManager.list_documents (следующая страница)",
+            lambda: documents.list_documents(user_access_levels=[], after=page_key),
+            {"documents", "document_versions"},
+        ),
+        (
+            "documents.tags && (фильтр по тегам)",
+            lambda: recorder.fetch(
+                "SELECT id FROM documents WHERE tags && $1::text[]", ["tag7"]
+            ),
+            {"documents"},
+        ),
+    ]
+
+    failures: List[Tuple[str, Set[str]]] = []
+    for name, call, tables in checks:
+        recorder.plans.clear()
+        await call()
+
+        scanned = set()
+        for plan in recorder.plans:
+            scanned |= seq_scanned_tables(plan) & tables
+
+        if scanned:
+            failures.append((name, scanned))
+            log.error(f"FAIL {name}: Seq Scan по {', '.join(sorted(scanned))}")
+        else:
+            log.info(f"ok   {name}")
+
+    return failures
+
+
+async def main(scale: int) -> int:
+    db = AsyncDatabase(
+        db_name=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        min_size=1,
+        max_size=1,
+    )
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            tr = conn.transaction()
+            await tr.start()
+            try:
+                await conn.execute(
+                    SEED_SQL.format(
+                        p=SEED_PREFIX,
+                        users=2_000 * scale,
+                        documents=10_000 * scale,
+                        queries=20_000 * scale,
+                        collections=4_000 * scale,
+                        items=20_000 * scale,
+                        tokens=8_000 * scale,
+                    )
+                )
+                failures = await run_checks(conn)
+            finally:
+                # синтетические данные не должны остаться в базе
+                await tr.rollback()
+    finally:
+        await db.close()
+
+    if failures:
+        log.error(f"Запросов с Seq Scan: {len(failures)}")
+        return 1
+    log.info("Все проверенные запросы используют индексы")
+    return 0
+
+
+if __name__ == "__main__":
+    setup_logging(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=int, default=1)
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.scale)))
@@ -0,0 +1,86 @@
+"""
+Сборка мусора в хранилище документов.
+
+    python -m scripts.gc_storage [--dry-run] [--min-age SECONDS]
+
+Файлы адресуются содержимым и могут быть общими для нескольких версий,
+поэтому удаляется только блоб, на который не ссылается ни одна запись
+document_versions, а также брошенные временные файлы незавершённых загрузок.
+Файлы моложе --min-age не трогаются: их загрузка может быть ещё в процессе.
+Блоб, который после обхода хранилища тронула новая загрузка того же
+содержимого (изменился mtime), тоже остаётся.
+"""
+import argparse
+import asyncio
+import logging
+
+from utils.logger import setup_logging, get_logger
+from utils.config import (
+    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD,
+)
+
+from database.async_db import AsyncDatabase
+from database.managers.document_manager import DocumentManager
+from apps.core.storage import (
+    delete_document_file,
+    iter_stored_keys,
+    remove_stale_incoming,
+)
+
+log = get_logger("[StorageGC]")
+
+BATCH_SIZE = 1000
+
+
+async def main(dry_run: bool, min_age: float) -> None:
+    db = AsyncDatabase(
+        db_name=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        min_size=1,
+        max_size=1,
+    )
+    await db.connect()
+    try:
+        document_manager = DocumentManager(db)
+
+        mtimes = await asyncio.to_thread(lambda: dict(iter_stored_keys(min_age)))
+        keys = list(mtimes)
+        orphans = []
+        for i in range(0, len(keys), BATCH_SIZE):
+            batch = keys[i:i + BATCH_SIZE]
+            referenced = await document_manager.get_referenced_storage_keys(batch)
+            orphans.extend(k for k in batch if k not in referenced)
+
+        log.info(f"Блобов в хранилище: {len(keys)}, без ссылок: {len(orphans)}")
+        if dry_run:
+            for key in orphans:
+                log.info(f"  {key}")
+            return
+
+        deleted = 0
+        for key in orphans:
+            # между выборкой и удалением на блоб могла сослаться новая загрузка;
+            # незакоммиченную ссылку выдаёт изменившийся mtime
+            if await document_manager.count_storage_key_references(key):
+                continue
+            if await delete_document_file(key, expected_mtime_ns=mtimes[key]):
+                deleted += 1
+
+        removed = await asyncio.to_thread(remove_stale_incoming, min_age)
+        log.info(f"Удалено блобов: {deleted}, временных файлов: {removed}")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    setup_logging(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--min-age", type=float, default=24 * 3600)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.dry_run, args.min_age))
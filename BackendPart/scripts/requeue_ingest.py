@@ -0,0 +1,54 @@
+"""
+Возврат в очередь записей ingest_outbox со статусом failed.
+
+    python -m scripts.requeue_ingest [--document-id UUID] [--batch-id UUID]
+
+Без фильтров в очередь возвращаются все failed-записи. Счётчик попыток
+сбрасывается, диспетчер подхватит записи при следующем опросе.
+"""
+import argparse
+import asyncio
+import logging
+from uuid import UUID
+
+from utils.logger import setup_logging, get_logger
+from utils.config import (
+    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD,
+)
+
+from database.async_db import AsyncDatabase
+from database.managers.ingest_manager import IngestOutboxManager
+
+log = get_logger("[RequeueIngest]")
+
+
+async def main(document_id: UUID | None, batch_id: UUID | None) -> None:
+    db = AsyncDatabase(
+        db_name=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        min_size=1,
+        max_size=1,
+    )
+    await db.connect()
+    try:
+        requeued = await IngestOutboxManager(db).requeue_failed(
+            document_id=document_id,
+            batch_id=batch_id,
+        )
+        log.info(f"Возвращено в очередь записей ingest_outbox: {requeued}")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    setup_logging(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--document-id", type=UUID)
+    parser.add_argument("--batch-id", type=UUID)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.document_id, args.batch_id))
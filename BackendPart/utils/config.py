@@ -21,4 +21,46 @@ REFRESH_TOKEN_EXPIRES_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRES_DAYS", "7"))
 DEFAULT_ROLE = os.getenv("DEFAULT_ROLE", "viewer")
 
 DOC_STORAGE_DIR = Path(os.getenv("DOC_STORAGE_DIR", "/app/storage/documents")).resolve()
-RAG_API_URL = os.getenv("RAG_API_URL", "http://rag-api:8080")
\ No newline at end of file
+# сюда RAG-сервис кладёт распознанный текст (<stem>.txt)
+DOC_TEXT_DIR = Path(
+    os.getenv("DOC_TEXT_DIR", str(DOC_STORAGE_DIR.parent / "texts"))
+).resolve()
+TEXT_INDEX_POLL_INTERVAL_SECONDS = float(os.getenv("TEXT_INDEX_POLL_INTERVAL_SECONDS", "30"))
+PREVIEW_CACHE_DIR = Path(
+    os.getenv("PREVIEW_CACHE_DIR", str(DOC_STORAGE_DIR.parent / "previews"))
+).resolve()
+PREVIEW_CACHE_MAX_MB = int(os.getenv("PREVIEW_CACHE_MAX_MB", "2048"))
+PREVIEW_THUMB_WIDTH = int(os.getenv("PREVIEW_THUMB_WIDTH", "240"))
+PREVIEW_PAGE_WIDTH = int(os.getenv("PREVIEW_PAGE_WIDTH", "900"))
+PREVIEW_MAX_PAGES = int(os.getenv("PREVIEW_MAX_PAGES", "20"))
+PREVIEW_RENDER_CONCURRENCY = int(os.getenv("PREVIEW_RENDER_CONCURRENCY", "2"))
+RAG_API_URL = os.getenv("RAG_API_URL", "http://rag-api:8080")
+RAG_HTTP2 = os.getenv("RAG_HTTP2", "true").lower() == "true"
+RAG_MAX_CONNECTIONS = int(os.getenv("RAG_MAX_CONNECTIONS", "50"))
+RAG_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("RAG_MAX_KEEPALIVE_CONNECTIONS", "20"))
+RAG_KEEPALIVE_EXPIRY = float(os.getenv("RAG_KEEPALIVE_EXPIRY", "30"))
+RAG_CONNECT_TIMEOUT = float(os.getenv("RAG_CONNECT_TIMEOUT", "3"))
+RAG_ASK_TIMEOUT = float(os.getenv("RAG_ASK_TIMEOUT", "25"))
+RAG_INGEST_TIMEOUT = float(os.getenv("RAG_INGEST_TIMEOUT", "30"))
+RAG_RETRIES = int(os.getenv("RAG_RETRIES", "2"))
+RAG_BREAKER_FAILURES = int(os.getenv("RAG_BREAKER_FAILURES", "5"))
+RAG_BREAKER_RESET_SECONDS = float(os.getenv("RAG_BREAKER_RESET_SECONDS", "30"))
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "20"))
+INGEST_POLL_INTERVAL_SECONDS = float(os.getenv("INGEST_POLL_INTERVAL_SECONDS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "8"))
+INGEST_RETRY_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_BACKOFF_SECONDS", "5"))
+INGEST_RETRY_MAX_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_MAX_BACKOFF_SECONDS", "600"))
+# пока RAG недоступен, попытки не расходуются — доставка просто откладывается
+INGEST_TRANSIENT_RETRY_SECONDS = float(os.getenv("INGEST_TRANSIENT_RETRY_SECONDS", "30"))
+# сколько файлов пакетной загрузки отправлять в RAG одним заданием
+INGEST_BULK_MAX_FILES = int(os.getenv("INGEST_BULK_MAX_FILES", "1000"))
+
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", "5000"))
+BULK_UPLOAD_MAX_FILE_MB = int(os.getenv("BULK_UPLOAD_MAX_FILE_MB", "200"))
+BULK_UPLOAD_MAX_TOTAL_MB = int(os.getenv("BULK_UPLOAD_MAX_TOTAL_MB", "20480"))
+
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "3"))
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "0"))  # 0 - хранить всё
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "")
+AUDIT_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("AUDIT_MAINTENANCE_INTERVAL_SECONDS", "3600"))
\ No newline at end of file
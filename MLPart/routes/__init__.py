@@ -1,9 +1,11 @@
 from fastapi import APIRouter
 from .ask import router as ask_router
 from .ingest import router as ingest_router
+from .llm import router as llm_router
 
 api_router = APIRouter()
 api_router.include_router(ask_router, prefix="/ask", tags=["ask"])
 api_router.include_router(ingest_router, prefix="/ingest", tags=["ingest"])
+api_router.include_router(llm_router, prefix="/llm", tags=["llm"])
 
 __all__ = ["api_router"]
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from scripts.ask import answer_query
+from scripts.ask import answer_query_async
 from utils.logger import get_logger
 
 router = APIRouter()
@@ -10,23 +10,38 @@ class AskRequest(BaseModel):
     question: str
     top_k: int = 5
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class SourceItem(BaseModel):
     source: str
     content: str
+    # есть у файлов, загруженных через BackendPart после добавления id в контракт
+    document_id: Optional[str] = None
+    version_id: Optional[str] = None
+
+class ContextStats(BaseModel):
+    # оценка токенов: весь найденный текст подряд против собранного контекста
+    chunks_retrieved: int
+    chunks_used: int
+    pieces: int
+    tokens_raw: int
+    tokens_packed: int
+    tokens_saved: int
+    token_budget: int
 
 class AskResponse(BaseModel):
     answer: str
     sources: List[SourceItem]
+    context: Optional[ContextStats] = None
 
 @router.post("", response_model=AskResponse)
 async def ask_endpoint(request: AskRequest):
     try:
-        result = answer_query(request.question, request.top_k)
+        result = await answer_query_async(request.question, request.top_k)
         return AskResponse(
             answer=result["answer"],
-            sources=result["sources"]
+            sources=result["sources"],
+            context=result.get("context"),
         )
     except Exception as e:
         log.error(f"Error in ask endpoint: {e}")
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
+from typing import Dict, List, Optional
 from scripts.ingest import ingest_files
+from services.near_duplicates import get_near_duplicate_index
+from services.contradictions import get_contradiction_stage
 from utils.logger import get_logger
 from utils.config import INPUT_FOLDER
 import os
@@ -8,28 +11,95 @@ import os
 router = APIRouter()
 log = get_logger("[IngestRoute]")
 
-class IngestRequest(BaseModel):
+class IngestFile(BaseModel):
     filename: str
+    # id документа и версии в BackendPart — попадают в payload чанков
+    # и возвращаются в источниках /api/ask
+    document_id: Optional[str] = None
+    version_id: Optional[str] = None
+
+
+class IngestRequest(BaseModel):
+    filename: Optional[str] = None
+    filenames: List[str] = []
+    files: List[IngestFile] = []
 
 @router.post("")
 async def ingest_endpoint(request: IngestRequest, background_tasks: BackgroundTasks):
     """
-    Trigger ingestion process in background for a specific file located in INPUT_FOLDER.
+    Trigger ingestion process in background for files located in INPUT_FOLDER.
+    Accepts a single `filename`, a batch in `filenames` or `files` with
+    document/version ids; files that are not found are reported in `missing`
+    instead of failing the whole batch.
     """
     try:
-        file_path = os.path.join(INPUT_FOLDER, request.filename)
-        
-        if not os.path.exists(file_path):
+        names = list(request.filenames)
+        if request.filename:
+            names.append(request.filename)
+
+        refs: Dict[str, Dict[str, str]] = {}
+        for item in request.files:
+            names.append(item.filename)
+            refs[os.path.join(INPUT_FOLDER, item.filename)] = {
+                "document_id": item.document_id,
+                "version_id": item.version_id,
+            }
+
+        if not names:
+            raise HTTPException(status_code=422, detail="filename, filenames or files is required")
+
+        accepted, missing = [], []
+        for name in dict.fromkeys(names):
+            if os.path.exists(os.path.join(INPUT_FOLDER, name)):
+                accepted.append(name)
+            else:
+                missing.append(name)
+
+        # старый контракт: один файл, которого нет, — 404
+        if request.filename and not request.filenames and not request.files and missing:
             raise HTTPException(status_code=404, detail=f"File not found in input folder: {request.filename}")
-            
-        log.info(f"Triggering ingestion for file: {file_path}")
 
-        # Running in background to avoid blocking, passing ONLY the new file
-        background_tasks.add_task(ingest_files, files_to_ingest=[file_path])
-        
-        return {"message": f"Ingestion started for {request.filename} in background"}
+        if accepted:
+            log.info(f"Triggering ingestion for {len(accepted)} file(s): {accepted}")
+            # Running in background to avoid blocking, passing ONLY the new files
+            background_tasks.add_task(
+                ingest_files,
+                files_to_ingest=[os.path.join(INPUT_FOLDER, name) for name in accepted],
+                file_refs=refs,
+            )
+        if missing:
+            log.warning(f"Files not found in input folder: {missing}")
+
+        return {
+            "message": f"Ingestion started for {len(accepted)} file(s) in background",
+            "accepted": accepted,
+            "missing": missing,
+        }
     except HTTPException:
         raise
     except Exception as e:
         log.error(f"Error triggering ingestion: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/near-duplicates/{filename}")
+def near_duplicates_endpoint(filename: str):
+    """
+    Files whose text was found to be a near duplicate of `filename`
+    during ingestion, with MinHash similarity and BackendPart ids —
+    used to link versions of the same document.
+    """
+    return {"filename": filename, "related": get_near_duplicate_index().related(filename)}
+
+
+
+@router.get("/contradictions/{filename}")
+def contradictions_endpoint(filename: str):
+    """
+    Status and chunk-level findings of the background contradiction check
+    for a file from INPUT_FOLDER.
+    """
+    check = get_contradiction_stage().store.get(os.path.join(INPUT_FOLDER, filename))
+    if check is None:
+        raise HTTPException(status_code=404, detail=f"No contradiction check for file: {filename}")
+    return {"filename": filename, **check}
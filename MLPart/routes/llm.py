@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+
+from services.llm_router import LATENCY_BUCKETS, ROUTES, llm_latency
+from services.prompts import prompt_stats
+from services.rate_limiter import LIMITERS
+from scripts.ask import ask_flight
+from services.query_analysis import analysis_cache_info
+
+router = APIRouter()
+
+
+@router.get("/stats")
+def llm_stats():
+    """
+    Per-task LLM routes and latency histograms (seconds) by task, model
+    and outcome; prompt token totals when PROMPT_METRICS is enabled;
+    rate limiter queue depth and wait times per provider and priority;
+    how many identical concurrent /api/ask requests were coalesced;
+    query analysis cache hits.
+    """
+    return {
+        "routes": {task: vars(route) for task, route in ROUTES.items()},
+        "latency_buckets": list(LATENCY_BUCKETS),
+        "latency": llm_latency.snapshot(),
+        "prompt_tokens": prompt_stats.snapshot(),
+        "rate_limits": {name: lim.snapshot() for name, lim in LIMITERS.items()},
+        "ask_coalescing": ask_flight.snapshot(),
+        "query_analysis_cache": analysis_cache_info(),
+    }
@@ -1,17 +1,49 @@
+import asyncio
+
 from services.rag_system import HybridRAGSystem
 from services.embeddings import CloudRuEmbeddings
 from utils.config import (
     QDRANT_PATH, QDRANT_COLLECTION, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
     CLOUD_API_KEY, CLOUD_RU_URL
 )
+from services.rate_limiter import PRIORITY_INTERACTIVE, request_priority
+from services.single_flight import SingleFlight
 from utils.logger import get_logger
 
 log = get_logger("[AskScript]")
 
+# одинаковые вопросы, пришедшие одновременно, считаются один раз
+ask_flight = SingleFlight("ask")
+
+
+def question_key(question: str, top_k: int) -> tuple:
+    """Регистр, лишние пробелы и финальная пунктуация на ответ не влияют"""
+    normalized = " ".join(question.lower().split()).rstrip("?!. ")
+    return normalized, top_k
+
+
 def answer_query(
     question: str,
     top_k: int = 5,
 ) -> dict:
+    return ask_flight.do(question_key(question, top_k), lambda: _answer_query(question, top_k))
+
+
+async def answer_query_async(
+    question: str,
+    top_k: int = 5,
+) -> dict:
+    """
+    Для обработчика /api/ask: ответ считается в потоке, а одинаковые
+    запросы ждут его в event loop и не занимают потоки пула.
+    """
+    return await ask_flight.do_async(
+        question_key(question, top_k),
+        lambda: asyncio.to_thread(_answer_query, question, top_k),
+    )
+
+
+def _answer_query(question: str, top_k: int) -> dict:
     log.info(f"Processing question: {question}")
 
     embeddings = CloudRuEmbeddings(api_key=CLOUD_API_KEY, base_url=CLOUD_RU_URL)
@@ -25,19 +57,27 @@ def answer_query(
         llm_api_key=CLOUD_API_KEY,
         llm_base_url=CLOUD_RU_URL
     )
-    answer, results = rag.rag(question, top_k=top_k)
+    # вопрос пользователя обслуживается раньше фоновой индексации
+    with request_priority(PRIORITY_INTERACTIVE):
+        answer, results, context_report = rag.rag(question, top_k=top_k)
 
-    log.info("Answer generated successfully")
+    log.info(
+        f"Answer generated successfully (context ~{context_report.tokens_packed} tokens, "
+        f"saved ~{context_report.tokens_saved})"
+    )
     
     # Формируем список источников с цитатами
     sources = []
     for r in results:
         sources.append({
             "source": r.metadata.get('source', 'unknown'),
-            "content": r.content
+            "content": r.content,
+            "document_id": r.metadata.get('document_id'),
+            "version_id": r.metadata.get('version_id'),
         })
         
     return {
         "answer": answer,
-        "sources": sources
+        "sources": sources,
+        "context": context_report.as_dict(),
     }
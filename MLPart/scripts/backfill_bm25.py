@@ -0,0 +1,33 @@
+"""
+Построение индекса BM25 по чанкам, уже сохранённым в Qdrant.
+
+    python -m scripts.backfill_bm25
+
+Нужно один раз для коллекции, проиндексированной до появления BM25;
+новые файлы попадают в индекс при индексации. Повторный запуск
+заменяет чанки с теми же chunk_id.
+"""
+from services.bm25_index import get_bm25_index
+from services.qdrant_manager import QdrantVectorManager
+from utils.config import QDRANT_COLLECTION, QDRANT_HOST, QDRANT_PORT, VECTOR_SIZE
+from utils.logger import get_logger
+
+log = get_logger("[BM25Backfill]")
+
+
+def backfill():
+    qdrant = QdrantVectorManager(QDRANT_HOST, QDRANT_PORT, QDRANT_COLLECTION, VECTOR_SIZE)
+    index = get_bm25_index()
+
+    total = 0
+    for payloads in qdrant.iter_chunk_payloads():
+        index.add_chunks(payloads)
+        total += len(payloads)
+        log.info(f"Добавлено чанков: {total}")
+
+    index.compact()
+    log.info(f"Индекс BM25 построен: {total} чанков")
+
+
+if __name__ == "__main__":
+    backfill()
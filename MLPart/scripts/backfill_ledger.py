@@ -0,0 +1,53 @@
+"""
+Заполнение журнала индексации по уже существующей коллекции Qdrant.
+
+    python -m scripts.backfill_ledger
+
+Для каждого source из коллекции записывает число чанков, хэш файла
+(если файл ещё лежит в INPUT_FOLDER) и текущую модель эмбеддингов.
+Нужно один раз после обновления: без этого уже проиндексированные
+файлы при следующем запросе на индексацию обработаются заново.
+"""
+import os
+
+from services.embeddings import CloudRuEmbeddings
+from services.ingest_ledger import STATUS_INDEXED, file_sha256, get_ingest_ledger
+from services.qdrant_manager import QdrantVectorManager
+from utils.config import (
+    CLOUD_API_KEY, CLOUD_RU_URL, INPUT_FOLDER,
+    QDRANT_COLLECTION, QDRANT_HOST, QDRANT_PORT, VECTOR_SIZE,
+)
+from utils.logger import get_logger
+
+log = get_logger("[LedgerBackfill]")
+
+
+def backfill():
+    qdrant = QdrantVectorManager(QDRANT_HOST, QDRANT_PORT, QDRANT_COLLECTION, VECTOR_SIZE)
+    embedding_model = CloudRuEmbeddings(api_key=CLOUD_API_KEY, base_url=CLOUD_RU_URL).model
+    ledger = get_ingest_ledger()
+
+    counts = qdrant.count_chunks_by_source()
+    added = 0
+    for source, chunk_count in counts.items():
+        file_name = os.path.basename(source)
+        if ledger.get(file_name) is not None:
+            continue
+
+        file_path = os.path.join(INPUT_FOLDER, file_name)
+        content_sha256 = file_sha256(file_path) if os.path.exists(file_path) else None
+
+        ledger.mark(
+            file_name,
+            STATUS_INDEXED,
+            content_sha256=content_sha256,
+            embedding_model=embedding_model,
+            chunk_count=chunk_count,
+        )
+        added += 1
+
+    log.info(f"Источников в Qdrant: {len(counts)}, добавлено в журнал: {added}")
+
+
+if __name__ == "__main__":
+    backfill()
@@ -1,6 +1,12 @@
 # from services.ocr import YandexOCRProcessor
 # from services.embeddings import CloudRuEmbeddings
 # from services.rag_system import HybridRAGSystem
+from services.ingest_ledger import (
+    STATUS_EMPTY, STATUS_FAILED, STATUS_INDEXED,
+    file_sha256, get_ingest_ledger,
+)
+from services.near_duplicates import get_near_duplicate_index
+from services.contradictions import get_contradiction_stage
 # from utils.config import (
 #     INPUT_FOLDER, TEXT_OUTPUT_FOLDER, QDRANT_PATH, QDRANT_COLLECTION,
 #     NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, CLOUD_API_KEY, CLOUD_RU_URL,
@@ -42,6 +48,8 @@
 
 
 import glob
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 from services.ocr import YandexOCRProcessor
 from services.embeddings import CloudRuEmbeddings
@@ -52,8 +60,30 @@ from utils.config import *
 
 log = get_logger("[IngestScript]")
 
-def ingest_files(files_to_ingest=None):
+def save_extracted_text(file_path, text):
+    """
+    Кладёт распознанный текст в TEXT_OUTPUT_FOLDER/<имя без расширения>.txt
+    (как OCRProcessor.process_folder). Запись через временный файл, чтобы
+    читатель на той стороне не увидел недописанный текст.
+    """
+    try:
+        os.makedirs(TEXT_OUTPUT_FOLDER, exist_ok=True)
+        text_path = os.path.join(TEXT_OUTPUT_FOLDER, f"{Path(file_path).stem}.txt")
+        tmp_path = f"{text_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, text_path)
+    except OSError as e:
+        log.warning(f"Не удалось сохранить текст {file_path}: {e}")
+
+
+def ingest_files(files_to_ingest=None, file_refs=None):
+    """
+    file_refs: {путь файла: {"document_id": ..., "version_id": ...}} —
+    id из BackendPart, которые сохраняются вместе с чанками файла.
+    """
     log.info("Starting ingestion process...")
+    file_refs = file_refs or {}
 
     if files_to_ingest is None:
         files_to_ingest = glob.glob(os.path.join(INPUT_FOLDER, '*'))
@@ -78,64 +108,119 @@ def ingest_files(files_to_ingest=None):
 
     processed_files = []
     skipped_files = []
-    contradictions_detected = []
+    contradiction_checks = []
+    near_duplicates = []
 
-    existing_sources = rag.get_all_sources()
+    # дубликаты и переиндексация решаются по журналу: поиск по ключу,
+    # а не обход всех точек коллекции
+    ledger = get_ingest_ledger()
+    dup_index = get_near_duplicate_index()
+    contradiction_stage = get_contradiction_stage()
+    content_hashes = {}
 
+    pending_files = []
     for file_path in files_to_ingest:
         file_name = os.path.basename(file_path)
+        try:
+            content_hashes[file_path] = file_sha256(file_path)
+        except OSError as e:
+            log.error(f"Не удалось прочитать файл {file_path}: {e}")
+            skipped_files.append(file_path)
+            continue
 
-        if file_path in existing_sources or file_name in existing_sources:
+        # файл, который прямо сейчас индексирует другое задание, тоже пропускается
+        if not ledger.claim(
+            file_name,
+            content_hashes[file_path],
+            embeddings.model,
+            lease_seconds=INGEST_PROCESSING_LEASE_SECONDS,
+            **file_refs.get(file_path, {}),
+        ):
             log.info(f"Skipping duplicate file: {file_path}")
             skipped_files.append(file_path)
             continue
 
+        pending_files.append(file_path)
+
+    # OCR большую часть времени ждёт ответа сервиса, поэтому файлы пакета
+    # распознаются параллельно; проверка противоречий и запись в базу знаний
+    # идут по одному файлу в исходном порядке
+    workers = max(1, min(INGEST_OCR_WORKERS, len(pending_files)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    ocr_futures = [pool.submit(ocr_processor.process_file, p) for p in pending_files]
+
+    for file_path, ocr_future in zip(pending_files, ocr_futures):
+        file_name = os.path.basename(file_path)
+        ledger_fields = {
+            'content_sha256': content_hashes[file_path],
+            'embedding_model': embeddings.model,
+            **file_refs.get(file_path, {}),
+        }
         try:
-            text = ocr_processor.process_file(file_path)
+            text = ocr_future.result()
             if not text or text.strip() == '':
                 log.warning(f"Empty text for file {file_path}, skipping")
+                ledger.mark(file_name, STATUS_EMPTY, **ledger_fields)
                 skipped_files.append(file_path)
                 continue
 
-            # Векторизация текста
-            file_embedding = embeddings.embed_text(text[:2000])
-
-            # Поиск похожих документов в векторной базе
-            search_results = rag.search_vector(file_embedding, top_k=5)
-
-            # Формируем контекст для LLM по найденным релевантным фрагментам
-            context = "\n\n---\n\n".join([r.content for r in search_results])
-            if context is None or context == '':
-                llm_response = 'Нет'
-            
-            else:
-                contradiction_query = "Есть ли в приведённых документах текст, противоречащий следующему новому тексту? Ответь 'Да' или 'Нет'."
-                contradiction_context = f"НОВЫЙ ТЕКСТ:\n{text}\n\nСУЩЕСТВУЮЩИЕ ТЕКСТЫ:\n{context}"
-    
-                llm_response = rag.generate_answer(contradiction_query, contradiction_context)
-
-            if 'да' in llm_response.lower():
-                contradictions_detected.append(file_path)
-                log.warning(f"Противоречия обнаружены в файле: {file_path}")
-            else:
-                log.info(f"Противоречий не обнаружено для файла: {file_path}")
+            # Текст нужен BackendPart для полнотекстового поиска в Postgres
+            save_extracted_text(file_path, text)
+
+            # Почти-дубликаты по MinHash: повторный скан или новая версия
+            # того же текста находится локально, без обращения к LLM
+            signature = dup_index.signature(text)
+            duplicates = []
+            if signature is not None:
+                duplicates = dup_index.find(
+                    signature,
+                    exclude_source=file_name,
+                    min_similarity=NEAR_DUP_LINK_THRESHOLD,
+                )
+            if duplicates:
+                dup_index.link(file_name, duplicates, **file_refs.get(file_path, {}))
+                near_duplicates.append({
+                    'file': file_path,
+                    'duplicate_of': duplicates[0].source,
+                    'similarity': round(duplicates[0].similarity, 3),
+                    'exact': duplicates[0].exact,
+                })
 
             # Добавляем файл в базу знаний
-            file_info = {'original_file': file_path, 'text': text}
-            rag.create_knowledge_base([file_info])
+            file_info = {'original_file': file_path, 'text': text, **file_refs.get(file_path, {})}
+            chunk_count = rag.create_knowledge_base([file_info])
+            ledger.mark(file_name, STATUS_INDEXED, chunk_count=chunk_count, **ledger_fields)
+            if signature is not None:
+                dup_index.add(file_name, signature, **file_refs.get(file_path, {}))
+
+            # Противоречия проверяются отдельной фоновой стадией по чанкам,
+            # уже записанным в Qdrant; почти-дубликат проверять незачем
+            if duplicates and duplicates[0].similarity >= NEAR_DUP_SKIP_THRESHOLD:
+                log.info(
+                    f"Файл {file_path} почти совпадает с {duplicates[0].source} "
+                    f"(сходство {duplicates[0].similarity:.2f}), проверка противоречий пропущена"
+                )
+            else:
+                contradiction_stage.schedule(file_path, **file_refs.get(file_path, {}))
+                contradiction_checks.append(file_path)
 
             processed_files.append(file_path)
             log.info(f"File ingested: {file_path}")
 
         except Exception as e:
             log.error(f"Ошибка при обработке файла {file_path}: {e}")
+            ledger.mark(file_name, STATUS_FAILED, error=str(e), **ledger_fields)
             skipped_files.append(file_path)
 
+    pool.shutdown()
+
     return {
         "status": "success",
         "processed_count": len(processed_files),
         "skipped_count": len(skipped_files),
-        "contradictions": contradictions_detected,
+        # результаты — GET /api/ingest/contradictions/{filename}
+        "contradiction_checks_queued": contradiction_checks,
+        "near_duplicates": near_duplicates,
         "processed_files": processed_files,
         "skipped_files": skipped_files
     }
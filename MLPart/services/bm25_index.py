@@ -0,0 +1,411 @@
+# ============= Лексический поиск BM25 =============
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from nltk.stem.snowball import SnowballStemmer
+
+from services.models import SearchResult
+from utils.config import BM25_INDEX_PATH, BM25_MERGE_FACTOR
+from utils.logger import get_logger
+
+log = get_logger("[BM25]")
+
+# номера и даты (2763, 10.06.2020, 19-рг) — отдельный токен целиком;
+# части даты/номера дополнительно индексируются как обычные слова
+_TOKEN_RE = re.compile(r"\d+(?:[./-]\w+)+|\w+", re.UNICODE)
+_PART_RE = re.compile(r"\w+", re.UNICODE)
+
+_stemmer = SnowballStemmer("russian")
+
+
+@lru_cache(maxsize=200_000)
+def _stem(word: str) -> str:
+    if word.isdigit() or len(word) <= 3:
+        return word
+    return _stemmer.stem(word)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token[0].isdigit() and not token.isdigit():
+            tokens.append(token)
+            tokens.extend(_PART_RE.findall(token))
+        else:
+            tokens.append(_stem(token))
+    return tokens
+
+
+class BM25Index:
+    """
+    Инвертированный индекс BM25 по текстам чанков в SQLite.
+
+    Списки вхождений хранятся сегментами: каждая запись в базу знаний
+    добавляет новый сегмент (doc_no — массив uint32, tf — массив uint16),
+    поэтому индексация не переписывает уже сохранённые списки. Сегменты
+    сливаются по ярусам (log-structured): ярус — порядок размера сегмента
+    по основанию merge_factor, и когда на ярусе набирается merge_factor
+    сегментов, они сливаются в один сегмент следующего яруса. Каждое
+    вхождение переписывается O(log N) раз, а не при каждом слиянии;
+    заменённые чанки при слиянии выбрасываются. Длины чанков держатся в памяти
+    массивом, так что запрос — это чтение списков по терминам запроса
+    по первичному ключу и подсчёт баллов. Если в файл писал другой
+    процесс (scripts.backfill_bm25 на работающем rag-api), длины
+    перечитываются по PRAGMA data_version.
+    """
+
+    def __init__(self, path: str, *, merge_factor: int = 10, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.merge_factor = max(2, merge_factor)
+        self.k1 = k1
+        self.b = b
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._create_schema()
+        self._load_lengths()
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS bm25_chunks (
+                    doc_no      INTEGER PRIMARY KEY,
+                    chunk_id    TEXT NOT NULL,
+                    source      TEXT,
+                    chunk_index INTEGER,
+                    document_id TEXT,
+                    version_id  TEXT,
+                    content     TEXT NOT NULL,
+                    length      INTEGER NOT NULL,
+                    deleted     INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS ix_bm25_chunks_chunk_id
+                    ON bm25_chunks (chunk_id) WHERE deleted = 0;
+
+                CREATE TABLE IF NOT EXISTS bm25_postings (
+                    term     TEXT NOT NULL,
+                    segment  INTEGER NOT NULL,
+                    postings BLOB NOT NULL,
+                    PRIMARY KEY (term, segment)
+                ) WITHOUT ROWID;
+
+                -- размер сегмента в вхождениях: по нему выбирается ярус слияния
+                CREATE TABLE IF NOT EXISTS bm25_segments (
+                    segment  INTEGER PRIMARY KEY,
+                    postings INTEGER NOT NULL
+                );
+            """)
+            # индекс, созданный до появления bm25_segments
+            if self._conn.execute("SELECT 1 FROM bm25_segments LIMIT 1").fetchone() is None:
+                self._conn.execute("""
+                    INSERT INTO bm25_segments (segment, postings)
+                    SELECT segment, SUM(length(postings)) / 6
+                    FROM bm25_postings
+                    GROUP BY segment
+                """)
+
+    def _load_lengths(self):
+        """Длина каждого чанка по doc_no; 0 — чанк заменён или удалён"""
+        self._lengths = array('I')
+        self._total_length = 0
+        self._live = 0
+        with self._lock:
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            for row in self._conn.execute("SELECT doc_no, length, deleted FROM bm25_chunks ORDER BY doc_no"):
+                self._grow(row['doc_no'])
+                if not row['deleted']:
+                    self._lengths[row['doc_no']] = row['length']
+                    self._total_length += row['length']
+                    self._live += 1
+            self._segments: Dict[int, int] = {
+                row['segment']: row['postings']
+                for row in self._conn.execute("SELECT segment, postings FROM bm25_segments")
+            }
+        log.info(f"BM25: чанков в индексе {self._live}, сегментов {len(self._segments)}")
+
+    def _refresh(self):
+        """data_version меняется, только когда в файл закоммитило другое соединение"""
+        if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._load_lengths()
+
+    def _grow(self, doc_no: int):
+        if doc_no >= len(self._lengths):
+            self._lengths.extend([0] * (doc_no + 1 - len(self._lengths)))
+
+    def close(self):
+        self._conn.close()
+
+    # ------------------- запись -------------------
+    def add_chunks(self, chunks: Iterable[Dict]):
+        """
+        chunks: словари с chunk_id, content, source, chunk_index,
+        document_id, version_id. Чанк с уже известным chunk_id заменяет прежний.
+        """
+        chunks = [c for c in chunks if c.get('chunk_id') and c.get('content')]
+        if not chunks:
+            return
+
+        with self._lock:
+            conn = self._conn
+            # IMMEDIATE: пока идёт запись, другой процесс не изменит файл,
+            # и длины, сверенные с data_version, остаются актуальными
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                replaced = conn.execute(
+                    f"SELECT doc_no, length FROM bm25_chunks WHERE deleted = 0 AND chunk_id IN "
+                    f"({', '.join('?' for _ in chunks)})",
+                    [c['chunk_id'] for c in chunks],
+                ).fetchall()
+                if replaced:
+                    conn.executemany(
+                        "UPDATE bm25_chunks SET deleted = 1 WHERE doc_no = ?",
+                        [(row['doc_no'],) for row in replaced],
+                    )
+
+                next_doc = (conn.execute("SELECT MAX(doc_no) FROM bm25_chunks").fetchone()[0] or 0) + 1
+                segment = self._next_segment()
+
+                postings: Dict[str, Tuple[array, array]] = defaultdict(lambda: (array('I'), array('H')))
+                rows = []
+                for doc_no, chunk in enumerate(chunks, next_doc):
+                    terms = Counter(tokenize(chunk['content']))
+                    length = sum(terms.values())
+                    rows.append((
+                        doc_no, chunk['chunk_id'], chunk.get('source'), chunk.get('chunk_index'),
+                        chunk.get('document_id'), chunk.get('version_id'), chunk['content'], length,
+                    ))
+                    for term, tf in terms.items():
+                        docs, tfs = postings[term]
+                        docs.append(doc_no)
+                        tfs.append(min(tf, 0xFFFF))
+
+                conn.executemany(
+                    """
+                    INSERT INTO bm25_chunks (
+                        doc_no, chunk_id, source, chunk_index, document_id, version_id, content, length
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    rows,
+                )
+                conn.executemany(
+                    "INSERT INTO bm25_postings (term, segment, postings) VALUES (?, ?, ?)",
+                    [(term, segment, docs.tobytes() + tfs.tobytes()) for term, (docs, tfs) in postings.items()],
+                )
+                size = sum(len(docs) for docs, _ in postings.values())
+                conn.execute(
+                    "INSERT INTO bm25_segments (segment, postings) VALUES (?, ?)", (segment, size)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            for row in replaced:
+                self._grow(row['doc_no'])
+                self._lengths[row['doc_no']] = 0
+                self._total_length -= row['length']
+                self._live -= 1
+            for row in rows:
+                self._grow(row[0])
+                self._lengths[row[0]] = row[7]
+                self._total_length += row[7]
+                self._live += 1
+            self._segments[segment] = size
+
+            self._merge_tiers()
+
+    def compact(self):
+        """Слить все сегменты в один, выбросив заменённые чанки"""
+        with self._lock:
+            self._merge(list(self._segments))
+
+    def _tier(self, size: int) -> int:
+        return int(math.log(max(size, 1), self.merge_factor))
+
+    def _merge_tiers(self):
+        """Сливать младший ярус, набравший merge_factor сегментов, пока такие есть"""
+        with self._lock:
+            while True:
+                tiers: Dict[int, List[int]] = defaultdict(list)
+                for segment, size in self._segments.items():
+                    tiers[self._tier(size)].append(segment)
+                full = [tiers[tier] for tier in sorted(tiers) if len(tiers[tier]) >= self.merge_factor]
+                if not full:
+                    return
+                self._merge(full[0])
+
+    def _merge(self, segments: List[int]):
+        """
+        Слить сегменты в один новый. Заменённые чанки выбрасываются из
+        списков; их строки удаляются, когда слиты все сегменты индекса.
+        """
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                # другой процесс мог успеть слить часть этих сегментов
+                segments = [s for s in segments if s in self._segments]
+                if not segments:
+                    conn.execute("COMMIT")
+                    return
+
+                placeholders = ', '.join('?' for _ in segments)
+                merged: Dict[str, Tuple[array, array]] = defaultdict(lambda: (array('I'), array('H')))
+                for row in conn.execute(
+                    f"SELECT term, postings FROM bm25_postings WHERE segment IN ({placeholders}) "
+                    f"ORDER BY term, segment",
+                    segments,
+                ):
+                    docs, tfs = _decode(row['postings'])
+                    out_docs, out_tfs = merged[row['term']]
+                    for doc_no, tf in zip(docs, tfs):
+                        if self._lengths[doc_no]:
+                            out_docs.append(doc_no)
+                            out_tfs.append(tf)
+
+                segment = self._next_segment()
+                size = sum(len(docs) for docs, _ in merged.values())
+                conn.execute(f"DELETE FROM bm25_postings WHERE segment IN ({placeholders})", segments)
+                conn.execute(f"DELETE FROM bm25_segments WHERE segment IN ({placeholders})", segments)
+                conn.executemany(
+                    "INSERT INTO bm25_postings (term, segment, postings) VALUES (?, ?, ?)",
+                    [
+                        (term, segment, docs.tobytes() + tfs.tobytes())
+                        for term, (docs, tfs) in merged.items()
+                        if docs
+                    ],
+                )
+                conn.execute(
+                    "INSERT INTO bm25_segments (segment, postings) VALUES (?, ?)", (segment, size)
+                )
+                purge = len(segments) == len(self._segments)
+                if purge:
+                    conn.execute("DELETE FROM bm25_chunks WHERE deleted = 1")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            for old in segments:
+                del self._segments[old]
+            self._segments[segment] = size
+        log.info(
+            f"BM25: слито сегментов {len(segments)} в {segment} "
+            f"({size} вхождений, терминов {len(merged)})"
+        )
+
+    def _next_segment(self) -> int:
+        return (self._conn.execute("SELECT MAX(segment) FROM bm25_segments").fetchone()[0] or 0) + 1
+
+    # ------------------- поиск -------------------
+    def search(self, query: str, top_k: int = 5, max_df_ratio: float = 0.25) -> List[SearchResult]:
+        """
+        Термины, встречающиеся больше чем в max_df_ratio чанков, почти не
+        влияют на BM25 и дороги в подсчёте — они учитываются, только
+        если в запросе нет более редких.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            self._refresh()
+            if not self._live:
+                return []
+            rows = self._conn.execute(
+                f"SELECT term, postings FROM bm25_postings WHERE term IN ({', '.join('?' for _ in terms)})",
+                terms,
+            ).fetchall()
+            lengths = self._lengths
+            n_docs = self._live
+            avg_length = self._total_length / n_docs
+
+        by_term: Dict[str, List[bytes]] = defaultdict(list)
+        for row in rows:
+            by_term[row['term']].append(row['postings'])
+        df = {term: sum(len(blob) // 6 for blob in blobs) for term, blobs in by_term.items()}
+
+        selected = [t for t in by_term if df[t] <= max_df_ratio * n_docs] or list(by_term)
+
+        k1, b = self.k1, self.b
+        norm = k1 * (1 - b)
+        scale = k1 * b / avg_length
+        # чанки, записанные другим процессом уже после _refresh, считаются неизвестными
+        known = len(lengths)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in selected:
+            idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+            for blob in by_term[term]:
+                docs, tfs = _decode(blob)
+                for doc_no, tf in zip(docs, tfs):
+                    length = lengths[doc_no] if doc_no < known else 0
+                    if length:
+                        scores[doc_no] += idf * tf * (k1 + 1) / (tf + norm + scale * length)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        if not best:
+            return []
+
+        with self._lock:
+            chunk_rows = {
+                row['doc_no']: row
+                for row in self._conn.execute(
+                    f"SELECT * FROM bm25_chunks WHERE doc_no IN ({', '.join('?' for _ in best)})",
+                    [doc_no for doc_no, _ in best],
+                )
+            }
+
+        results = []
+        for doc_no, score in best:
+            row = chunk_rows.get(doc_no)
+            if row is None:
+                continue
+            results.append(SearchResult(
+                chunk_id=row['chunk_id'],
+                content=row['content'],
+                score=score,
+                source='bm25',
+                metadata={
+                    'source': row['source'],
+                    'chunk_index': row['chunk_index'],
+                    'document_id': row['document_id'],
+                    'version_id': row['version_id'],
+                },
+            ))
+        return results
+
+
+def _decode(blob: bytes) -> Tuple[array, array]:
+    count = len(blob) // 6
+    docs = array('I')
+    docs.frombytes(blob[:count * 4])
+    tfs = array('H')
+    tfs.frombytes(blob[count * 4:])
+    return docs, tfs
+
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """Один индекс на процесс: длины чанков загружаются в память один раз"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BM25Index(BM25_INDEX_PATH, merge_factor=BM25_MERGE_FACTOR)
+        return _index
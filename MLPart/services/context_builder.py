@@ -0,0 +1,185 @@
+# ============= Сборка контекста для LLM =============
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from services.models import SearchResult
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# перекрытие соседних чанков ищется не длиннее этого числа символов
+_MAX_OVERLAP = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Быстрая локальная оценка числа токенов без токенизатора модели:
+    знак препинания — токен, слово — примерно токен на 4 символа
+    (для русского текста BPE-токенизаторы дают близкое значение).
+    """
+    tokens = 0
+    for word in _WORD_RE.findall(text):
+        tokens += max(1, math.ceil(len(word) / 4))
+    return tokens
+
+
+@dataclass
+class ContextReport:
+    chunks_retrieved: int
+    chunks_used: int
+    pieces: int
+    tokens_raw: int
+    tokens_packed: int
+    token_budget: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_raw - self.tokens_packed)
+
+    def as_dict(self) -> Dict:
+        return {
+            'chunks_retrieved': self.chunks_retrieved,
+            'chunks_used': self.chunks_used,
+            'pieces': self.pieces,
+            'tokens_raw': self.tokens_raw,
+            'tokens_packed': self.tokens_packed,
+            'tokens_saved': self.tokens_saved,
+            'token_budget': self.token_budget,
+        }
+
+
+@dataclass
+class _Piece:
+    """Непрерывный фрагмент одного файла: один или несколько соседних чанков"""
+    file: str
+    origin: str
+    score: float
+    text: str
+    results: List[SearchResult] = field(default_factory=list)
+    last_index: Optional[int] = None
+
+
+def _format_piece(piece: _Piece, text: str) -> str:
+    # формат совпадает с примерами в системном промпте generate_answer
+    return f"Источник: [{piece.origin}] файл: {piece.file}\nТекст: {text}"
+
+
+def _strip_overlap(left: str, right: str) -> str:
+    """Убирает из начала right текст, которым заканчивается left"""
+    limit = min(len(left), len(right), _MAX_OVERLAP)
+    for size in range(limit, 20, -1):
+        if left.endswith(right[:size]):
+            return right[size:].lstrip()
+    return right
+
+
+def _dedupe(results: List[SearchResult]) -> List[SearchResult]:
+    """Один и тот же чанк (или тот же текст в другом файле) — один раз, с лучшим score"""
+    by_chunk: Dict[str, SearchResult] = {}
+    for r in results:
+        key = r.chunk_id or r.content
+        if key not in by_chunk or r.score > by_chunk[key].score:
+            by_chunk[key] = r
+
+    by_text: Dict[str, SearchResult] = {}
+    for r in by_chunk.values():
+        key = " ".join(r.content.split()).lower()
+        if key not in by_text or r.score > by_text[key].score:
+            by_text[key] = r
+    return list(by_text.values())
+
+
+def _merge_adjacent(results: List[SearchResult]) -> List[_Piece]:
+    """Чанки одного файла с идущими подряд chunk_index склеиваются в один фрагмент"""
+    def order(r: SearchResult) -> Tuple[str, int]:
+        index = r.metadata.get('chunk_index')
+        return (r.metadata.get('source') or 'unknown', index if isinstance(index, int) else -1)
+
+    pieces: List[_Piece] = []
+    for r in sorted(results, key=order):
+        file = r.metadata.get('source') or 'unknown'
+        index = r.metadata.get('chunk_index')
+        last = pieces[-1] if pieces else None
+        if (
+            last is not None
+            and last.file == file
+            and isinstance(index, int)
+            and last.last_index is not None
+            and index == last.last_index + 1
+        ):
+            last.text = f"{last.text} {_strip_overlap(last.text, r.content)}".strip()
+            last.score = max(last.score, r.score)
+            if r.source != last.origin:
+                last.origin = 'hybrid'
+            last.results.append(r)
+            last.last_index = index
+            continue
+
+        pieces.append(_Piece(
+            file=file,
+            origin=r.source,
+            score=r.score,
+            text=r.content,
+            results=[r],
+            last_index=index if isinstance(index, int) else None,
+        ))
+    return pieces
+
+
+def build_context(
+    results: List[SearchResult],
+    token_budget: int,
+    separator: str = "\n\n---\n\n",
+) -> Tuple[str, List[SearchResult], ContextReport]:
+    """
+    Собирает контекст из результатов поиска: убирает повторы, склеивает
+    соседние чанки одного файла, упорядочивает фрагменты по релевантности
+    и укладывает их в бюджет токенов. Возвращает текст контекста,
+    результаты, попавшие в него, и отчёт о сэкономленных токенах.
+    """
+    raw = separator.join(
+        f"Источник: [{r.source}] файл: {r.metadata.get('source', 'unknown')}\nТекст: {r.content}"
+        for r in results
+    )
+    pieces = sorted(_merge_adjacent(_dedupe(results)), key=lambda p: p.score, reverse=True)
+
+    separator_tokens = estimate_tokens(separator)
+    parts: List[str] = []
+    used: List[SearchResult] = []
+    spent = 0
+    for piece in pieces:
+        part = _format_piece(piece, piece.text)
+        cost = estimate_tokens(part) + (separator_tokens if parts else 0)
+        if spent + cost > token_budget:
+            if parts:
+                # не влез — пробуем следующие, они могут быть короче
+                continue
+            # самый релевантный фрагмент не помещается целиком — обрезаем
+            part = _truncate(piece, token_budget)
+            cost = estimate_tokens(part)
+        parts.append(part)
+        used.extend(piece.results)
+        spent += cost
+
+    report = ContextReport(
+        chunks_retrieved=len(results),
+        chunks_used=len(used),
+        pieces=len(parts),
+        tokens_raw=estimate_tokens(raw),
+        tokens_packed=spent,
+        token_budget=token_budget,
+    )
+    return separator.join(parts), used, report
+
+
+def _truncate(piece: _Piece, token_budget: int) -> str:
+    words = piece.text.split()
+    low, high = 0, len(words)
+    # двоичный поиск по числу слов, укладывающихся в бюджет
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(_format_piece(piece, " ".join(words[:middle]))) <= token_budget:
+            low = middle
+        else:
+            high = middle - 1
+    return _format_piece(piece, " ".join(words[:low]))
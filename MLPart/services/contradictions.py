@@ -0,0 +1,386 @@
+# ============= Проверка противоречий по чанкам =============
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from services.llm_router import LLMRouter
+from services.prompts import CONTRADICTION
+from services.qdrant_manager import QdrantVectorManager
+from utils.config import (
+    CLOUD_API_KEY, CLOUD_RU_URL, INGEST_LEDGER_PATH,
+    QDRANT_COLLECTION, QDRANT_HOST, QDRANT_PORT, VECTOR_SIZE,
+    CONTRADICTION_BATCH_CHARS, CONTRADICTION_BATCH_PAIRS, CONTRADICTION_MAX_PAIRS,
+    CONTRADICTION_NEIGHBOURS, CONTRADICTION_SIMILARITY_THRESHOLD, CONTRADICTION_WORKERS,
+)
+from utils.logger import get_logger
+
+log = get_logger("[Contradictions]")
+
+CHECK_QUEUED = "queued"
+CHECK_RUNNING = "running"
+CHECK_DONE = "done"
+# часть пар осталась без решения LLM (ошибка или обрезанный ответ)
+CHECK_PARTIAL = "partial"
+CHECK_FAILED = "failed"
+
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+
+@dataclass
+class ContradictionFinding:
+    new_chunk_id: str
+    existing_chunk_id: str
+    existing_source: str
+    similarity: float
+    contradiction: bool
+    explanation: str
+    existing_document_id: Optional[str] = None
+    existing_version_id: Optional[str] = None
+
+
+@dataclass
+class _Pair:
+    new_chunk: Dict
+    existing_chunk: Dict
+    similarity: float
+
+    @property
+    def cache_key(self) -> str:
+        # ключ по содержимому: переиндексация с теми же текстами не повторяет вызовы LLM
+        digest = hashlib.sha256()
+        for part in (CONTRADICTION.version, self.new_chunk.get('content', ''), self.existing_chunk.get('content', '')):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+
+class ContradictionStore:
+    """Кэш решений по парам чанков, статусы проверок и найденные противоречия (SQLite)"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS contradiction_pair_cache (
+                    pair_key      TEXT PRIMARY KEY,
+                    contradiction INTEGER NOT NULL,
+                    explanation   TEXT,
+                    created_at    TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS contradiction_checks (
+                    source      TEXT PRIMARY KEY,
+                    status      TEXT NOT NULL,
+                    document_id TEXT,
+                    version_id  TEXT,
+                    pairs       INTEGER NOT NULL DEFAULT 0,
+                    unverified  INTEGER NOT NULL DEFAULT 0,
+                    findings    TEXT,
+                    error       TEXT,
+                    updated_at  TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_contradiction_checks_status
+                    ON contradiction_checks (status);
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(contradiction_checks)")}
+            if 'unverified' not in columns:
+                # база создана до появления счётчика пар без решения
+                self._conn.execute(
+                    "ALTER TABLE contradiction_checks ADD COLUMN unverified INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def cached(self, keys: List[str]) -> Dict[str, Tuple[bool, str]]:
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT pair_key, contradiction, explanation FROM contradiction_pair_cache "
+                f"WHERE pair_key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        return {row['pair_key']: (bool(row['contradiction']), row['explanation'] or '') for row in rows}
+
+    def remember(self, verdicts: Dict[str, Tuple[bool, str]]):
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO contradiction_pair_cache (pair_key, contradiction, explanation, created_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (pair_key) DO NOTHING
+                """,
+                [(key, int(flag), explanation, now) for key, (flag, explanation) in verdicts.items()],
+            )
+
+    def set_status(
+        self,
+        source: str,
+        status: str,
+        *,
+        document_id: Optional[str] = None,
+        version_id: Optional[str] = None,
+        pairs: int = 0,
+        unverified: int = 0,
+        findings: Optional[List[ContradictionFinding]] = None,
+        error: Optional[str] = None,
+    ):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO contradiction_checks (
+                    source, status, document_id, version_id, pairs, unverified, findings, error, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET
+                    status      = excluded.status,
+                    document_id = COALESCE(excluded.document_id, contradiction_checks.document_id),
+                    version_id  = COALESCE(excluded.version_id, contradiction_checks.version_id),
+                    pairs       = excluded.pairs,
+                    unverified  = excluded.unverified,
+                    findings    = excluded.findings,
+                    error       = excluded.error,
+                    updated_at  = excluded.updated_at
+                """,
+                (
+                    source, status, document_id, version_id, pairs, unverified,
+                    json.dumps([asdict(f) for f in findings], ensure_ascii=False) if findings is not None else None,
+                    error, datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+
+    def get(self, source: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM contradiction_checks WHERE source = ?", (source,)
+            ).fetchone()
+        if row is None:
+            return None
+        result = dict(row)
+        result['findings'] = json.loads(row['findings']) if row['findings'] else []
+        return result
+
+    def unfinished(self) -> List[Dict]:
+        """Проверки, прерванные перезапуском или оставившие пары без решения"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, document_id, version_id FROM contradiction_checks WHERE status IN (?, ?, ?, ?)",
+                (CHECK_QUEUED, CHECK_RUNNING, CHECK_PARTIAL, CHECK_FAILED),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class ContradictionAnalyzer:
+    """
+    Сравнивает новые чанки файла только с ближайшими существующими
+    чанками других файлов (сходство не ниже порога), собирает пары в
+    промпты ограниченного размера и отправляет их в LLM параллельно.
+    Решения кэшируются по паре содержимого, результат — список
+    противоречий на уровне чанков.
+    """
+
+    def __init__(self, store: ContradictionStore):
+        self.store = store
+        self.qdrant = QdrantVectorManager(QDRANT_HOST, QDRANT_PORT, QDRANT_COLLECTION, VECTOR_SIZE)
+        self.llm = LLMRouter(OpenAI(api_key=CLOUD_API_KEY, base_url=CLOUD_RU_URL))
+
+    def analyze(self, source: str) -> Tuple[int, int, List[ContradictionFinding]]:
+        """Возвращает число пар-кандидатов, число пар без решения LLM и найденные противоречия"""
+        pairs = self._candidate_pairs(source)
+        if not pairs:
+            return 0, 0, []
+
+        verdicts = self.store.cached([p.cache_key for p in pairs])
+        pending = [p for p in pairs if p.cache_key not in verdicts]
+        if pending:
+            log.info(f"{source}: пар-кандидатов {len(pairs)}, из кэша {len(pairs) - len(pending)}")
+            fresh = self._ask_llm(pending)
+            self.store.remember(fresh)
+            verdicts.update(fresh)
+
+        findings = []
+        unverified = 0
+        for pair in pairs:
+            verdict = verdicts.get(pair.cache_key)
+            if verdict is None:
+                unverified += 1
+                continue
+            if not verdict[0]:
+                continue
+            existing = pair.existing_chunk
+            findings.append(ContradictionFinding(
+                new_chunk_id=pair.new_chunk.get('chunk_id', ''),
+                existing_chunk_id=existing.get('chunk_id', ''),
+                existing_source=existing.get('source', ''),
+                similarity=round(pair.similarity, 4),
+                contradiction=True,
+                explanation=verdict[1],
+                existing_document_id=existing.get('document_id'),
+                existing_version_id=existing.get('version_id'),
+            ))
+        return len(pairs), unverified, findings
+
+    # ------------------- internal -------------------
+    def _candidate_pairs(self, source: str) -> List[_Pair]:
+        chunks = [c for c in self.qdrant.get_source_chunks(source) if c.get('vector')]
+        neighbours = self.qdrant.search_neighbours(
+            [c['vector'] for c in chunks],
+            top_k=CONTRADICTION_NEIGHBOURS,
+            score_threshold=CONTRADICTION_SIMILARITY_THRESHOLD,
+            exclude_source=source,
+        )
+
+        pairs = []
+        seen = set()
+        for chunk, found in zip(chunks, neighbours):
+            for result in found:
+                key = (chunk.get('chunk_id'), result.chunk_id)
+                if key in seen:
+                    continue
+                seen.add(key)
+                pairs.append(_Pair(new_chunk=chunk, existing_chunk=result.metadata, similarity=result.score))
+
+        # самые похожие пары — самые вероятные кандидаты; общий объём ограничен
+        pairs.sort(key=lambda p: p.similarity, reverse=True)
+        return pairs[:CONTRADICTION_MAX_PAIRS]
+
+    def _batches(self, pairs: List[_Pair]) -> List[List[_Pair]]:
+        # на один фрагмент пары — не больше половины бюджета промпта
+        budget = CONTRADICTION_BATCH_CHARS
+        batches, current, size = [], [], 0
+        for pair in pairs:
+            pair_size = min(len(pair.new_chunk.get('content', '')), budget // 2) \
+                + min(len(pair.existing_chunk.get('content', '')), budget // 2)
+            if current and (size + pair_size > budget or len(current) >= CONTRADICTION_BATCH_PAIRS):
+                batches.append(current)
+                current, size = [], 0
+            current.append(pair)
+            size += pair_size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _ask_llm(self, pairs: List[_Pair]) -> Dict[str, Tuple[bool, str]]:
+        batches = self._batches(pairs)
+        verdicts: Dict[str, Tuple[bool, str]] = {}
+        workers = max(1, min(CONTRADICTION_WORKERS, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='contradiction-llm') as pool:
+            for result in pool.map(self._ask_batch, batches):
+                verdicts.update(result)
+        return verdicts
+
+    def _ask_batch(self, batch: List[_Pair]) -> Dict[str, Tuple[bool, str]]:
+        limit = CONTRADICTION_BATCH_CHARS // 2
+        parts = []
+        for n, pair in enumerate(batch, 1):
+            parts.append(
+                f"ПАРА {n}\n"
+                f"НОВЫЙ: {pair.new_chunk.get('content', '')[:limit]}\n"
+                f"СУЩЕСТВУЮЩИЙ: {pair.existing_chunk.get('content', '')[:limit]}"
+            )
+
+        try:
+            answer = self.llm.complete(CONTRADICTION, pairs="\n\n".join(parts))
+        except Exception as e:
+            # пары без решения не кэшируются: проверка получит статус partial
+            # и будет повторена после перезапуска (ContradictionStage.__init__)
+            log.error(f"Ошибка LLM при проверке {len(batch)} пар: {e}")
+            return {}
+
+        verdicts = {}
+        for item in _parse_verdicts(answer):
+            n = item.get('pair')
+            if not isinstance(n, int) or not 1 <= n <= len(batch):
+                continue
+            verdicts[batch[n - 1].cache_key] = (
+                bool(item.get('contradiction')),
+                str(item.get('explanation') or ''),
+            )
+        if len(verdicts) < len(batch):
+            log.warning(f"LLM вернул решения для {len(verdicts)} из {len(batch)} пар")
+        return verdicts
+
+
+def _parse_verdicts(answer: str) -> List[Dict]:
+    match = _JSON_ARRAY_RE.search(answer)
+    if not match:
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return []
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+class ContradictionStage:
+    """
+    Фоновая стадия после индексации: файлы ставятся в очередь, а
+    проверка идёт в отдельном потоке, не задерживая ingest_files.
+    Статус и результат каждой проверки хранятся в SQLite; прерванные
+    перезапуском, упавшие и частичные (partial — есть пары без решения
+    LLM) проверки при старте ставятся в очередь заново. Решения по уже
+    проверенным парам берутся из кэша, в LLM уходят только недостающие.
+    """
+
+    def __init__(self, path: str):
+        self.store = ContradictionStore(path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='contradictions')
+        self._analyzer: Optional[ContradictionAnalyzer] = None
+        for item in self.store.unfinished():
+            self.schedule(item['source'], document_id=item['document_id'], version_id=item['version_id'])
+
+    def schedule(self, source: str, *, document_id: Optional[str] = None, version_id: Optional[str] = None):
+        self.store.set_status(source, CHECK_QUEUED, document_id=document_id, version_id=version_id)
+        self._executor.submit(self._run, source)
+
+    def _run(self, source: str):
+        self.store.set_status(source, CHECK_RUNNING)
+        try:
+            if self._analyzer is None:
+                self._analyzer = ContradictionAnalyzer(self.store)
+            pairs, unverified, findings = self._analyzer.analyze(source)
+        except Exception as e:
+            log.error(f"Проверка противоречий для {source} не выполнена: {e}")
+            self.store.set_status(source, CHECK_FAILED, error=str(e))
+            return
+
+        if unverified:
+            log.warning(
+                f"Проверка противоречий для {source} неполная: нет решения LLM для {unverified} из {pairs} пар"
+            )
+            self.store.set_status(
+                source, CHECK_PARTIAL, pairs=pairs, unverified=unverified, findings=findings,
+                error=f"нет решения LLM для {unverified} из {pairs} пар",
+            )
+            return
+
+        self.store.set_status(source, CHECK_DONE, pairs=pairs, findings=findings)
+        if findings:
+            log.warning(f"Противоречия обнаружены в файле {source}: {len(findings)}")
+        else:
+            log.info(f"Противоречий не обнаружено для файла: {source} (пар проверено: {pairs})")
+
+
+_stage: Optional[ContradictionStage] = None
+_stage_lock = threading.Lock()
+
+
+def get_contradiction_stage() -> ContradictionStage:
+    global _stage
+    with _stage_lock:
+        if _stage is None:
+            _stage = ContradictionStage(INGEST_LEDGER_PATH)
+        return _stage
@@ -4,6 +4,8 @@ from typing import List
 from langchain_core.embeddings import Embeddings
 from openai import OpenAI
 
+from services.rate_limiter import limiter
+
 
 class CloudRuEmbeddings(Embeddings):
     def __init__(self, api_key: str, base_url: str):
@@ -20,10 +22,11 @@ class CloudRuEmbeddings(Embeddings):
         if not clean_texts:
             raise ValueError("После очистки не осталось валидных текстов")
 
-        response = self.client.embeddings.create(
-            model=self.model,
-            input=clean_texts
-        )
+        with limiter("cloudru").acquire():
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=clean_texts
+            )
         return [data.embedding for data in response.data]
 
     def embed_query(self, text: str) -> List[float]:
@@ -31,10 +34,11 @@ class CloudRuEmbeddings(Embeddings):
         if not text or not text.strip():
             raise ValueError("Текст запроса не может быть пустым")
 
-        response = self.client.embeddings.create(
-            model=self.model,
-            input=[text.strip()]
-        )
+        with limiter("cloudru").acquire():
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=[text.strip()]
+            )
         return response.data[0].embedding
 
     def embed_text(self, text: str) -> List[float]:
@@ -0,0 +1,195 @@
+# ============= Журнал индексации (SQLite) =============
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from utils.config import INGEST_LEDGER_PATH
+
+STATUS_PROCESSING = "processing"
+STATUS_INDEXED = "indexed"
+STATUS_EMPTY = "empty"
+STATUS_FAILED = "failed"
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Хэш содержимого файла потоково, без чтения целиком в память"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestLedger:
+    """
+    Журнал проиндексированных файлов: источник, хэш содержимого, число
+    чанков, модель эмбеддингов и статус. Проверка «файл уже в базе знаний»
+    и решение о переиндексации — поиск по первичному ключу и индексу
+    по хэшу, а не обход всей коллекции Qdrant.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # ingest_files выполняется в пуле потоков FastAPI — одно соединение под замком
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingested_sources (
+                    source          TEXT PRIMARY KEY,
+                    content_sha256  TEXT,
+                    chunk_count     INTEGER NOT NULL DEFAULT 0,
+                    embedding_model TEXT,
+                    status          TEXT NOT NULL,
+                    document_id     TEXT,
+                    version_id      TEXT,
+                    error           TEXT,
+                    updated_at      TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS ix_ingested_sources_sha256
+                ON ingested_sources (content_sha256)
+            """)
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, source: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ingested_sources WHERE source = ?", (source,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_indexed_by_hash(self, content_sha256: str, embedding_model: str) -> Optional[Dict]:
+        """Тот же файл под другим именем, уже проиндексированный текущей моделью"""
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT * FROM ingested_sources
+                WHERE content_sha256 = ? AND embedding_model = ? AND status = ?
+                LIMIT 1
+                """,
+                (content_sha256, embedding_model, STATUS_INDEXED),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def needs_ingest(
+        self,
+        source: str,
+        content_sha256: str,
+        embedding_model: str,
+        *,
+        lease_seconds: float = 0,
+    ) -> bool:
+        """
+        Переиндексация нужна, если файла нет в журнале, прошлая попытка
+        не завершилась, содержимое изменилось или сменилась модель эмбеддингов.
+        Запись processing моложе lease_seconds — тот же файл сейчас
+        индексирует другое задание; более старая считается брошенной.
+        """
+        entry = self.get(source)
+        if entry is not None:
+            if entry['content_sha256'] != content_sha256 or entry['embedding_model'] != embedding_model:
+                return True
+            if entry['status'] == STATUS_PROCESSING:
+                started = datetime.fromisoformat(entry['updated_at'])
+                return datetime.now(timezone.utc) - started >= timedelta(seconds=lease_seconds)
+            return entry['status'] not in (STATUS_INDEXED, STATUS_EMPTY)
+        return self.find_indexed_by_hash(content_sha256, embedding_model) is None
+
+    def claim(
+        self,
+        source: str,
+        content_sha256: str,
+        embedding_model: str,
+        *,
+        lease_seconds: float,
+        document_id: Optional[str] = None,
+        version_id: Optional[str] = None,
+    ) -> bool:
+        """
+        Проверка needs_ingest и отметка processing одной транзакцией:
+        из пересекающихся заданий /api/ingest файл берёт только одно.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self.needs_ingest(
+                    source, content_sha256, embedding_model, lease_seconds=lease_seconds
+                ):
+                    self._conn.execute("COMMIT")
+                    return False
+                self.mark(
+                    source,
+                    STATUS_PROCESSING,
+                    content_sha256=content_sha256,
+                    embedding_model=embedding_model,
+                    document_id=document_id,
+                    version_id=version_id,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def mark(
+        self,
+        source: str,
+        status: str,
+        *,
+        content_sha256: Optional[str] = None,
+        embedding_model: Optional[str] = None,
+        chunk_count: int = 0,
+        document_id: Optional[str] = None,
+        version_id: Optional[str] = None,
+        error: Optional[str] = None,
+    ):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO ingested_sources (
+                    source, content_sha256, chunk_count, embedding_model,
+                    status, document_id, version_id, error, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET
+                    content_sha256  = excluded.content_sha256,
+                    chunk_count     = excluded.chunk_count,
+                    embedding_model = excluded.embedding_model,
+                    status          = excluded.status,
+                    document_id     = COALESCE(excluded.document_id, ingested_sources.document_id),
+                    version_id      = COALESCE(excluded.version_id, ingested_sources.version_id),
+                    error           = excluded.error,
+                    updated_at      = excluded.updated_at
+                """,
+                (
+                    source, content_sha256, chunk_count, embedding_model,
+                    status, document_id, version_id, error,
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+
+
+_ledger: Optional[IngestLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ingest_ledger() -> IngestLedger:
+    """Общий журнал процесса: соединение SQLite открывается один раз"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = IngestLedger(INGEST_LEDGER_PATH)
+        return _ledger
@@ -0,0 +1,175 @@
+# ============= Маршрутизация вызовов LLM по задачам =============
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from openai import APIConnectionError, APITimeoutError
+
+from services.context_builder import estimate_tokens
+from services.prompts import PromptTemplate, prompt_stats
+from services.rate_limiter import limiter
+from utils.config import (
+    LLM_ANSWER_MODEL, LLM_ANSWER_FALLBACK_MODEL, LLM_ANSWER_MAX_TOKENS, LLM_ANSWER_TIMEOUT, LLM_ANSWER_DEADLINE,
+    LLM_CHECK_MODEL, LLM_CHECK_FALLBACK_MODEL, LLM_CHECK_MAX_TOKENS, LLM_CHECK_TIMEOUT,
+    PROMPT_METRICS,
+)
+from utils.logger import get_logger
+
+log = get_logger("[LLMRouter]")
+
+
+@dataclass(frozen=True)
+class LLMRoute:
+    model: str
+    max_tokens: int
+    temperature: float
+    timeout: float
+    # модель на случай таймаута основной; None — без повтора
+    fallback_model: Optional[str] = None
+    # общий срок на основную и резервную модель, секунды; None — без ограничения
+    deadline: Optional[float] = None
+
+
+# Ответ пользователю — флагманская модель; короткие решения «да/нет»
+# (проверка противоречий) — модель поменьше и быстрее
+ROUTES: Dict[str, LLMRoute] = {
+    "answer": LLMRoute(
+        model=LLM_ANSWER_MODEL,
+        max_tokens=LLM_ANSWER_MAX_TOKENS,
+        temperature=0.2,
+        timeout=LLM_ANSWER_TIMEOUT,
+        fallback_model=LLM_ANSWER_FALLBACK_MODEL,
+        deadline=LLM_ANSWER_DEADLINE,
+    ),
+    "contradiction": LLMRoute(
+        model=LLM_CHECK_MODEL,
+        max_tokens=LLM_CHECK_MAX_TOKENS,
+        temperature=0.0,
+        timeout=LLM_CHECK_TIMEOUT,
+        fallback_model=LLM_CHECK_FALLBACK_MODEL,
+    ),
+}
+
+# границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS: Tuple[float, ...] = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+# меньше этого до срока маршрута резервную модель уже не вызываем
+MIN_FALLBACK_SECONDS = 2.0
+
+
+class _LatencyHistograms:
+    """Гистограммы задержки по (задача, модель, исход): число, сумма и корзины"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[Tuple[str, str, str], Dict] = {}
+
+    def observe(self, task: str, model: str, outcome: str, seconds: float):
+        with self._lock:
+            entry = self._data.setdefault((task, model, outcome), {
+                'count': 0, 'sum': 0.0, 'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            })
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def snapshot(self) -> List[Dict]:
+        bounds = [str(b) for b in LATENCY_BUCKETS] + ['+Inf']
+        with self._lock:
+            return [
+                {
+                    'task': task,
+                    'model': model,
+                    'outcome': outcome,
+                    'count': entry['count'],
+                    'avg_seconds': round(entry['sum'] / entry['count'], 3),
+                    'buckets': dict(zip(bounds, entry['buckets'])),
+                }
+                for (task, model, outcome), entry in sorted(self._data.items())
+            ]
+
+
+llm_latency = _LatencyHistograms()
+
+
+class LLMRouter:
+    """
+    Вызов LLM по шаблону промпта: модель, max_tokens, температура и
+    таймаут берутся из маршрута задачи (имя шаблона). При таймауте или
+    обрыве соединения запрос повторяется на резервной модели, но только
+    в пределах оставшегося срока маршрута (deadline).
+    """
+
+    def __init__(self, client, routes: Optional[Dict[str, LLMRoute]] = None):
+        self.client = client
+        self.routes = routes or ROUTES
+
+    def complete(self, template: PromptTemplate, **variables) -> str:
+        route = self.routes[template.name]
+        messages = template.messages(**variables)
+        started = time.monotonic()
+        try:
+            return self._call(template, route, route.model, messages, route.timeout)
+        except (APITimeoutError, APIConnectionError) as e:
+            if not route.fallback_model:
+                raise
+            timeout = route.timeout
+            if route.deadline is not None:
+                timeout = min(timeout, route.deadline - (time.monotonic() - started))
+                if timeout < MIN_FALLBACK_SECONDS:
+                    log.warning(
+                        f"{template.name}: {route.model} не ответила ({type(e).__name__}), "
+                        f"на {route.fallback_model} не хватает срока {route.deadline:.0f} с"
+                    )
+                    raise
+            log.warning(
+                f"{template.name}: {route.model} не ответила за {route.timeout:.0f} с ({type(e).__name__}), "
+                f"повтор на {route.fallback_model} с таймаутом {timeout:.0f} с"
+            )
+            return self._call(template, route, route.fallback_model, messages, timeout)
+
+    def _call(
+        self,
+        template: PromptTemplate,
+        route: LLMRoute,
+        model: str,
+        messages: List[Dict[str, str]],
+        timeout: float,
+    ) -> str:
+        # ожидание в очереди лимитера не входит в задержку модели
+        with limiter("cloudru").acquire():
+            started = time.perf_counter()
+            try:
+                # без встроенных повторов клиента: при таймауте сразу идём на резервную модель
+                response = self.client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=route.max_tokens,
+                    temperature=route.temperature,
+                )
+            except (APITimeoutError, APIConnectionError):
+                llm_latency.observe(template.name, model, 'timeout', time.perf_counter() - started)
+                raise
+            except Exception:
+                llm_latency.observe(template.name, model, 'error', time.perf_counter() - started)
+                raise
+
+        seconds = time.perf_counter() - started
+        llm_latency.observe(template.name, model, 'ok', seconds)
+        answer = response.choices[0].message.content or ''
+
+        if PROMPT_METRICS:
+            usage = getattr(response, 'usage', None)
+            details = getattr(usage, 'prompt_tokens_details', None)
+            prompt_stats.record(
+                template.name,
+                # провайдер может не вернуть usage — тогда локальная оценка
+                prompt_tokens=getattr(usage, 'prompt_tokens', None)
+                or sum(estimate_tokens(m['content']) for m in messages),
+                completion_tokens=getattr(usage, 'completion_tokens', None) or estimate_tokens(answer),
+                cached_tokens=getattr(details, 'cached_tokens', None) or 0,
+                seconds=seconds,
+            )
+        return answer
@@ -0,0 +1,311 @@
+# ============= Поиск почти-дубликатов (MinHash LSH) =============
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from utils.config import INGEST_LEDGER_PATH
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_U64 = (1 << 64) - 1
+# значение «пустой корзины» до уплотнения
+_EMPTY = _U64
+
+
+@dataclass
+class TextSignature:
+    # sha256 нормализованного текста — точный дубликат (тот же текст, другой скан)
+    text_sha256: str
+    values: List[int]
+
+
+@dataclass
+class NearDuplicate:
+    source: str
+    similarity: float
+    exact: bool
+    document_id: Optional[str] = None
+    version_id: Optional[str] = None
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class NearDuplicateIndex:
+    """
+    Локальный индекс почти-дубликатов для индексации.
+
+    Текст разбивается на шинглы из shingle_size слов, по ним строится
+    MinHash-подпись (one permutation hashing: один хэш на шингл, минимум
+    в каждой из num_perm корзин — линейно по длине текста). Подписи
+    режутся на bands полос, полосы хранятся в SQLite с индексом, так что
+    кандидаты находятся поиском по ключу, а сходство оценивается долей
+    совпавших позиций подписи (оценка коэффициента Жаккара).
+    Найденные пары со сходством сохраняются для связи версий документа.
+    """
+
+    def __init__(self, path: str, *, num_perm: int = 128, bands: int = 16, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS near_dup_signatures (
+                    source      TEXT PRIMARY KEY,
+                    text_sha256 TEXT NOT NULL,
+                    signature   BLOB NOT NULL,
+                    document_id TEXT,
+                    version_id  TEXT,
+                    updated_at  TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_near_dup_signatures_sha256
+                    ON near_dup_signatures (text_sha256);
+
+                CREATE TABLE IF NOT EXISTS near_dup_buckets (
+                    band   INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    source TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_near_dup_buckets_key
+                    ON near_dup_buckets (band, bucket);
+                CREATE INDEX IF NOT EXISTS ix_near_dup_buckets_source
+                    ON near_dup_buckets (source);
+
+                CREATE TABLE IF NOT EXISTS near_dup_links (
+                    source              TEXT NOT NULL,
+                    related_source      TEXT NOT NULL,
+                    similarity          REAL NOT NULL,
+                    exact               INTEGER NOT NULL,
+                    document_id         TEXT,
+                    version_id          TEXT,
+                    related_document_id TEXT,
+                    related_version_id  TEXT,
+                    created_at          TEXT NOT NULL,
+                    PRIMARY KEY (source, related_source)
+                );
+                CREATE INDEX IF NOT EXISTS ix_near_dup_links_related
+                    ON near_dup_links (related_source);
+            """)
+
+    def close(self):
+        self._conn.close()
+
+    # ------------------- подпись -------------------
+    def signature(self, text: str) -> Optional[TextSignature]:
+        words = _WORD_RE.findall(text.lower())
+        if not words:
+            return None
+
+        normalized = " ".join(words)
+        k = self.shingle_size
+        if len(words) <= k:
+            shingles = {normalized}
+        else:
+            shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+        values = [_EMPTY] * self.num_perm
+        for shingle in shingles:
+            h = _hash64(shingle.encode('utf-8'))
+            slot, rest = h % self.num_perm, h // self.num_perm
+            if rest < values[slot]:
+                values[slot] = rest
+
+        # уплотнение: пустая корзина берёт значение ближайшей заполненной
+        # справа со сдвигом, иначе короткие тексты совпадали бы по пустотам
+        if _EMPTY in values:
+            filled = {i for i, v in enumerate(values) if v != _EMPTY}
+            for i in range(self.num_perm):
+                if values[i] != _EMPTY:
+                    continue
+                for step in range(1, self.num_perm):
+                    j = (i + step) % self.num_perm
+                    if j in filled:
+                        values[i] = (values[j] + step * 0x9E3779B97F4A7C15) & _U64
+                        break
+
+        return TextSignature(
+            text_sha256=hashlib.sha256(normalized.encode('utf-8')).hexdigest(),
+            values=values,
+        )
+
+    def _band_keys(self, values: List[int]) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = array('Q', values[band * self.rows:(band + 1) * self.rows]).tobytes()
+            # SQLite хранит знаковые 64-битные целые
+            keys.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), 'little', signed=True))
+        return keys
+
+    def _similarity(self, a: List[int], b: List[int]) -> float:
+        return sum(1 for x, y in zip(a, b) if x == y) / self.num_perm
+
+    # ------------------- поиск и запись -------------------
+    def find(
+        self,
+        sig: TextSignature,
+        *,
+        exclude_source: Optional[str] = None,
+        min_similarity: float = 0.0,
+    ) -> List[NearDuplicate]:
+        """Кандидаты по полосам LSH и точные дубликаты, по убыванию сходства"""
+        keys = self._band_keys(sig.values)
+        band_filter = " OR ".join("(b.band = ? AND b.bucket = ?)" for _ in keys)
+        params = [value for band, key in enumerate(keys) for value in (band, key)]
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT s.source, s.text_sha256, s.signature, s.document_id, s.version_id
+                FROM near_dup_signatures s
+                WHERE s.text_sha256 = ?
+                   OR s.source IN (SELECT b.source FROM near_dup_buckets b WHERE {band_filter})
+                """,
+                [sig.text_sha256, *params],
+            ).fetchall()
+
+        found = []
+        for row in rows:
+            if row['source'] == exclude_source:
+                continue
+            exact = row['text_sha256'] == sig.text_sha256
+            similarity = 1.0 if exact else self._similarity(sig.values, array('Q', row['signature']).tolist())
+            if similarity < min_similarity:
+                continue
+            found.append(NearDuplicate(
+                source=row['source'],
+                similarity=similarity,
+                exact=exact,
+                document_id=row['document_id'],
+                version_id=row['version_id'],
+            ))
+
+        found.sort(key=lambda d: d.similarity, reverse=True)
+        return found
+
+    def add(
+        self,
+        source: str,
+        sig: TextSignature,
+        *,
+        document_id: Optional[str] = None,
+        version_id: Optional[str] = None,
+    ):
+        """Сохранить подпись файла; повторная индексация заменяет прежнюю"""
+        keys = self._band_keys(sig.values)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM near_dup_buckets WHERE source = ?", (source,))
+                self._conn.execute(
+                    """
+                    INSERT INTO near_dup_signatures (
+                        source, text_sha256, signature, document_id, version_id, updated_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (source) DO UPDATE SET
+                        text_sha256 = excluded.text_sha256,
+                        signature   = excluded.signature,
+                        document_id = COALESCE(excluded.document_id, near_dup_signatures.document_id),
+                        version_id  = COALESCE(excluded.version_id, near_dup_signatures.version_id),
+                        updated_at  = excluded.updated_at
+                    """,
+                    (
+                        source, sig.text_sha256, array('Q', sig.values).tobytes(),
+                        document_id, version_id, datetime.now(timezone.utc).isoformat(),
+                    ),
+                )
+                self._conn.executemany(
+                    "INSERT INTO near_dup_buckets (band, bucket, source) VALUES (?, ?, ?)",
+                    [(band, key, source) for band, key in enumerate(keys)],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def link(
+        self,
+        source: str,
+        matches: List[NearDuplicate],
+        *,
+        document_id: Optional[str] = None,
+        version_id: Optional[str] = None,
+    ):
+        """Запомнить найденные пары со сходством — по ним связываются версии"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO near_dup_links (
+                    source, related_source, similarity, exact,
+                    document_id, version_id, related_document_id, related_version_id,
+                    created_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, related_source) DO UPDATE SET
+                    similarity          = excluded.similarity,
+                    exact               = excluded.exact,
+                    document_id         = excluded.document_id,
+                    version_id          = excluded.version_id,
+                    related_document_id = excluded.related_document_id,
+                    related_version_id  = excluded.related_version_id,
+                    created_at          = excluded.created_at
+                """,
+                [
+                    (
+                        source, m.source, m.similarity, int(m.exact),
+                        document_id, version_id, m.document_id, m.version_id,
+                        now,
+                    )
+                    for m in matches
+                ],
+            )
+
+    def related(self, source: str) -> List[Dict]:
+        """Связанные файлы в обе стороны, по убыванию сходства"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT related_source AS source, related_document_id AS document_id,
+                       related_version_id AS version_id, similarity, exact, created_at
+                FROM near_dup_links WHERE source = ?
+                UNION ALL
+                SELECT source, document_id, version_id, similarity, exact, created_at
+                FROM near_dup_links WHERE related_source = ?
+                ORDER BY similarity DESC
+                """,
+                (source, source),
+            ).fetchall()
+        return [{**dict(row), 'exact': bool(row['exact'])} for row in rows]
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Индекс хранится в том же файле SQLite, что и журнал индексации"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(INGEST_LEDGER_PATH)
+        return _index
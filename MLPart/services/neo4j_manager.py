@@ -1,9 +1,10 @@
 # ============= 3. Neo4j Graph Manager =============
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from neo4j import GraphDatabase
 
-from services.models import SearchResult, nlp
+from services.models import SearchResult
+from services.query_analysis import QueryAnalysis, analyze_query
 
 
 class Neo4jGraphManager:
@@ -55,11 +56,15 @@ class Neo4jGraphManager:
                 SET c.content = $content,
                     c.source = $source,
                     c.chunk_index = $chunk_index,
-                    c.length = $length
+                    c.length = $length,
+                    c.document_id = $document_id,
+                    c.version_id = $version_id
             """, chunk_id=chunk_id, content=content,
                source=metadata.get('source', ''),
                chunk_index=metadata.get('chunk_index', 0),
-               length=len(content))
+               length=len(content),
+               document_id=metadata.get('document_id'),
+               version_id=metadata.get('version_id'))
 
             # Добавляем сущности и связи
             for entity in entities:
@@ -87,28 +92,25 @@ class Neo4jGraphManager:
                     MERGE (c2)-[:PREV]->(c1)
                 """, id1=chunk_ids[i], id2=chunk_ids[i+1])
 
-    def search_by_entities(self, query: str, top_k: int = 5) -> List[SearchResult]:
+    def search_by_entities(self, query: str, top_k: int = 5,
+                           analysis: Optional[QueryAnalysis] = None) -> List[SearchResult]:
         """
         Поиск чанков через граф знаний по сущностям
 
         Алгоритм:
-        1. Извлекаем сущности из запроса
+        1. Извлекаем сущности из запроса (или берём готовый разбор analysis)
         2. Ищем эти сущности в графе (fuzzy match через fulltext)
         3. Находим связанные чанки
         4. Ранжируем по количеству совпадений
         """
-        # Извлекаем сущности из запроса
-        doc = nlp(query)
-        query_entities = [ent.text.lower() for ent in doc.ents]
-        query_tokens = [token.lemma_.lower() for token in doc
-                       if not token.is_stop and token.is_alpha]
+        # Разбор запроса кэшируется, повторный вопрос не гоняет spaCy
+        if analysis is None:
+            analysis = analyze_query(query)
 
-        all_terms = list(set(query_entities + query_tokens[:5]))  # Топ-5 токенов
-
-        if not all_terms:
+        if not analysis.terms:
             return []
 
-        print(f"  🕸️  Поиск в графе по терминам: {all_terms}")
+        print(f"  🕸️  Поиск в графе по терминам: {list(analysis.terms)}")
 
         with self.driver.session() as session:
             # Поиск через fulltext индекс
@@ -127,8 +129,10 @@ class Neo4jGraphManager:
                        total_score,
                        entity_count,
                        c.source AS source,
-                       c.chunk_index AS chunk_index
-            """, search_terms=' OR '.join(all_terms), top_k=top_k)
+                       c.chunk_index AS chunk_index,
+                       c.document_id AS document_id,
+                       c.version_id AS version_id
+            """, search_terms=analysis.lucene_query, top_k=top_k)
 
             results = []
             for record in result:
@@ -138,9 +142,12 @@ class Neo4jGraphManager:
                     score=float(record['total_score']),
                     source='graph',
                     metadata={
+                        'source': record['source'],
                         'source_file': record['source'],
                         'chunk_index': record['chunk_index'],
-                        'entity_count': record['entity_count']
+                        'entity_count': record['entity_count'],
+                        'document_id': record['document_id'],
+                        'version_id': record['version_id'],
                     }
                 ))
 
@@ -10,6 +10,7 @@ import grpc
 
 from utils.config import *
 from services.html_parser import extract_text_from_html_with_ocr
+from services.rate_limiter import limiter
 
 
 class YandexOCRProcessor:
@@ -44,10 +45,11 @@ class YandexOCRProcessor:
 
         for attempt in range(1, max_retries + 1):
             try:
-                results = self.ocr_client.get_recognition_results(
-                    operation_id,
-                    self.api_key
-                )
+                with limiter("yandex_ocr").acquire():
+                    results = self.ocr_client.get_recognition_results(
+                        operation_id,
+                        self.api_key
+                    )
                 print(f"✓ Операция завершена (попытка {attempt}/{max_retries})")
                 return results
 
@@ -88,10 +90,11 @@ class YandexOCRProcessor:
         else:
 
             try:
-                operation_id = self.ocr_client.recognize_text_async(
-                    file_path,
-                    self.api_key,
-                )
+                with limiter("yandex_ocr").acquire():
+                    operation_id = self.ocr_client.recognize_text_async(
+                        file_path,
+                        self.api_key,
+                    )
                 print(f"✓ Файл отправлен на распознавание, operation_id: {operation_id}")
 
                 results = self.wait_for_operation(operation_id)
@@ -1,8 +1,12 @@
 # ============= 4. Qdrant Vector Manager =============
-from typing import List
+from typing import Dict, List, Optional
+from uuid import NAMESPACE_URL, uuid5
 
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    Distance, FieldCondition, Filter, MatchValue, PayloadSchemaType,
+    PointStruct, QueryRequest, VectorParams,
+)
 from langchain_core.documents import Document
 
 from services.models import SearchResult
@@ -34,19 +38,30 @@ class QdrantVectorManager:
         else:
             print(f"✓ Qdrant коллекция '{self.collection_name}' уже существует")
 
+        # выборки чанков одного файла (проверка противоречий) идут по индексу
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name='source',
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+
     def add_chunks(self, chunks: List[Document], embeddings: List[List[float]]):
         """Добавление чанков с эмбеддингами в Qdrant"""
         points = []
 
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        for chunk, embedding in zip(chunks, embeddings):
+            # id точки выводится из chunk_id: повторная загрузка того же файла
+            # обновляет свои точки, а не затирает точки 0..n других файлов
             point = PointStruct(
-                id=idx,
+                id=str(uuid5(NAMESPACE_URL, chunk.metadata['chunk_id'])),
                 vector=embedding,
                 payload={
                     'chunk_id': chunk.metadata['chunk_id'],
                     'content': chunk.page_content,
                     'source': chunk.metadata.get('source', ''),
-                    'chunk_index': chunk.metadata.get('chunk_index', 0)
+                    'chunk_index': chunk.metadata.get('chunk_index', 0),
+                    'document_id': chunk.metadata.get('document_id'),
+                    'version_id': chunk.metadata.get('version_id'),
                 }
             )
             points.append(point)
@@ -104,6 +119,111 @@ class QdrantVectorManager:
 
        return search_results
 '''
+    def count_chunks_by_source(self, page_size: int = 1000) -> Dict[str, int]:
+        """
+        Число чанков по каждому source — постраничный scroll без векторов.
+        Нужен один раз, чтобы заполнить журнал индексации для уже
+        существующей коллекции (scripts/backfill_ledger.py).
+        """
+        counts: Dict[str, int] = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=['source'],
+                with_vectors=False,
+            )
+            for point in points:
+                source = (point.payload or {}).get('source')
+                if source:
+                    counts[source] = counts.get(source, 0) + 1
+            if offset is None:
+                return counts
+
+    def iter_chunk_payloads(self, page_size: int = 1000):
+        """Постраничный обход payload всех точек без векторов"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            yield [point.payload or {} for point in points]
+            if offset is None:
+                return
+
+    def get_source_chunks(self, source: str, page_size: int = 256) -> List[Dict]:
+        """Все чанки файла вместе с векторами, по порядку chunk_index"""
+        source_filter = Filter(must=[FieldCondition(key='source', match=MatchValue(value=source))])
+        chunks = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=source_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for point in points:
+                chunks.append({**(point.payload or {}), 'vector': point.vector})
+            if offset is None:
+                break
+        chunks.sort(key=lambda c: c.get('chunk_index', 0))
+        return chunks
+
+    def search_neighbours(
+        self,
+        vectors: List[List[float]],
+        *,
+        top_k: int,
+        score_threshold: float,
+        exclude_source: Optional[str] = None,
+    ) -> List[List[SearchResult]]:
+        """
+        Ближайшие чанки для каждого вектора одним пакетным запросом;
+        чанки того же файла (exclude_source) не возвращаются.
+        """
+        if not vectors:
+            return []
+
+        query_filter = None
+        if exclude_source:
+            query_filter = Filter(must_not=[FieldCondition(key='source', match=MatchValue(value=exclude_source))])
+
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                QueryRequest(
+                    query=vector,
+                    filter=query_filter,
+                    limit=top_k,
+                    score_threshold=score_threshold,
+                    with_payload=True,
+                )
+                for vector in vectors
+            ],
+        )
+        return [
+            [
+                SearchResult(
+                    chunk_id=(r.payload or {}).get('chunk_id', ''),
+                    content=(r.payload or {}).get('content', ''),
+                    score=r.score,
+                    source='vector',
+                    metadata=r.payload or {},
+                )
+                for r in response.points
+            ]
+            for response in responses
+        ]
+
     def clear_collection(self):
         """Очистка коллекции"""
         self.client.delete_collection(self.collection_name)
@@ -0,0 +1,79 @@
+# ============= Разбор поискового запроса =============
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+from services.models import nlp
+from utils.config import QUERY_ANALYSIS_CACHE_SIZE
+
+# для сущностей и лемм нужны только эти компоненты; синтаксический
+# разбор (parser) — самая дорогая часть ru_core_news_sm — не запускается
+_NEEDED_PIPES = {"tok2vec", "morphologizer", "attribute_ruler", "lemmatizer", "ner"}
+_SKIPPED_PIPES = [name for name in nlp.pipe_names if name not in _NEEDED_PIPES]
+
+# сколько лемм запроса (кроме сущностей) идёт в поиск по графу
+MAX_QUERY_LEMMAS = 5
+
+_LUCENE_SPECIAL_RE = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+_LUCENE_OPERATORS = {"and", "or", "not", "to"}
+
+# разбор запроса выполняется параллельно с получением эмбеддинга
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='query-analysis')
+
+
+@dataclass(frozen=True)
+class QueryAnalysis:
+    entities: Tuple[str, ...]
+    lemmas: Tuple[str, ...]
+    # термины для поиска по графу: сущности и первые MAX_QUERY_LEMMAS лемм
+    terms: Tuple[str, ...]
+    # строка запроса для db.index.fulltext.queryNodes с экранированием
+    lucene_query: str
+
+
+def escape_lucene(term: str) -> str:
+    """Экранирует спецсимволы Lucene; фраза из нескольких слов — в кавычках"""
+    escaped = _LUCENE_SPECIAL_RE.sub(r'\\\1', term)
+    if len(term.split()) > 1:
+        return f'"{escaped}"'
+    if term in _LUCENE_OPERATORS:
+        # одиночное and/or/not Lucene принял бы за оператор
+        return f'"{escaped}"'
+    return escaped
+
+
+def normalize_query(query: str) -> str:
+    # регистр не меняется: NER опирается на заглавные буквы
+    return " ".join(query.split())
+
+
+def analyze_query(query: str) -> QueryAnalysis:
+    return _analyze(normalize_query(query))
+
+
+def submit_analysis(query: str) -> "Future[QueryAnalysis]":
+    return _executor.submit(analyze_query, query)
+
+
+def analysis_cache_info() -> dict:
+    info = _analyze.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+@lru_cache(maxsize=QUERY_ANALYSIS_CACHE_SIZE)
+def _analyze(query: str) -> QueryAnalysis:
+    doc = nlp(query, disable=_SKIPPED_PIPES)
+    entities = tuple(dict.fromkeys(ent.text.lower() for ent in doc.ents))
+    lemmas = tuple(dict.fromkeys(
+        token.lemma_.lower() for token in doc
+        if not token.is_stop and token.is_alpha
+    ))
+    terms = tuple(dict.fromkeys(entities + lemmas[:MAX_QUERY_LEMMAS]))
+    return QueryAnalysis(
+        entities=entities,
+        lemmas=lemmas,
+        terms=terms,
+        lucene_query=" OR ".join(escape_lucene(term) for term in terms),
+    )
@@ -0,0 +1,139 @@
+# ============= Ограничение частоты внешних вызовов =============
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Tuple
+
+from utils.config import (
+    CLOUDRU_RATE_LIMIT, CLOUDRU_BURST,
+    YANDEX_OCR_RATE_LIMIT, YANDEX_OCR_BURST,
+)
+from utils.logger import get_logger
+
+log = get_logger("[RateLimiter]")
+
+# классы приоритета: меньше — раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+# по умолчанию вызов фоновый: индексация и проверки идут в пулах потоков,
+# а пользовательский запрос явно помечается через request_priority
+_current_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_BACKGROUND)
+
+# границы корзин гистограммы ожидания, секунды
+WAIT_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class ProviderLimiter:
+    """
+    Token bucket на одного провайдера (общий ключ API) с очередью по
+    приоритету: пока ждут интерактивные вызовы, фоновые не получают
+    токены, а внутри класса порядок — по времени прихода.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._metrics: Dict[int, Dict] = {
+            p: {'queued': 0, 'max_queued': 0, 'acquired': 0, 'wait_seconds': 0.0,
+                'wait_buckets': [0] * (len(WAIT_BUCKETS) + 1)}
+            for p in _PRIORITY_NAMES
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @contextmanager
+    def acquire(self, cost: float = 1.0) -> Iterator[None]:
+        """Блокирует поток до получения токенов; приоритет — из request_priority"""
+        if self.rate <= 0:
+            # лимит выключен
+            yield
+            return
+
+        priority = _current_priority.get()
+        entry = (priority, next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            stats = self._metrics[priority]
+            stats['queued'] += 1
+            stats['max_queued'] = max(stats['max_queued'], stats['queued'])
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == entry and self._tokens >= cost:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= cost
+                        break
+                    # ждём появления токена или смены головы очереди
+                    self._cond.wait(timeout=max((cost - self._tokens) / self.rate, 0.001))
+            except BaseException:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                raise
+            finally:
+                stats['queued'] -= 1
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            stats['acquired'] += 1
+            stats['wait_seconds'] += waited
+            stats['wait_buckets'][bisect.bisect_left(WAIT_BUCKETS, waited)] += 1
+
+        if waited > 1:
+            log.debug(f"{self.name}: {_PRIORITY_NAMES[priority]} вызов ждал {waited:.2f} с")
+        yield
+
+    def snapshot(self) -> Dict:
+        bounds = [str(b) for b in WAIT_BUCKETS] + ['+Inf']
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'tokens_available': round(self._tokens, 2),
+                'classes': {
+                    _PRIORITY_NAMES[p]: {
+                        'queue_depth': s['queued'],
+                        'max_queue_depth': s['max_queued'],
+                        'acquired': s['acquired'],
+                        'avg_wait_seconds': round(s['wait_seconds'] / s['acquired'], 4) if s['acquired'] else 0.0,
+                        'wait_buckets': dict(zip(bounds, s['wait_buckets'])),
+                    }
+                    for p, s in self._metrics.items()
+                },
+            }
+
+
+# Cloud.ru: LLM и эмбеддинги идут по одному ключу и делят один лимит
+LIMITERS: Dict[str, ProviderLimiter] = {
+    "cloudru": ProviderLimiter("cloudru", CLOUDRU_RATE_LIMIT, CLOUDRU_BURST),
+    "yandex_ocr": ProviderLimiter("yandex_ocr", YANDEX_OCR_RATE_LIMIT, YANDEX_OCR_BURST),
+}
+
+
+def limiter(provider: str) -> ProviderLimiter:
+    return LIMITERS[provider]
@@ -0,0 +1,110 @@
+# ============= Объединение одинаковых одновременных запросов =============
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils.logger import get_logger
+
+log = get_logger("[SingleFlight]")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class _AsyncCall:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Пока по ключу идёт вычисление, повторные вызовы с тем же ключом
+    не запускают своё, а ждут результат первого (или его исключение).
+    Результат не кэшируется: после завершения следующий вызов считает заново.
+
+    do — для потоков: повторные вызовы блокируют свой поток до результата.
+    do_async — для обработчиков event loop: ожидающие не занимают потоки
+    пула, а ждут общую задачу.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, _AsyncCall] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                log.info(f"{self.name}: результат отдан ещё {call.waiters} одинаковым запросам")
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Вычисление идёт отдельной задачей: отмена запроса, который её
+        запустил (клиент отключился), не отменяет её для остальных.
+        """
+        with self._lock:
+            call = self._async_calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+            else:
+                call = self._async_calls[key] = _AsyncCall(asyncio.ensure_future(fn()))
+                self._executed += 1
+                call.task.add_done_callback(lambda task: self._finish_async(key, call))
+
+        return await asyncio.shield(call.task)
+
+    def _finish_async(self, key: Hashable, call: _AsyncCall):
+        with self._lock:
+            if self._async_calls.get(key) is call:
+                del self._async_calls[key]
+        if not call.task.cancelled():
+            # если все ожидающие отменены, исключение иначе осталось бы неполученным
+            call.task.exception()
+        if call.waiters:
+            log.info(f"{self.name}: результат отдан ещё {call.waiters} одинаковым запросам")
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            calls = list(self._calls.values()) + list(self._async_calls.values())
+            return {
+                'executed': self._executed,
+                'coalesced': self._coalesced,
+                'in_flight': len(calls),
+                'waiting': sum(c.waiters for c in calls),
+            }
@@ -29,3 +29,53 @@ SEMANTIC_BREAKPOINT_THRESHOLD = float(os.getenv('SEMANTIC_BREAKPOINT_THRESHOLD',
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
 RETRY_DELAY = int(os.getenv('RETRY_DELAY', 2))
 HYBRID_ALPHA = float(os.getenv('HYBRID_ALPHA', 0.5))
+
+# сколько файлов пакета распознаётся одновременно (OCR — удалённый вызов)
+INGEST_OCR_WORKERS = int(os.getenv('INGEST_OCR_WORKERS', 4))
+# журнал проиндексированных файлов (SQLite)
+INGEST_LEDGER_PATH = os.getenv('INGEST_LEDGER_PATH', str(BASE_DIR / "data" / "ingest_ledger.sqlite3"))
+# запись processing моложе этого срока — файл индексирует другое задание;
+# более старая считается брошенной (процесс упал) и файл берётся заново
+INGEST_PROCESSING_LEASE_SECONDS = float(os.getenv('INGEST_PROCESSING_LEASE_SECONDS', 1800))
+# почти-дубликаты (оценка Жаккара по MinHash): с какого сходства связывать
+# файлы как версии и с какого не проверять противоречия через LLM
+NEAR_DUP_LINK_THRESHOLD = float(os.getenv('NEAR_DUP_LINK_THRESHOLD', 0.7))
+NEAR_DUP_SKIP_THRESHOLD = float(os.getenv('NEAR_DUP_SKIP_THRESHOLD', 0.9))
+# проверка противоречий: новые чанки сравниваются с ближайшими существующими
+CONTRADICTION_SIMILARITY_THRESHOLD = float(os.getenv('CONTRADICTION_SIMILARITY_THRESHOLD', 0.75))
+CONTRADICTION_NEIGHBOURS = int(os.getenv('CONTRADICTION_NEIGHBOURS', 3))
+CONTRADICTION_MAX_PAIRS = int(os.getenv('CONTRADICTION_MAX_PAIRS', 200))
+# размер одного промпта: символов текста и пар
+CONTRADICTION_BATCH_CHARS = int(os.getenv('CONTRADICTION_BATCH_CHARS', 8000))
+CONTRADICTION_BATCH_PAIRS = int(os.getenv('CONTRADICTION_BATCH_PAIRS', 8))
+CONTRADICTION_WORKERS = int(os.getenv('CONTRADICTION_WORKERS', 4))
+# бюджет контекста ответа, токенов (локальная оценка)
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 3000))
+# логировать токены и задержку каждого вызова LLM по шаблонам
+PROMPT_METRICS = os.getenv('PROMPT_METRICS', 'false').lower() in ('1', 'true', 'yes')
+# маршруты LLM: ответы пользователю и короткие проверки (противоречия)
+LLM_ANSWER_MODEL = os.getenv('LLM_ANSWER_MODEL', 'GigaChat/GigaChat-2-Max')
+LLM_ANSWER_FALLBACK_MODEL = os.getenv('LLM_ANSWER_FALLBACK_MODEL', 'GigaChat/GigaChat-2-Pro') or None
+LLM_ANSWER_MAX_TOKENS = int(os.getenv('LLM_ANSWER_MAX_TOKENS', 1024))
+# BackendPart ждёт /api/ask RAG_ASK_TIMEOUT = 25 с: основная модель и резервная
+# вместе укладываются в LLM_ANSWER_DEADLINE, остаток — на поиск
+LLM_ANSWER_TIMEOUT = float(os.getenv('LLM_ANSWER_TIMEOUT', 10))
+LLM_ANSWER_DEADLINE = float(os.getenv('LLM_ANSWER_DEADLINE', 18))
+LLM_CHECK_MODEL = os.getenv('LLM_CHECK_MODEL', 'GigaChat/GigaChat-2')
+LLM_CHECK_FALLBACK_MODEL = os.getenv('LLM_CHECK_FALLBACK_MODEL', 'GigaChat/GigaChat-2-Pro') or None
+# ответ проверки — JSON на каждую пару батча: ~120 токенов на пару, чтобы массив не обрезался
+LLM_CHECK_MAX_TOKENS = int(os.getenv('LLM_CHECK_MAX_TOKENS', 120 * CONTRADICTION_BATCH_PAIRS))
+LLM_CHECK_TIMEOUT = float(os.getenv('LLM_CHECK_TIMEOUT', 30))
+# лимиты частоты вызовов провайдеров, запросов в секунду (0 — без лимита) и запас
+CLOUDRU_RATE_LIMIT = float(os.getenv('CLOUDRU_RATE_LIMIT', 10))
+CLOUDRU_BURST = int(os.getenv('CLOUDRU_BURST', 20))
+YANDEX_OCR_RATE_LIMIT = float(os.getenv('YANDEX_OCR_RATE_LIMIT', 5))
+YANDEX_OCR_BURST = int(os.getenv('YANDEX_OCR_BURST', 10))
+# лексический индекс BM25 по чанкам
+BM25_INDEX_PATH = os.getenv('BM25_INDEX_PATH', str(BASE_DIR / "data" / "bm25.sqlite3"))
+# сколько сегментов одного яруса (порядка размера) набирается до слияния
+BM25_MERGE_FACTOR = int(os.getenv('BM25_MERGE_FACTOR', 10))
+# вес лексической ветви в hybrid_search (вектор и граф — alpha и 1 - alpha)
+BM25_WEIGHT = float(os.getenv('BM25_WEIGHT', 0.5))
+# сколько разборов запросов (сущности, леммы) держать в кэше
+QUERY_ANALYSIS_CACHE_SIZE = int(os.getenv('QUERY_ANALYSIS_CACHE_SIZE', 1024))
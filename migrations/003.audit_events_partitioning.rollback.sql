@@ -0,0 +1,26 @@
+alter table audit_events rename to audit_events_partitioned;
+alter table audit_events_partitioned rename constraint audit_events_pkey to audit_events_partitioned_pkey;
+alter sequence audit_events_id_seq owned by none;
+
+create table audit_events (
+    id          bigint primary key default nextval('audit_events_id_seq'),
+    user_id     uuid references users(id),
+    action      audit_action not null,
+    entity_type text not null,      -- 'document','document_version','case','search'
+    entity_id   text,
+    meta        jsonb,
+    created_at  timestamptz not null default now()
+);
+
+alter sequence audit_events_id_seq owned by audit_events.id;
+
+insert into audit_events (id, user_id, action, entity_type, entity_id, meta, created_at)
+select id, user_id, action, entity_type, entity_id, meta, created_at
+from audit_events_partitioned;
+
+drop table audit_events_partitioned;
+
+drop function if exists audit_events_drop_partition(text);
+drop function if exists audit_events_partitions_before(date);
+drop function if exists audit_events_ensure_partitions(int);
+drop function if exists audit_events_ensure_partition(date);
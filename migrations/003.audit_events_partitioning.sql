@@ -0,0 +1,146 @@
+-- помесячное секционирование audit_events
+
+alter table audit_events rename to audit_events_legacy;
+alter table audit_events_legacy rename constraint audit_events_pkey to audit_events_legacy_pkey;
+alter table audit_events_legacy rename constraint audit_events_user_id_fkey to audit_events_legacy_user_id_fkey;
+alter sequence audit_events_id_seq owned by none;
+
+create table audit_events (
+    id          bigint not null default nextval('audit_events_id_seq'),
+    user_id     uuid references users(id),
+    action      audit_action not null,
+    entity_type text not null,      -- 'document','document_version','case','search'
+    entity_id   text,
+    meta        jsonb,
+    created_at  timestamptz not null default now(),
+
+    primary key (id, created_at)
+) partition by range (created_at);
+
+alter sequence audit_events_id_seq owned by audit_events.id;
+
+-- сюда попадают строки, для месяца которых секция ещё не создана
+create table audit_events_default partition of audit_events default;
+
+create index ix_audit_events_user_created
+    on audit_events (user_id, created_at desc);
+
+
+-- секция на календарный месяц (границы в UTC), строки из default переносятся до attach
+create or replace function audit_events_ensure_partition(p_month date)
+returns text
+language plpgsql
+as $$
+declare
+    v_month timestamp   := date_trunc('month', p_month::timestamp);
+    v_from  timestamptz := v_month at time zone 'UTC';
+    v_to    timestamptz := (v_month + interval '1 month') at time zone 'UTC';
+    v_name  text        := 'audit_events_p' || to_char(v_month, 'YYYY_MM');
+begin
+    if to_regclass(v_name) is not null then
+        return v_name;
+    end if;
+
+    execute format(
+        'create table %I (like audit_events including defaults including constraints)',
+        v_name
+    );
+
+    execute format(
+        'with moved as (
+             delete from audit_events_default
+             where created_at >= $1 and created_at < $2
+             returning *
+         )
+         insert into %I select * from moved',
+        v_name
+    ) using v_from, v_to;
+
+    execute format(
+        'alter table audit_events attach partition %I for values from (%L) to (%L)',
+        v_name, v_from, v_to
+    );
+
+    return v_name;
+end;
+$$;
+
+
+-- текущий месяц + p_months_ahead вперёд
+create or replace function audit_events_ensure_partitions(p_months_ahead int default 3)
+returns setof text
+language plpgsql
+as $$
+declare
+    v_current date := date_trunc('month', now() at time zone 'UTC')::date;
+    i         int;
+begin
+    for i in 0..p_months_ahead loop
+        return next audit_events_ensure_partition(
+            (v_current + make_interval(months => i))::date
+        );
+    end loop;
+end;
+$$;
+
+
+-- секции, целиком лежащие раньше p_cutoff
+create or replace function audit_events_partitions_before(p_cutoff date)
+returns table (partition_name text, month_start date)
+language sql
+stable
+as $$
+    select p.partition_name, p.month_start
+    from (
+        select
+            c.relname::text as partition_name,
+            to_date(substring(c.relname from '^audit_events_p(\d{4}_\d{2})$'), 'YYYY_MM') as month_start
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = 'audit_events'::regclass
+          and c.relname ~ '^audit_events_p\d{4}_\d{2}$'
+    ) p
+    where p.month_start + interval '1 month' <= p_cutoff
+    order by p.month_start
+$$;
+
+
+create or replace function audit_events_drop_partition(p_name text)
+returns void
+language plpgsql
+as $$
+begin
+    if p_name !~ '^audit_events_p\d{4}_\d{2}$' then
+        raise exception 'Not an audit_events partition: %', p_name;
+    end if;
+
+    execute format('alter table audit_events detach partition %I', p_name);
+    execute format('drop table %I', p_name);
+end;
+$$;
+
+
+-- секции под существующую историю и на ближайшие месяцы
+do $$
+declare
+    v_month date;
+begin
+    select date_trunc('month', min(created_at) at time zone 'UTC')::date
+    into v_month
+    from audit_events_legacy;
+
+    while v_month is not null
+          and v_month < date_trunc('month', now() at time zone 'UTC')::date loop
+        perform audit_events_ensure_partition(v_month);
+        v_month := (v_month + interval '1 month')::date;
+    end loop;
+end;
+$$;
+
+select audit_events_ensure_partitions(3);
+
+insert into audit_events (id, user_id, action, entity_type, entity_id, meta, created_at)
+select id, user_id, action, entity_type, entity_id, meta, created_at
+from audit_events_legacy;
+
+drop table audit_events_legacy;
@@ -0,0 +1 @@
+drop table if exists user_activity_counters;
@@ -0,0 +1,30 @@
+-- агрегаты активности пользователя для профиля
+
+create table user_activity_counters (
+    user_id             uuid primary key references users(id) on delete cascade,
+    documents_created   bigint not null default 0,
+    documents_updated   bigint not null default 0,
+    drafts_created      bigint not null default 0,
+    collections_created bigint not null default 0,
+    last_action_at      timestamptz,
+    updated_at          timestamptz not null default now()
+);
+
+insert into user_activity_counters (
+    user_id,
+    documents_created,
+    documents_updated,
+    drafts_created,
+    collections_created,
+    last_action_at
+)
+select
+    user_id,
+    count(*) filter (where action = 'create_document'),
+    count(*) filter (where action = 'update_document'),
+    count(*) filter (where action = 'create_draft'),
+    count(*) filter (where action = 'create_collection'),
+    max(created_at)
+from audit_events
+where user_id is not null
+group by user_id;
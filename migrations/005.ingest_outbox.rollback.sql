@@ -0,0 +1,2 @@
+drop table if exists ingest_outbox;
+drop type if exists ingest_status;
@@ -0,0 +1,25 @@
+-- outbox для передачи загруженных файлов в RAG-сервис
+
+create type ingest_status as enum ('pending', 'delivered', 'failed');
+
+create table ingest_outbox (
+    id              bigserial primary key,
+    document_id     uuid not null references documents(id) on delete cascade,
+    version_id      uuid not null references document_versions(id) on delete cascade,
+    storage_key     text not null,
+
+    status          ingest_status not null default 'pending',
+    attempts        int not null default 0,
+    last_error      text,
+    next_attempt_at timestamptz not null default now(),
+
+    created_at      timestamptz not null default now(),
+    delivered_at    timestamptz
+);
+
+create index ix_ingest_outbox_pending
+    on ingest_outbox (next_attempt_at)
+    where status = 'pending';
+
+create index ix_ingest_outbox_document
+    on ingest_outbox (document_id, created_at desc);
@@ -0,0 +1,6 @@
+drop index if exists ix_ingest_outbox_delivered_key;
+drop index if exists ix_document_versions_content_sha256;
+drop index if exists ix_document_versions_storage_key;
+
+alter table document_versions
+    drop column if exists content_sha256;
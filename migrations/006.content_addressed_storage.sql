@@ -0,0 +1,18 @@
+-- хэш содержимого версии: файлы хранятся по ключу <sha256><расширение>,
+-- одинаковые загрузки ссылаются на один блоб
+
+alter table document_versions
+    add column content_sha256 text;
+
+-- подсчёт ссылок на блоб при удалении и сборке мусора
+create index ix_document_versions_storage_key
+    on document_versions (storage_key);
+
+create index ix_document_versions_content_sha256
+    on document_versions (content_sha256)
+    where content_sha256 is not null;
+
+-- поиск уже доставленного в RAG содержимого
+create index ix_ingest_outbox_delivered_key
+    on ingest_outbox (storage_key)
+    where status = 'delivered';
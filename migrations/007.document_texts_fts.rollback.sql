@@ -0,0 +1 @@
+drop table if exists document_texts;
@@ -0,0 +1,15 @@
+-- распознанный текст файлов для полнотекстового поиска (russian)
+-- ключ — storage_key: файлы адресуются содержимым, текст общий для версий
+
+create table document_texts (
+    storage_key     text primary key,
+    content         text not null,
+    -- to_tsvector ограничен 1 МБ — индексируем начало очень больших файлов
+    tsv             tsvector generated always as (
+        to_tsvector('russian', left(content, 300000))
+    ) stored,
+    created_at      timestamptz not null default now()
+);
+
+create index ix_document_texts_tsv
+    on document_texts using gin (tsv);
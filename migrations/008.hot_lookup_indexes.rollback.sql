@@ -0,0 +1,7 @@
+drop index if exists ix_documents_access_levels;
+drop index if exists ix_documents_tags;
+drop index if exists ix_users_email;
+drop index if exists ix_refresh_tokens_user;
+drop index if exists ix_workspace_collection_items_collection_created;
+drop index if exists ix_workspace_collections_user_created;
+drop index if exists ix_workspace_queries_user_created;
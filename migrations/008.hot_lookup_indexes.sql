@@ -0,0 +1,25 @@
+-- индексы под запросы менеджеров, которые без них становятся seq scan;
+-- проверка планов: python -m scripts.check_query_plans
+-- (document_versions.storage_key проиндексирован в 006)
+
+create index ix_workspace_queries_user_created
+    on workspace_queries (user_id, created_at desc, id desc);
+
+create index ix_workspace_collections_user_created
+    on workspace_collections (user_id, created_at desc, id desc);
+
+create index ix_workspace_collection_items_collection_created
+    on workspace_collection_items (collection_id, created_at desc, id desc);
+
+create index ix_refresh_tokens_user
+    on refresh_tokens (user_id);
+
+create index ix_users_email
+    on users (email)
+    where email is not null;
+
+create index ix_documents_tags
+    on documents using gin (tags);
+
+create index ix_documents_access_levels
+    on documents using gin (access_levels);
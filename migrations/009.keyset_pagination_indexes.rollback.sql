@@ -0,0 +1,6 @@
+drop index if exists ix_audit_events_user_created;
+create index ix_audit_events_user_created
+    on audit_events (user_id, created_at desc);
+
+drop index if exists ix_documents_department_upload_date;
+drop index if exists ix_documents_upload_date;
@@ -0,0 +1,13 @@
+-- индексы под keyset-пагинацию: порядок совпадает с ORDER BY запросов,
+-- поэтому страница читается с позиции курсора без OFFSET и сортировки
+
+create index ix_documents_upload_date
+    on documents (upload_date desc, id desc);
+
+create index ix_documents_department_upload_date
+    on documents (department_id, upload_date desc, id desc);
+
+-- id как тай-брейкер для событий с одинаковым created_at
+drop index if exists ix_audit_events_user_created;
+create index ix_audit_events_user_created
+    on audit_events (user_id, created_at desc, id desc);
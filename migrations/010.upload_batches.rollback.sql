@@ -0,0 +1,3 @@
+drop index if exists ix_ingest_outbox_batch;
+alter table ingest_outbox drop column if exists batch_id;
+drop table if exists upload_batches;
@@ -0,0 +1,21 @@
+-- пакетная загрузка (много файлов или ZIP-архив): одна запись на запрос,
+-- документы пакета отправляются в RAG одним заданием
+
+create table upload_batches (
+    id              uuid primary key default gen_random_uuid(),
+    created_by_id   uuid references users(id) on delete set null,
+    department_id   bigint references departments(id),
+
+    files_total     int not null,
+    -- файлы, не принятые при разборе запроса: [{"file_name": ..., "reason": ...}]
+    rejected        jsonb not null default '[]'::jsonb,
+
+    created_at      timestamptz not null default now()
+);
+
+alter table ingest_outbox
+    add column batch_id uuid references upload_batches(id) on delete cascade;
+
+create index ix_ingest_outbox_batch
+    on ingest_outbox (batch_id)
+    where batch_id is not null;
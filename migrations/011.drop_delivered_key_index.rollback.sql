@@ -0,0 +1,3 @@
+create index if not exists ix_ingest_outbox_delivered_key
+    on ingest_outbox (storage_key)
+    where status = 'delivered';
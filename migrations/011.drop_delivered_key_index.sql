@@ -0,0 +1,4 @@
+-- повторная отправка уже доставленного содержимого решается журналом MLPart,
+-- выборка доставленных storage_key больше не нужна
+
+drop index if exists ix_ingest_outbox_delivered_key;